@@ -0,0 +1,139 @@
+"""
+Local cache of actor results keyed by actor and run input
+"""
+
+import os
+import json
+import gzip
+import time
+import hashlib
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+# Off unless asked for: repeat runs during analysis reuse results, scheduled runs always call Apify
+ACTOR_CACHE_ENABLED = os.getenv('ACTOR_CACHE', 'false').lower() == 'true'
+ACTOR_CACHE_DIR = os.getenv('ACTOR_CACHE_DIR', 'output/cache')
+ACTOR_CACHE_TTL_HOURS = float(os.getenv('ACTOR_CACHE_TTL_HOURS', 24))
+ACTOR_CACHE_MAX_MB = float(os.getenv('ACTOR_CACHE_MAX_MB', 500))
+
+
+def cache_key(actor_id, run_input):
+    """
+    Content hash of an actor run: the actor ID plus the canonicalized run input
+    (sorted keys, no whitespace), so equal inputs share an entry
+    """
+    canonical = json.dumps({'actor': actor_id, 'input': run_input}, sort_keys=True,
+                           separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ActorCache:
+    """
+    Stores the run metadata and raw dataset items of every actor run on disk as
+    gzip-compressed JSON lines, one file per run input hash. Entries older than
+    ttl_hours are ignored, and the least recently used entries are evicted once
+    the cache grows past max_mb.
+    """
+
+    def __init__(self, cache_dir=ACTOR_CACHE_DIR, ttl_hours=ACTOR_CACHE_TTL_HOURS, max_mb=ACTOR_CACHE_MAX_MB):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.jsonl.gz')
+
+    def get(self, actor_id, run_input):
+        """
+        (run, items) of a cached run with the same input, or None on a miss
+        """
+        path = self._path(cache_key(actor_id, run_input))
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                run = json.loads(f.readline())
+        except (OSError, ValueError):
+            return None
+
+        # The TTL counts from when the run was cached; the file's mtime is
+        # touched on every hit so eviction drops the least recently used runs
+        if time.time() - run.get('_cached_at', 0) > self.ttl_seconds:
+            self._remove(path)
+            return None
+        os.utime(path)
+        return run, self._read_items(path)
+
+    def fresh(self, actor_id, run_input):
+        """
+        Whether a run with this input would be served from the cache, without
+        reading its items or touching the entry
+        """
+        try:
+            with gzip.open(self._path(cache_key(actor_id, run_input)), 'rt', encoding='utf-8') as f:
+                run = json.loads(f.readline())
+        except (OSError, ValueError):
+            return False
+        return time.time() - run.get('_cached_at', 0) <= self.ttl_seconds
+
+    def _read_items(self, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            f.readline()
+            for line in f:
+                yield json.loads(line)
+
+    def record(self, actor_id, run_input, run, items):
+        """
+        Pass items through while writing them to the cache. The entry is only
+        kept once the whole dataset has been read.
+        """
+        path = self._path(cache_key(actor_id, run_input))
+        tmp_path = f'{path}.{threading.get_ident()}.part'
+        os.makedirs(self.cache_dir, exist_ok=True)
+        completed = False
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                f.write(json.dumps({**run, '_cached_at': time.time()}, ensure_ascii=False, default=str) + '\n')
+                for item in items:
+                    f.write(json.dumps(item, ensure_ascii=False, default=str) + '\n')
+                    yield item
+            completed = True
+        finally:
+            if completed:
+                os.replace(tmp_path, path)
+                self.evict()
+            else:
+                self._remove(tmp_path)
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits in max_bytes
+        """
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.jsonl.gz'):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
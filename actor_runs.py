@@ -0,0 +1,120 @@
+"""
+Shared helper to run Apify actors and read their datasets
+"""
+
+import os
+import json
+from dotenv import load_dotenv
+from actor_cache import ActorCache, ACTOR_CACHE_ENABLED
+from rate_limiter import ActorRunError, RETRYABLE_RUN_STATUSES, call_with_retries
+
+# Load environment variables
+load_dotenv()
+
+# Cache of actor results shared by all scrapers (None when disabled)
+actor_cache = ActorCache() if ACTOR_CACHE_ENABLED else None
+# Skip cache lookups but still store fresh results (--no-cache)
+bypass_cache = False
+# ApifyClient shared by all scrapers, created on first use
+_client = None
+
+
+def apify_client():
+    """
+    The shared ApifyClient. It is created on first use, so importing a scraper
+    (for a plan, a test or a worker) needs neither the token nor apify_client.
+    Raises ValueError if APIFY_API_TOKEN is not set.
+    """
+    global _client
+    if _client is None:
+        token = os.getenv('APIFY_API_TOKEN')
+        if not token:
+            raise ValueError("APIFY_API_TOKEN not found in environment variables. Please create a .env file.")
+        from apify_client import ApifyClient
+        _client = ApifyClient(token)
+    return _client
+
+
+def configure_cache(enabled=ACTOR_CACHE_ENABLED, bypass=False):
+    """
+    Turn the actor result cache on or off (by default as ACTOR_CACHE says),
+    or make runs ignore cached results
+    """
+    global actor_cache, bypass_cache
+    if not enabled:
+        actor_cache = None
+    elif actor_cache is None:
+        actor_cache = ActorCache()
+    bypass_cache = bypass
+
+
+def run_actor(client, actor_id, run_input, unit=None):
+    """
+    Run an actor and wait for it to finish.
+    Returns (run, items) where items iterates over the run's dataset. Runs with
+    the same actor and input are served from the local cache while it is fresh.
+    Calls are paced per actor, and rate limits, server errors and failed runs
+    are retried with backoff (see rate_limiter).
+    client is an ApifyClient (or a stand-in), or None for the shared one.
+    With a metrics UnitMetrics as unit, the call is timed, the run's usage
+    recorded and the items counted as they are read.
+    """
+    if actor_cache is not None and not bypass_cache:
+        cached = actor_cache.get(actor_id, run_input)
+        if cached is not None:
+            print(f"  → Using cached results of run {cached[0].get('id')}")
+            if unit is not None:
+                unit.actor_run(actor_id, cached[0], cached=True)
+                return cached[0], unit.fetch(cached[1])
+            return cached
+
+    if client is None:
+        client = apify_client()
+
+    def start_run():
+        run = client.actor(actor_id).call(run_input=run_input)
+        if run.get('status') in RETRYABLE_RUN_STATUSES:
+            raise ActorRunError(actor_id, run)
+        return run
+
+    if unit is None:
+        run = call_with_retries(actor_id, start_run)
+    else:
+        unit.actor_id = actor_id
+        with unit.stage('call'):
+            run = call_with_retries(actor_id, start_run)
+        unit.actor_run(actor_id, run)
+    items = client.dataset(run["defaultDatasetId"]).iterate_items()
+    if actor_cache is not None:
+        items = actor_cache.record(actor_id, run_input, run, items)
+    if unit is not None:
+        items = unit.fetch(items)
+    return run, items
+
+
+def planned_run(platform, units, run_input, estimated_items):
+    """
+    An actor run a scraper would start, for --plan: its platform adapter,
+    units of work (keywords or page names), input and expected item count
+    """
+    cached = actor_cache is not None and not bypass_cache and actor_cache.fresh(platform.actor_id, run_input)
+    return {
+        'platform': platform.name,
+        'actor_id': platform.actor_id,
+        'units': list(units),
+        'run_input': run_input,
+        'estimated_items': 0 if cached else estimated_items,
+        'cached': cached,
+    }
+
+
+def print_plan(runs):
+    """
+    Print planned actor runs (see planned_run) with their inputs and a total
+    """
+    for i, run in enumerate(runs, 1):
+        source = ' (cached)' if run['cached'] else f" ~{run['estimated_items']:,} items"
+        print(f"[{i}] {run['platform']} · {run['actor_id']} · {', '.join(map(str, run['units']))}{source}")
+        print(f"    {json.dumps(run['run_input'], ensure_ascii=False)}")
+    cached = sum(1 for run in runs if run['cached'])
+    print(f"\nPlan: {len(runs)} actor runs ({cached} cached), ~{sum(run['estimated_items'] for run in runs):,} items")
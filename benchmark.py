@@ -0,0 +1,220 @@
+"""
+Offline benchmark of the scrapers against the fake Apify backend
+Runs each scraper on synthetic datasets of growing size and reports
+items/sec, peak memory and the time spent in each stage.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --sizes 1000,100000,1000000 --scrapers twitter,facebook_posts
+    python benchmark.py --latency 0.5 --page-latency 0.05 --failure-rate 0.1 --stream
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    # Windows: peak memory is measured with tracemalloc instead
+    resource = None
+
+SCRAPERS = ['instagram', 'tiktok', 'twitter', 'facebook_pages', 'facebook_posts']
+DEFAULT_SIZES = '1000,10000,100000'
+
+
+def _configure_environment(args):
+    """
+    Settings for the scraper modules, applied before they are imported: no
+    real token needed, no cache, no pacing and short retry delays
+    """
+    os.environ.setdefault('APIFY_API_TOKEN', 'benchmark')
+    os.environ['ACTOR_CACHE'] = 'false'
+    os.environ['ACTOR_CALLS_PER_MINUTE'] = '1000000000'
+    os.environ['ACTOR_MAX_CALLS_PER_MINUTE'] = '1000000000'
+    os.environ['ACTOR_RETRY_BASE_DELAY'] = str(args['retry_delay'])
+    os.environ['ACTOR_RETRY_MAX_DELAY'] = str(args['retry_delay'] * 8)
+    os.environ['CIRCUIT_BREAKER_THRESHOLD'] = '1000000'
+    os.environ['STREAM_OUTPUT'] = 'false'
+    os.environ['PARQUET_OUTPUT'] = 'false'
+    os.environ['POST_STORE'] = 'false'
+
+
+def _synthetic_pages(count):
+    return {f'Organización {i}': f'https://www.facebook.com/organizacion{i}' for i in range(count)}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_scenario(scraper_name, size, args):
+    """
+    Run one scraper on size synthetic items; meant to run in a fresh process
+    so its peak memory is its own
+    """
+    _configure_environment(args)
+    import pandas as pd
+    import sinks
+    from fake_apify import FakeApifyClient
+    from keywords import KEYWORDS
+
+    # Time spent writing output: every CSV goes through DataFrame.to_csv
+    # (buffered mode) or CSVStreamWriter.flush (streaming mode)
+    write_time = [0.0]
+
+    def timed(function):
+        def wrapper(*a, **kw):
+            started = time.perf_counter()
+            try:
+                return function(*a, **kw)
+            finally:
+                write_time[0] += time.perf_counter() - started
+        return wrapper
+
+    pd.DataFrame.to_csv = timed(pd.DataFrame.to_csv)
+    sinks.CSVStreamWriter.flush = timed(sinks.CSVStreamWriter.flush)
+
+    # Hashtag scrapers run the first 10 keywords, one actor run each; the
+    # Facebook posts scraper runs each page once
+    if scraper_name == 'facebook_posts':
+        runs = args['pages']
+    elif scraper_name == 'facebook_pages':
+        runs = 1
+    else:
+        runs = min(10, len(KEYWORDS))
+    fake = FakeApifyClient(items_per_run=max(1, size // runs), latency=args['latency'], page_size=args['page_size'],
+                           page_latency=args['page_latency'], failure_rate=args['failure_rate'], seed=args['seed'])
+
+    if scraper_name in ('instagram', 'tiktok', 'twitter'):
+        import scraper as module
+        scrape = getattr(module, f'scrape_{scraper_name}')
+        call = lambda output_file: scrape(KEYWORDS, output_file=output_file, stream=args['stream'])
+    elif scraper_name == 'facebook_pages':
+        import scraper_facebook_pages as module
+        pages = _synthetic_pages(size)
+        call = lambda output_file: module.scrape_facebook_pages(pages, output_file=output_file, stream=args['stream'])
+    else:
+        import scraper_facebook_posts as module
+        pages = _synthetic_pages(args['pages'])
+        # The per-page post cap is raised to the posts the fake returns per run
+        call = lambda output_file: module.scrape_facebook_posts(pages, KEYWORDS, output_file=output_file,
+                                                                stream=args['stream'], max_posts_per_page=fake.items_per_run)
+    module.client = fake
+
+    if resource is None:
+        import tracemalloc
+        tracemalloc.start()
+    else:
+        baseline_mb = _peak_rss_mb()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        output_file = os.path.join(output_dir, f'{scraper_name}_data.csv')
+        log = io.StringIO()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(log):
+            results = call(output_file)
+        elapsed = time.perf_counter() - started
+        output_mb = os.path.getsize(output_file) / (1024 * 1024) if os.path.exists(output_file) else 0.0
+
+    if resource is None:
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    else:
+        peak_mb = _peak_rss_mb() - baseline_mb
+
+    rows = len(results) if results is not None else 0
+    # Whatever is not the actor call, the dataset fetch or the write is the
+    # scraper's own work: mapping, filtering and deduplicating items (for
+    # Facebook posts, only the part that doesn't overlap with the fetch)
+    other = max(0.0, elapsed - fake.call_seconds - fake.fetch_seconds - write_time[0])
+    return {
+        'scraper': scraper_name,
+        'size': size,
+        'items': fake.items_served,
+        'rows': rows,
+        'actor_calls': fake.calls,
+        'failed_calls': fake.failures,
+        'seconds': round(elapsed, 3),
+        'items_per_second': round(fake.items_served / elapsed) if elapsed else 0,
+        'peak_memory_mb': round(peak_mb, 1),
+        'output_mb': round(output_mb, 1),
+        'stages': {
+            'call': round(fake.call_seconds, 3),
+            'fetch': round(fake.fetch_seconds, 3),
+            'map': round(other, 3),
+            'write': round(write_time[0], 3),
+        },
+    }
+
+
+def print_report(results):
+    print(f"\n{'scraper':<15} {'size':>9} {'items':>9} {'rows':>9} {'items/s':>9} {'peak MB':>8} "
+          f"{'call s':>7} {'fetch s':>8} {'map s':>7} {'write s':>8}")
+    print('-' * 98)
+    for r in results:
+        stages = r['stages']
+        print(f"{r['scraper']:<15} {r['size']:>9,} {r['items']:>9,} {r['rows']:>9,} {r['items_per_second']:>9,} "
+              f"{r['peak_memory_mb']:>8.1f} {stages['call']:>7.2f} {stages['fetch']:>8.2f} "
+              f"{stages['map']:>7.2f} {stages['write']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scrapers offline against a fake Apify backend')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f'Comma-separated dataset sizes, in items per scraper (default: {DEFAULT_SIZES})')
+    parser.add_argument('--scrapers', default=','.join(SCRAPERS),
+                        help=f'Comma-separated scrapers to run (default: all: {",".join(SCRAPERS)})')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds each actor run takes (default: 0)')
+    parser.add_argument('--page-size', type=int, default=1000, help='Dataset items per fetched page (default: 1000)')
+    parser.add_argument('--page-latency', type=float, default=0.0, help='Seconds to fetch each page (default: 0)')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='Share of actor calls that fail with 429/503 or a FAILED run (default: 0)')
+    parser.add_argument('--retry-delay', type=float, default=0.01,
+                        help='Base backoff in seconds before retrying a failed call (default: 0.01)')
+    parser.add_argument('--pages', type=int, default=20,
+                        help='Facebook pages the facebook_posts scenario spreads its items over (default: 20)')
+    parser.add_argument('--stream', action='store_true', help='Run the scrapers in streaming mode')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic data (default: 0)')
+    parser.add_argument('--json', metavar='PATH', help='Also write the results to PATH as JSON')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    scrapers = [name.strip() for name in args.scrapers.split(',')]
+    unknown = set(scrapers) - set(SCRAPERS)
+    if unknown:
+        parser.error(f"unknown scrapers: {', '.join(sorted(unknown))}")
+    options = {key: value for key, value in vars(args).items() if key not in ('sizes', 'scrapers', 'json')}
+
+    print(f"Benchmarking {', '.join(scrapers)} with {', '.join(f'{size:,}' for size in sizes)} items "
+          f"(latency {args.latency}s, page size {args.page_size}, failure rate {args.failure_rate:.0%}"
+          f"{', streaming' if args.stream else ''})")
+
+    # Every scenario runs in a fresh process so peak memory is not carried over
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for name in scrapers:
+        for size in sizes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_scenario, name, size, options).result()
+            results.append(result)
+            print(f"  ✓ {name} {size:,}: {result['items_per_second']:,} items/s, {result['peak_memory_mb']:.1f} MB")
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results saved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
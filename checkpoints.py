@@ -0,0 +1,229 @@
+"""
+Checkpoint store to resume interrupted scraping runs
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+# Consecutive already-seen items after which an incremental run stops reading a dataset
+INCREMENTAL_SEEN_STREAK = int(os.getenv('INCREMENTAL_SEEN_STREAK', 10))
+
+
+def checkpoint_scope(output_file):
+    """
+    Checkpoint scope of a scraper run: its output file name without extension,
+    e.g. 'instagram_data' or 'twitter_data_control'
+    """
+    return os.path.splitext(os.path.basename(output_file))[0]
+
+
+def restore_finished_units(checkpoints, output_file, units, all_results, resume):
+    """
+    Prepare the checkpoint scope of a scraper run over units, a list of
+    (unit key, value) pairs such as (keyword, hashtag) or (page URL, name).
+    On resume, restore the rows of finished units into all_results and return
+    only the pending units; otherwise start the scope afresh.
+    """
+    if checkpoints is None:
+        return units
+
+    scope = checkpoint_scope(output_file)
+    if not resume:
+        checkpoints.reset(scope)
+        return units
+
+    finished = checkpoints.finished_units(scope)
+    pending = []
+    for unit, value in units:
+        if unit in finished:
+            all_results.extend(finished[unit])
+        else:
+            pending.append((unit, value))
+    return pending
+
+
+def pending_units(checkpoints, output_file, units, resume):
+    """
+    Units a run would still go through (all of them unless resuming), without
+    restoring or resetting anything; for --plan
+    """
+    if checkpoints is None or not resume:
+        return units
+    finished = checkpoints.finished_units(checkpoint_scope(output_file))
+    return [(unit, value) for unit, value in units if unit not in finished]
+
+
+def existing_checkpoints(path):
+    """
+    CheckpointStore at path if the file exists, else None; for --plan, which
+    only reads checkpoints and should not create them
+    """
+    return CheckpointStore(path) if os.path.exists(path) else None
+
+
+class CheckpointStore:
+    """
+    SQLite store of finished units of work (a platform keyword, or a Facebook
+    page URL) with the actor run that produced them and their mapped rows.
+    A resumed run skips finished units and restores their rows instead of
+    paying for the actor runs again.
+    """
+
+    def __init__(self, path='output/checkpoints.sqlite'):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS units (
+                scope TEXT NOT NULL,
+                unit TEXT NOT NULL,
+                run_id TEXT,
+                rows TEXT NOT NULL,
+                finished_at REAL NOT NULL,
+                PRIMARY KEY (scope, unit)
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS watermarks (
+                platform TEXT NOT NULL,
+                unit TEXT NOT NULL,
+                newest_fecha TEXT NOT NULL,
+                newest_id TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (platform, unit)
+            )
+        """)
+        self._conn.commit()
+
+    def reset(self, scope):
+        """
+        Forget every finished unit of a scope (used when a run starts from scratch)
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM units WHERE scope = ?", (scope,))
+            self._conn.commit()
+
+    def finished_units(self, scope):
+        """
+        Dict of unit -> stored rows for every finished unit of a scope
+        """
+        with self._lock:
+            cursor = self._conn.execute("SELECT unit, rows FROM units WHERE scope = ?", (scope,))
+            return {unit: json.loads(rows) for unit, rows in cursor}
+
+    def mark_done(self, scope, unit, run_id, rows):
+        """
+        Record a finished unit with its actor run ID and mapped rows
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO units (scope, unit, run_id, rows, finished_at) VALUES (?, ?, ?, ?, ?)",
+                (scope, unit, run_id, json.dumps(rows, ensure_ascii=False, default=str), time.time()),
+            )
+            self._conn.commit()
+
+    def watermark(self, platform, unit):
+        """
+        (fecha, post ID) of the newest post collected for a unit, or None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT newest_fecha, newest_id FROM watermarks WHERE platform = ? AND unit = ?",
+                (platform, unit),
+            ).fetchone()
+        return row
+
+    def update_watermark(self, platform, unit, newest_fecha, newest_id):
+        """
+        Move a unit's high-water mark forward (never backwards)
+        """
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO watermarks (platform, unit, newest_fecha, newest_id, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (platform, unit) DO UPDATE SET
+                    newest_fecha = excluded.newest_fecha,
+                    newest_id = excluded.newest_id,
+                    updated_at = excluded.updated_at
+                WHERE excluded.newest_fecha > watermarks.newest_fecha
+                """,
+                (platform, unit, newest_fecha, str(newest_id), time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class HighWaterMark:
+    """
+    Newest post collected so far for one unit of work, e.g. the 'aborto'
+    keyword on Instagram or one Facebook page. Dates are compared as the
+    'fecha' strings written to the CSVs (YYYY-MM-DD HH:MM:SS).
+    Incremental runs use it to skip posts an earlier run already collected,
+    and to stop reading a dataset after seen_streak already-seen posts in a row.
+    """
+
+    def __init__(self, checkpoints, platform, unit, seen_streak=INCREMENTAL_SEEN_STREAK):
+        self.checkpoints = checkpoints
+        self.platform = platform
+        self.unit = unit
+        self.seen_streak = seen_streak
+        stored = checkpoints.watermark(platform, unit) if checkpoints is not None else None
+        self.fecha, self.post_id = stored or ('', '')
+        self._newest = (self.fecha, self.post_id)
+        self._streak = 0
+
+    @property
+    def lower_bound(self):
+        """
+        Day (YYYY-MM-DD) of the newest collected post, for actors that accept a
+        minimum post date, or None if nothing was collected yet
+        """
+        return self.fecha[:10] or None
+
+    @property
+    def exhausted(self):
+        return self._streak >= self.seen_streak
+
+    def seen(self, fecha, post_id):
+        """
+        Whether a post was already collected by an earlier run
+        """
+        already_seen = bool((post_id and str(post_id) == self.post_id) or (fecha and self.fecha and fecha <= self.fecha))
+        self._streak = self._streak + 1 if already_seen else 0
+        return already_seen
+
+    def observe(self, fecha, post_id):
+        """
+        Note a collected post, moving the mark forward if it is the newest
+        """
+        if fecha and fecha > self._newest[0]:
+            self._newest = (fecha, str(post_id))
+
+    def save(self):
+        if self.checkpoints is not None and self._newest[0] > self.fecha:
+            self.checkpoints.update_watermark(self.platform, self.unit, *self._newest)
+
+
+def oldest_lower_bound(marks):
+    """
+    Lower bound date shared by several units in one actor run: the oldest of
+    their marks, or None if any of them has never been collected
+    """
+    bounds = [mark.lower_bound for mark in marks]
+    if not bounds or None in bounds:
+        return None
+    return min(bounds)
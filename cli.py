@@ -0,0 +1,50 @@
+"""
+Single command-line entry point for every scraper
+Each subcommand takes the options of its script; --plan (or --dry-run) lists
+the actor runs with their inputs and estimated items without calling Apify.
+
+Usage:
+    python cli.py hashtags --since-last-run
+    python cli.py control --plan
+    python cli.py facebook-pages --resume
+    python cli.py facebook-posts --start-date 2025-06-01 --dry-run
+    python cli.py monitor --platforms twitter
+    python cli.py queue work --processes 4
+"""
+
+import argparse
+import scraper
+import scraper_control
+import scraper_facebook_pages
+import scraper_facebook_posts
+import monitor
+import work_queue
+
+# Subcommand -> (script module with add_arguments() and run(), help)
+COMMANDS = {
+    'hashtags': (scraper, "scrape Instagram, TikTok and Twitter/X by keyword"),
+    'control': (scraper_control, "scrape the control group keywords on Instagram, TikTok and Twitter/X"),
+    'facebook-pages': (scraper_facebook_pages, "scrape Facebook page information of the organizations"),
+    'facebook-posts': (scraper_facebook_posts, "scrape Facebook posts of the organizations that match the keywords"),
+    'monitor': (monitor, "continuously poll keywords and Facebook pages for new posts"),
+    'queue': (work_queue, "plan, run and export a work queue of keyword and page units shared by worker processes"),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Media monitoring scrapers")
+    subparsers = parser.add_subparsers(dest='command', metavar='command', required=True)
+    for command, (module, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(command, help=help_text, description=help_text[0].upper() + help_text[1:])
+        module.add_arguments(subparser)
+        subparser.set_defaults(run=module.run)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Local stand-in for the Apify actor and dataset API, for offline benchmarks
+Generates synthetic datasets with the item shape of every actor the scrapers
+use, with configurable latency, page size and failure rate.
+"""
+
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from keywords import KEYWORDS
+
+# Synthetic posts are spread newest first from ANCHOR_DATE back to OLDEST_DATE,
+# so part of every dataset falls before the default 2025 date window
+ANCHOR_DATE = datetime(2025, 12, 31, 12, 0, 0, tzinfo=timezone.utc)
+OLDEST_DATE = datetime(2024, 10, 1, tzinfo=timezone.utc)
+
+WORDS = ['la', 'lucha', 'sigue', 'hoy', 'marcha', 'derechos', 'mujeres', 'justicia', 'todas', 'calle',
+         'ciudad', 'voz', 'nunca', 'más', 'juntas', 'libres', 'vivas', 'queremos', 'salud', 'ley',
+         'colectiva', 'organización', 'encuentro', 'taller', 'comunidad', 'memoria', 'acompañamiento']
+HASHTAGS = [hashtag.replace('#', '') for hashtag in KEYWORDS.values()]
+
+
+class FakeApiError(Exception):
+    """
+    Error raised by the fake API, with the HTTP status of a real ApifyApiError
+    """
+
+    def __init__(self, status_code):
+        super().__init__(f"{status_code} fake API error")
+        self.status_code = status_code
+
+
+def _text(rng, words=12, hashtags=(), keyword_rate=0.0):
+    text = ' '.join(rng.choice(WORDS) for _ in range(words))
+    if keyword_rate and rng.random() < keyword_rate:
+        text += ' ' + rng.choice(HASHTAGS)
+    if hashtags:
+        text += ' ' + ' '.join(f'#{tag}' for tag in hashtags)
+    return text
+
+
+def _dates(count):
+    """
+    count dates newest first, from ANCHOR_DATE back to OLDEST_DATE
+    """
+    step = (ANCHOR_DATE - OLDEST_DATE) / max(count, 1)
+    for i in range(count):
+        yield ANCHOR_DATE - step * i
+
+
+def _split(count, inputs):
+    # Items of a run shared between its inputs (hashtags, search terms, pages)
+    share, extra = divmod(count, max(len(inputs), 1))
+    return [(value, share + (1 if i < extra else 0)) for i, value in enumerate(inputs)]
+
+
+def instagram_items(run_input, count, rng, run_id):
+    for url, share in _split(count, run_input.get('directUrls', [])):
+        tag = url.rstrip('/').rsplit('/', 1)[-1]
+        for i, date in enumerate(_dates(share)):
+            tags = [tag] + rng.sample(HASHTAGS, 2)
+            yield {
+                'id': f'{run_id}{tag}{i}',
+                'shortCode': f'C{run_id}{i}',
+                'ownerUsername': f'user{rng.randrange(5000)}',
+                'caption': _text(rng, hashtags=tags),
+                'hashtags': tags,
+                'likesCount': rng.randrange(5000),
+                'commentsCount': rng.randrange(300),
+                'timestamp': date.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                'url': f'https://www.instagram.com/p/C{run_id}{i}/',
+                'inputUrl': url,
+            }
+
+
+def tiktok_items(run_input, count, rng, run_id):
+    for tag, share in _split(count, run_input.get('hashtags', [])):
+        for i, date in enumerate(_dates(share)):
+            tags = [tag] + rng.sample(HASHTAGS, 2)
+            yield {
+                'id': f'{run_id}{tag}{i}',
+                'text': _text(rng, hashtags=tags),
+                'createTime': int(date.timestamp()),
+                'createTimeISO': date.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                'authorMeta': {'name': f'user{rng.randrange(5000)}', 'fans': rng.randrange(100000)},
+                'hashtags': [{'name': name} for name in tags],
+                'playCount': rng.randrange(1000000),
+                'diggCount': rng.randrange(50000),
+                'webVideoUrl': f'https://www.tiktok.com/@user/video/{run_id}{i}',
+                'searchHashtag': {'name': tag},
+            }
+
+
+def twitter_items(run_input, count, rng, run_id):
+    for term, share in _split(count, run_input.get('searchTerms', [])):
+        tag = term.replace('#', '')
+        for i, date in enumerate(_dates(share)):
+            tags = [tag] + rng.sample(HASHTAGS, 1)
+            screen_name = f'user{rng.randrange(5000)}'
+            yield {
+                'id_str': f'{run_id}{tag}{i}',
+                'full_text': _text(rng, words=20, hashtags=tags),
+                'created_at': date.strftime('%a %b %d %H:%M:%S +0000 %Y'),
+                'user': {'screen_name': screen_name, 'followers_count': rng.randrange(10000)},
+                'entities': {'hashtags': [{'text': name} for name in tags]},
+                'favorite_count': rng.randrange(2000),
+                'retweet_count': rng.randrange(500),
+                'reply_count': rng.randrange(100),
+                'view_count': rng.randrange(100000),
+                'searchTerm': term,
+            }
+
+
+def facebook_pages_items(run_input, count, rng, run_id):
+    for start_url, _ in _split(count, run_input.get('startUrls', [])):
+        url = start_url['url']
+        yield {
+            'pageUrl': url,
+            'facebookUrl': url,
+            'title': url.rstrip('/').rsplit('/', 1)[-1],
+            'pageId': str(rng.randrange(10**14, 10**15)),
+            'categories': ['Organización sin fines de lucro', 'Comunidad'],
+            'likes': rng.randrange(100000),
+            'followers': rng.randrange(150000),
+            'intro': _text(rng, words=25),
+            'websites': [f'https://{run_id}.org'],
+            'email': f'contacto{run_id}@example.org' if rng.random() < 0.6 else None,
+            'phone': '+52 55 5555 5555' if rng.random() < 0.4 else None,
+            'address': 'Ciudad de México',
+            'rating': round(rng.uniform(3, 5), 1),
+            'ratingCount': rng.randrange(500),
+            'messenger': None,
+            'checkins': rng.randrange(1000),
+            'adLibraryPageId': str(rng.randrange(10**14)),
+            'adsAreRunning': rng.random() < 0.1,
+            'profilePictureUrl': 'https://scontent.xx.fbcdn.net/profile.jpg',
+            'coverPhotoUrl': 'https://scontent.xx.fbcdn.net/cover.jpg',
+        }
+
+
+def facebook_posts_items(run_input, count, rng, run_id):
+    for start_url, share in _split(count, run_input.get('startUrls', [])):
+        url = start_url['url']
+        for i, date in enumerate(_dates(share)):
+            yield {
+                'postId': f'{run_id}{i}',
+                'pageName': url.rstrip('/').rsplit('/', 1)[-1],
+                'text': _text(rng, words=40, keyword_rate=0.3),
+                'likes': rng.randrange(3000),
+                'comments': rng.randrange(200),
+                'shares': rng.randrange(300),
+                'time': date.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                'url': f'{url}/posts/{run_id}{i}',
+                'facebookUrl': url,
+                'inputUrl': url,
+            }
+
+
+# Actor ID -> generator of its dataset items
+GENERATORS = {
+    'apify/instagram-scraper': instagram_items,
+    'clockworks/tiktok-scraper': tiktok_items,
+    'apidojo/tweet-scraper': twitter_items,
+    'apify/facebook-pages-scraper': facebook_pages_items,
+    'apify/facebook-posts-scraper': facebook_posts_items,
+}
+
+
+class FakeApifyClient:
+    """
+    Stand-in for ApifyClient: actor(id).call() "runs" an actor after latency
+    seconds and dataset(id).iterate_items() streams its synthetic items in
+    pages of page_size, waiting page_latency seconds per page.
+    A failure_rate share of calls fail, half with an API error (429/503) and
+    half as a FAILED run. Facebook pages runs return one item per start URL;
+    other runs return items_per_run items whatever their limits say.
+    """
+
+    def __init__(self, items_per_run=100, latency=0.0, page_size=1000, page_latency=0.0, failure_rate=0.0, seed=0):
+        self.items_per_run = items_per_run
+        self.latency = latency
+        self.page_size = page_size
+        self.page_latency = page_latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self._runs = {}
+        self._lock = threading.Lock()
+        # Totals for the benchmark report
+        self.calls = 0
+        self.failures = 0
+        self.items_served = 0
+        self.call_seconds = 0.0
+        self.fetch_seconds = 0.0
+
+    def actor(self, actor_id):
+        return FakeActorClient(self, actor_id)
+
+    def dataset(self, dataset_id):
+        return FakeDatasetClient(self, dataset_id)
+
+
+class FakeActorClient:
+
+    def __init__(self, client, actor_id):
+        self.client = client
+        self.actor_id = actor_id
+
+    def call(self, run_input=None, **kwargs):
+        client = self.client
+        started = time.perf_counter()
+        time.sleep(client.latency)
+        with client._lock:
+            client.calls += 1
+            run_id = f'run{client.calls}'
+            failure = client.rng.random() < client.failure_rate
+            if failure:
+                client.failures += 1
+                api_error = client.rng.random() < 0.5
+            client.call_seconds += time.perf_counter() - started
+        if failure and api_error:
+            raise FakeApiError(client.rng.choice([429, 503]))
+
+        if self.actor_id == 'apify/facebook-pages-scraper':
+            count = len(run_input.get('startUrls', []))
+        else:
+            count = client.items_per_run
+        client._runs[run_id] = (self.actor_id, run_input or {}, count)
+        return {
+            'id': run_id,
+            'actId': self.actor_id,
+            'status': 'FAILED' if failure else 'SUCCEEDED',
+            'defaultDatasetId': run_id,
+            'stats': {'computeUnits': count / 100000},
+            'usageTotalUsd': count / 1000 * 0.5,
+        }
+
+
+class FakeDatasetClient:
+
+    def __init__(self, client, dataset_id):
+        self.client = client
+        self.dataset_id = dataset_id
+
+    def iterate_items(self, **kwargs):
+        client = self.client
+        actor_id, run_input, count = client._runs[self.dataset_id]
+        rng = random.Random(f'{client.seed}-{self.dataset_id}')
+        items = GENERATORS[actor_id](run_input, count, rng, self.dataset_id)
+        while True:
+            # Only time spent producing pages counts as fetch time, not the
+            # consumer's work between items
+            started = time.perf_counter()
+            time.sleep(client.page_latency)
+            page = [item for _, item in zip(range(client.page_size), items)]
+            with client._lock:
+                client.fetch_seconds += time.perf_counter() - started
+                client.items_served += len(page)
+            yield from page
+            if len(page) < client.page_size:
+                return
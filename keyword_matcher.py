@@ -0,0 +1,199 @@
+"""
+Multi-keyword matcher for filtering post texts by keywords
+"""
+
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _accent_table():
+    """
+    str.translate() table that strips accents from Latin letters (ñ -> n, á -> a)
+    and drops stray combining marks
+    """
+    table = {}
+    for code in range(0xC0, 0x250):
+        char = chr(code)
+        stripped = ''.join(c for c in unicodedata.normalize('NFKD', char) if not unicodedata.combining(c))
+        if stripped and stripped != char:
+            table[code] = stripped
+    for code in range(0x300, 0x370):
+        table[code] = None
+    return table
+
+
+ACCENT_TABLE = _accent_table()
+
+
+def fold_accents(text):
+    """
+    Remove accents from text, e.g. "pañuelverde" -> "panuelverde"
+    """
+    return text.translate(ACCENT_TABLE)
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def _trie_regex(patterns):
+    """
+    Regular expression equivalent to an alternation of the patterns, factored as
+    a trie (e.g. "aborto(?:l(?:egal|ibre)|seguro)?") so each position of the
+    text is tested against all patterns at once. At a given position the
+    longest pattern wins.
+    """
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for char in pattern:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            body = f'(?:{body})?'
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Matcher compiled once from a keywords dict ({"aborto": "#aborto", ...}) that
+    finds every keyword contained in a text in a single pass.
+    The keywords are folded into a trie and compiled to one regular expression,
+    so the scan runs inside the regex engine and costs about the same for 40
+    keywords as for 4,000.
+
+    With the defaults it matches exactly like `keyword in text.lower()`.
+    fold_accents: ignore accents, so "pañuelverde" also matches "panuelverde"
+    word_boundaries: only match whole words, so "ile" doesn't match "movilidad"
+    """
+
+    def __init__(self, keywords_dict, fold_accents=False, word_boundaries=False):
+        self.fold_accents = fold_accents
+        self.word_boundaries = word_boundaries
+
+        # Cleaned pattern -> keywords that use it
+        self._keywords_by_pattern = {}
+        for key, keyword in keywords_dict.items():
+            pattern = self._normalize(keyword.replace('#', ''))
+            if pattern:
+                self._keywords_by_pattern.setdefault(pattern, []).append(key)
+        self._order = {key: i for i, key in enumerate(keywords_dict)}
+
+        patterns = list(self._keywords_by_pattern)
+        # Only the longest pattern at each position is reported by the regex,
+        # so remember which other patterns every pattern already contains
+        self._contained = {pattern: self._contained_patterns(pattern, patterns) for pattern in patterns}
+
+        regex = _trie_regex(patterns)
+        if word_boundaries:
+            regex = rf'(?<!\w)(?:{regex})(?!\w)'
+        self._search = re.compile(regex).search if patterns else None
+
+    def __len__(self):
+        return len(self._order)
+
+    def _normalize(self, text):
+        text = text.lower()
+        if self.fold_accents:
+            text = fold_accents(text)
+        return text
+
+    def _contained_patterns(self, pattern, patterns):
+        """
+        Patterns (including pattern itself) that match wherever pattern matches
+        """
+        contained = []
+        for other in patterns:
+            start = pattern.find(other)
+            while start != -1:
+                end = start + len(other)
+                if not self.word_boundaries or (
+                        (start == 0 or not _is_word_char(pattern[start - 1]))
+                        and (end == len(pattern) or not _is_word_char(pattern[end]))):
+                    contained.append(other)
+                    break
+                start = pattern.find(other, start + 1)
+        return contained
+
+    def match(self, text):
+        """
+        Keywords found in text, in the order of the keywords dict
+        """
+        if not text or self._search is None:
+            return []
+
+        text = self._normalize(text)
+        search = self._search
+        found = search(text)
+        if found is None:
+            return []
+
+        patterns = set()
+        while found:
+            patterns.update(self._contained[found.group()])
+            # Restart right after the match start to also catch overlapping keywords
+            found = search(text, found.start() + 1)
+
+        keywords = [key for pattern in patterns for key in self._keywords_by_pattern[pattern]]
+        keywords.sort(key=self._order.__getitem__)
+        return keywords
+
+    def match_many(self, texts):
+        """
+        match() of every text, in order
+        """
+        return [self.match(text) for text in texts]
+
+
+# Matcher of a KeywordMatcherPool worker process
+_worker_matcher = None
+
+
+def _start_worker(keywords_dict, fold_accents, word_boundaries):
+    global _worker_matcher
+    _worker_matcher = KeywordMatcher(keywords_dict, fold_accents=fold_accents, word_boundaries=word_boundaries)
+
+
+def _match_in_worker(texts):
+    return _worker_matcher.match_many(texts)
+
+
+class KeywordMatcherPool:
+    """
+    KeywordMatcher spread over a pool of worker processes, for large volumes
+    of text: match_many() splits the texts between the workers, each with its
+    own compiled matcher. close() shuts the pool down.
+    """
+
+    def __init__(self, keywords_dict, processes, fold_accents=False, word_boundaries=False):
+        self.matcher = KeywordMatcher(keywords_dict, fold_accents=fold_accents, word_boundaries=word_boundaries)
+        self.processes = processes
+        self._executor = ProcessPoolExecutor(max_workers=processes, initializer=_start_worker,
+                                             initargs=(keywords_dict, fold_accents, word_boundaries))
+
+    def __len__(self):
+        return len(self.matcher)
+
+    def match(self, text):
+        return self.matcher.match(text)
+
+    def match_many(self, texts):
+        """
+        match() of every text, in order, computed by the workers
+        """
+        texts = list(texts)
+        size = -(-len(texts) // self.processes) or 1
+        parts = [texts[i:i+size] for i in range(0, len(texts), size)]
+        return [keywords for part in self._executor.map(_match_in_worker, parts) for keywords in part]
+
+    def close(self):
+        self._executor.shutdown()
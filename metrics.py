@@ -0,0 +1,327 @@
+"""
+Per-run metrics of the scrapers
+Times every actor call, dataset fetch, mapping loop and file write, and counts
+items per keyword or page. Each unit of work is appended to a JSON-lines log
+as it finishes, and a Prometheus textfile summary is written at the end of the run.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+# Record per-run metrics (JSON-lines log plus a Prometheus textfile per job)
+METRICS_OUTPUT = os.getenv('METRICS_OUTPUT', 'true').lower() == 'true'
+METRICS_DIR = os.getenv('METRICS_DIR', 'output/metrics')
+
+# Prefix of every exported Prometheus metric
+PROMETHEUS_PREFIX = 'media_monitoring'
+
+
+class UnitMetrics:
+    """
+    Timings and item counts of one unit of work: an actor run for a keyword
+    batch or a Facebook page. Counts are 'fetched' (items read from the
+    dataset), 'kept' (items turned into rows) and 'dropped_<reason>' (e.g.
+    dropped_date, dropped_error). Stage timings are 'call' (the actor run,
+    retries included), 'fetch' (waiting for dataset items) and 'map' (the
+    scraper's own work on them). In the Facebook posts pipeline the work is
+    timed as 'match', and 'map' is the time the download waited for it.
+    """
+
+    def __init__(self, run, platform, unit):
+        self.run = run
+        self.platform = platform
+        self.unit = unit
+        self.actor_id = None
+        self.apify_run = {}
+        self.cached = False
+        self.counts = defaultdict(int)
+        self.stages = defaultdict(float)
+        self._items = None
+        self._started = time.perf_counter()
+
+    def count(self, name, n=1):
+        self.counts[name] += n
+
+    def drop(self, reason):
+        self.counts[f'dropped_{reason}'] += 1
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - started
+
+    def actor_run(self, actor_id, run, cached=False):
+        """
+        Record the Apify run the unit's items come from
+        """
+        self.actor_id = actor_id
+        self.apify_run = run or {}
+        self.cached = cached
+
+    def fetch(self, items):
+        """
+        Iterate over a run's dataset items, counting them and splitting the
+        loop's time between fetching items and mapping them
+        """
+        self._items = self._fetch(items)
+        return self._items
+
+    def _fetch(self, items):
+        started = time.perf_counter()
+        fetch_seconds = 0.0
+        iterator = iter(items)
+        try:
+            while True:
+                before = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    fetch_seconds += time.perf_counter() - before
+                self.counts['fetched'] += 1
+                yield item
+        finally:
+            # Also runs when the scraper stops reading early
+            self.stages['fetch'] += fetch_seconds
+            self.stages['map'] += time.perf_counter() - started - fetch_seconds
+
+    def finish(self, error=None):
+        """
+        Close the unit and add it to the run; error is the exception that
+        stopped it, if any
+        """
+        if self._items is not None:
+            # Settle the fetch/map split of a loop the scraper left early
+            self._items.close()
+        seconds = time.perf_counter() - self._started
+        stats = self.apify_run.get('stats') or {}
+        record = {
+            'event': 'unit',
+            'platform': self.platform,
+            'unit': self.unit,
+            'actor_id': self.actor_id,
+            'apify_run_id': self.apify_run.get('id'),
+            'cached': self.cached,
+            'status': 'error' if error is not None else 'ok',
+            'error': str(error) if error is not None else None,
+            'seconds': round(seconds, 4),
+            'stages': {name: round(value, 4) for name, value in self.stages.items()},
+            'counts': dict(self.counts),
+            # Usage of the Apify run (billed once, even if served from the cache later)
+            'compute_units': 0 if self.cached else stats.get('computeUnits', 0) or 0,
+            'usage_usd': 0 if self.cached else self.apify_run.get('usageTotalUsd', 0) or 0,
+            'net_rx_bytes': 0 if self.cached else stats.get('netRxBytes', 0) or 0,
+            'net_tx_bytes': 0 if self.cached else stats.get('netTxBytes', 0) or 0,
+        }
+        if self.run is not None:
+            self.run.record(record)
+        return record
+
+
+class RunMetrics:
+    """
+    Metrics of one run of a job (e.g. 'scraper', 'facebook_posts'): units and
+    writes are appended to <directory>/metrics.jsonl as they happen, and
+    close() adds the run's totals to the log and writes <directory>/<job>.prom
+    for node_exporter's textfile collector.
+    """
+
+    def __init__(self, job, directory=METRICS_DIR):
+        self.job = job
+        self.directory = directory
+        self.run_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        # platform -> totals
+        self.counts = defaultdict(lambda: defaultdict(int))
+        self.stages = defaultdict(lambda: defaultdict(float))
+        self.usage = defaultdict(lambda: defaultdict(float))
+        self.actor_runs = defaultdict(lambda: defaultdict(int))
+        # platform -> (first unit start, last unit end), for throughput
+        self.spans = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._log = open(os.path.join(directory, 'metrics.jsonl'), 'a', encoding='utf-8')
+
+    def unit(self, platform, unit):
+        return UnitMetrics(self, platform, unit)
+
+    def _emit(self, record):
+        record = {'run_id': self.run_id, 'job': self.job, 'time': datetime.now(timezone.utc).isoformat(), **record}
+        self._log.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._log.flush()
+
+    def record(self, record):
+        platform = record['platform']
+        now = time.perf_counter()
+        with self._lock:
+            for name, value in record['counts'].items():
+                self.counts[platform][name] += value
+            for name, value in record['stages'].items():
+                self.stages[platform][name] += value
+            for name in ('compute_units', 'usage_usd', 'net_rx_bytes', 'net_tx_bytes'):
+                self.usage[platform][name] += record[name]
+            self.actor_runs[platform][record['status']] += 1
+            first, _ = self.spans.get(platform, (now - record['seconds'], now))
+            self.spans[platform] = (min(first, now - record['seconds']), now)
+            self._emit(record)
+
+    def record_write(self, platform, output_file, rows, written_bytes, seconds):
+        with self._lock:
+            self.counts[platform]['written'] += rows
+            self.stages[platform]['write'] += seconds
+            self.usage[platform]['bytes_written'] += written_bytes
+            self._emit({'event': 'write', 'platform': platform, 'output_file': output_file, 'rows': rows,
+                        'bytes': written_bytes, 'seconds': round(seconds, 4)})
+
+    def summary(self):
+        """
+        Per-platform totals of the run so far
+        """
+        with self._lock:
+            platforms = {}
+            for platform in sorted(set(self.counts) | set(self.stages) | set(self.usage)):
+                first, last = self.spans.get(platform, (0, 0))
+                fetched = self.counts[platform].get('fetched', 0)
+                platforms[platform] = {
+                    'counts': dict(self.counts[platform]),
+                    'stages': {name: round(value, 4) for name, value in self.stages[platform].items()},
+                    'usage': {name: round(value, 6) for name, value in self.usage[platform].items()},
+                    'actor_runs': dict(self.actor_runs[platform]),
+                    'items_per_second': round(fetched / (last - first), 2) if last > first else 0,
+                }
+            return {'seconds': round(time.perf_counter() - self._started, 3), 'platforms': platforms}
+
+    def prometheus(self, summary):
+        """
+        The run's summary in Prometheus text exposition format
+        """
+        labels = lambda **values: ','.join(f'{key}="{_escape(value)}"' for key, value in
+                                           {'job': self.job, **values}.items())
+        families = {
+            'run_duration_seconds': ('gauge', 'Wall time of the last run', []),
+            'last_run_timestamp_seconds': ('gauge', 'Unix time the last run started', []),
+            'items': ('gauge', 'Items of the last run by outcome (fetched, kept, dropped_<reason>, written)', []),
+            'stage_seconds': ('gauge', 'Seconds spent per stage (call, fetch, map, write) in the last run', []),
+            'actor_runs': ('gauge', 'Actor runs of the last run by status', []),
+            'compute_units': ('gauge', 'Apify compute units used by the last run', []),
+            'usage_usd': ('gauge', 'Apify usage in USD of the last run', []),
+            'network_bytes': ('gauge', 'Network traffic of the last run\'s Apify runs', []),
+            'written_bytes': ('gauge', 'Bytes written to the output CSVs by the last run', []),
+            'items_per_second': ('gauge', 'Dataset items fetched per second in the last run', []),
+        }
+        families['run_duration_seconds'][2].append((labels(), summary['seconds']))
+        families['last_run_timestamp_seconds'][2].append((labels(), round(self.started_at.timestamp(), 3)))
+        for platform, totals in summary['platforms'].items():
+            for outcome, value in totals['counts'].items():
+                families['items'][2].append((labels(platform=platform, outcome=outcome), value))
+            for stage, value in totals['stages'].items():
+                families['stage_seconds'][2].append((labels(platform=platform, stage=stage), value))
+            for status, value in totals['actor_runs'].items():
+                families['actor_runs'][2].append((labels(platform=platform, status=status), value))
+            usage = totals['usage']
+            families['compute_units'][2].append((labels(platform=platform), usage.get('compute_units', 0)))
+            families['usage_usd'][2].append((labels(platform=platform), usage.get('usage_usd', 0)))
+            families['network_bytes'][2].append((labels(platform=platform, direction='rx'), usage.get('net_rx_bytes', 0)))
+            families['network_bytes'][2].append((labels(platform=platform, direction='tx'), usage.get('net_tx_bytes', 0)))
+            families['written_bytes'][2].append((labels(platform=platform), usage.get('bytes_written', 0)))
+            families['items_per_second'][2].append((labels(platform=platform), totals['items_per_second']))
+
+        lines = []
+        for name, (kind, help_text, samples) in families.items():
+            if not samples:
+                continue
+            metric = f'{PROMETHEUS_PREFIX}_{name}'
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} {kind}')
+            lines.extend(f'{metric}{{{sample_labels}}} {value}' for sample_labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+    def export(self, summary=None):
+        """
+        Write the run's Prometheus textfile with its totals so far; long-running
+        jobs (the monitor) call it as they go instead of only at close()
+        """
+        summary = summary or self.summary()
+        # Written to a temporary file and renamed so the collector never reads half a file
+        path = os.path.join(self.directory, f'{self.job}.prom')
+        with self._lock:
+            with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+                f.write(self.prometheus(summary))
+            os.replace(f'{path}.tmp', path)
+        return summary
+
+    def close(self):
+        """
+        Log the run's totals and write its Prometheus textfile
+        """
+        summary = self.summary()
+        with self._lock:
+            self._emit({'event': 'run', 'started_at': self.started_at.isoformat(), **summary})
+            self._log.close()
+        return self.export(summary)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Metrics of the job running in this process (None when not recording)
+current_run = None
+
+
+def start_run(job, enabled=METRICS_OUTPUT):
+    """
+    Start recording the metrics of a job's run
+    """
+    global current_run
+    current_run = RunMetrics(job) if enabled else None
+    return current_run
+
+
+def finish_run():
+    """
+    Write the current run's totals; returns its summary, or None when not recording
+    """
+    global current_run
+    run, current_run = current_run, None
+    return run.close() if run is not None else None
+
+
+def unit(platform, name):
+    """
+    Metrics of a unit of work of the current run (recorded nowhere when no
+    run is being recorded)
+    """
+    return UnitMetrics(current_run, platform, name)
+
+
+@contextmanager
+def write(platform, output_file, rows, overwrite=False):
+    """
+    Time a write of rows to output_file and record the bytes it added
+    (all of them when overwrite=True replaces the file)
+    """
+    before = os.path.getsize(output_file) if os.path.exists(output_file) and not overwrite else 0
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if current_run is not None:
+            after = os.path.getsize(output_file) if os.path.exists(output_file) else 0
+            current_run.record_write(platform, output_file, rows, after - before, time.perf_counter() - started)
@@ -0,0 +1,399 @@
+"""
+Continuous monitoring daemon
+Polls every (platform, keyword) and every Facebook page on its own interval,
+which follows the rate of new posts: busy keywords are polled every few
+minutes while quiet ones back off up to MONITOR_MAX_INTERVAL. Polls are
+incremental, so each one only adds new posts to output/<platform>_data_monitor.csv.
+
+Usage:
+    python monitor.py
+    python monitor.py --platforms twitter,facebook_posts --duration 3600
+"""
+
+import os
+import time
+import random
+import sqlite3
+import argparse
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dotenv import load_dotenv
+import scraper
+import scraper_facebook_posts
+from facebook_pages import FACEBOOK_PAGES
+from keywords import KEYWORDS
+from platforms import PLATFORMS
+from actor_runs import apify_client, configure_cache
+from checkpoints import CheckpointStore
+from post_store import POST_STORE, PostStore
+from page_index import FACEBOOK_PAGE_IDS_PATH, PageIndex
+import metrics
+
+# Load environment variables
+load_dotenv()
+
+# Platforms the monitor polls: hashtag platforms per keyword, Facebook posts per page
+MONITORED_PLATFORMS = scraper.HASHTAG_PLATFORMS + ['facebook_posts']
+
+# Configuration
+# Shortest and longest time between two polls of the same keyword or page, in seconds
+MONITOR_MIN_INTERVAL = float(os.getenv('MONITOR_MIN_INTERVAL', 300))
+MONITOR_MAX_INTERVAL = float(os.getenv('MONITOR_MAX_INTERVAL', 21600))
+# New posts a poll should find: the interval is set so that, at the recent
+# rate of new posts, about this many have come in since the last poll
+MONITOR_TARGET_NEW_POSTS = float(os.getenv('MONITOR_TARGET_NEW_POSTS', 10))
+# Factor the interval grows by after a poll without new posts
+MONITOR_BACKOFF = float(os.getenv('MONITOR_BACKOFF', 2))
+# Actor runs in flight at once across all platforms
+MONITOR_MAX_CONCURRENT_RUNS = int(os.getenv('MONITOR_MAX_CONCURRENT_RUNS', 4))
+# Per-platform run budgets: actor runs in flight (as for the scrapers) and
+# actor runs started per hour, each falling back to the global setting
+PLATFORM_CONCURRENT_RUNS = {
+    **scraper.PLATFORM_CONCURRENT_RUNS,
+    'facebook_posts': int(os.getenv('FACEBOOK_POSTS_MAX_CONCURRENT_RUNS', scraper.MAX_CONCURRENT_RUNS)),
+}
+MONITOR_RUNS_PER_HOUR = int(os.getenv('MONITOR_RUNS_PER_HOUR', 60))
+PLATFORM_RUNS_PER_HOUR = {
+    platform: int(os.getenv(f'{platform.upper()}_MONITOR_RUNS_PER_HOUR', MONITOR_RUNS_PER_HOUR))
+    for platform in MONITORED_PLATFORMS
+}
+# Schedule and high-water marks of the monitor, kept across restarts
+MONITOR_STATE_PATH = os.getenv('MONITOR_STATE_PATH', 'output/monitor.sqlite')
+
+# Weight of the latest poll in the smoothed rate of new posts when the rate
+# goes down (a rising rate is taken at once, so bursts are caught quickly)
+RATE_SMOOTHING = 0.5
+
+
+class PollTarget:
+    """
+    One thing the monitor polls: a keyword on a hashtag platform (unit is the
+    keyword, value its hashtag) or a Facebook page (unit is the page URL,
+    value the organization name), with its adaptive polling interval and
+    smoothed rate of new posts per hour
+    """
+
+    def __init__(self, platform, unit, value):
+        self.platform = platform
+        self.unit = unit
+        self.value = value
+        self.interval = MONITOR_MIN_INTERVAL
+        self.rate = None
+        self.last_polled = None
+        # New targets are due at once
+        self.next_due = 0.0
+        self.polls = 0
+        self.new_posts = 0
+
+    def __str__(self):
+        return f"{self.platform} {self.value}"
+
+    @property
+    def key(self):
+        return (self.platform, self.unit)
+
+    def observe(self, new_posts, polled_at):
+        """
+        Adapt the interval to a poll started at polled_at that found new_posts
+        posts, and schedule the next poll
+        """
+        if self.last_polled is not None and polled_at > self.last_polled:
+            observed = new_posts / ((polled_at - self.last_polled) / 3600)
+            if self.rate is None or observed > self.rate:
+                self.rate = observed
+            else:
+                self.rate = RATE_SMOOTHING * observed + (1 - RATE_SMOOTHING) * self.rate
+
+        if not new_posts:
+            interval = self.interval * MONITOR_BACKOFF
+        elif self.rate:
+            interval = MONITOR_TARGET_NEW_POSTS / self.rate * 3600
+        else:
+            # First poll: its posts are the backlog, not a rate
+            interval = self.interval
+        self.interval = min(max(interval, MONITOR_MIN_INTERVAL), MONITOR_MAX_INTERVAL)
+        self.last_polled = polled_at
+        self.polls += 1
+        self.new_posts += new_posts
+        # A little jitter so targets polled together drift apart
+        self.next_due = polled_at + self.interval * random.uniform(0.9, 1.0)
+
+
+class ScheduleStore:
+    """
+    SQLite table of every poll target's interval, rate of new posts and next
+    poll, so a restarted monitor keeps what it learned instead of polling
+    everything at the shortest interval again
+    """
+
+    def __init__(self, path=MONITOR_STATE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS schedule (
+                platform TEXT NOT NULL,
+                unit TEXT NOT NULL,
+                interval REAL NOT NULL,
+                rate REAL,
+                last_polled REAL,
+                next_due REAL NOT NULL,
+                polls INTEGER NOT NULL,
+                new_posts INTEGER NOT NULL,
+                PRIMARY KEY (platform, unit)
+            )
+        """)
+        self._conn.commit()
+
+    def load(self, target):
+        """
+        Restore a target's saved schedule, if it has one
+        """
+        row = self._conn.execute(
+            "SELECT interval, rate, last_polled, next_due, polls, new_posts FROM schedule WHERE platform = ? AND unit = ?",
+            target.key,
+        ).fetchone()
+        if row:
+            target.interval, target.rate, target.last_polled, target.next_due, target.polls, target.new_posts = row
+        return target
+
+    def save(self, target):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO schedule (platform, unit, interval, rate, last_polled, next_due, polls, new_posts) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (*target.key, target.interval, target.rate, target.last_polled, target.next_due, target.polls, target.new_posts),
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+class Monitor:
+    """
+    Scheduler that runs poll(target) for every target when it is due, with at
+    most max_concurrent_runs polls in flight, and per platform at most
+    platform_concurrent_runs[platform] in flight and runs_per_hour[platform]
+    started in any hour. poll returns the number of new posts found.
+    Due targets are polled in order of how long they have been due.
+    """
+
+    def __init__(self, targets, poll, schedule=None, max_concurrent_runs=MONITOR_MAX_CONCURRENT_RUNS,
+                 platform_concurrent_runs=PLATFORM_CONCURRENT_RUNS, runs_per_hour=PLATFORM_RUNS_PER_HOUR):
+        self.targets = [schedule.load(target) for target in targets] if schedule is not None else list(targets)
+        self.poll = poll
+        self.schedule = schedule
+        self.max_concurrent_runs = max(1, max_concurrent_runs)
+        self.platform_concurrent_runs = platform_concurrent_runs
+        self.runs_per_hour = runs_per_hour
+        # Platform -> start times of its runs in the last hour
+        self._started = defaultdict(deque)
+        # Future -> (target, poll start time)
+        self._running = {}
+
+    def _budget_frees_at(self, platform, now):
+        """
+        When the platform may start another run under its hourly budget (now if it has budget left)
+        """
+        started = self._started[platform]
+        while started and started[0] <= now - 3600:
+            started.popleft()
+        if len(started) < max(1, self.runs_per_hour.get(platform, MONITOR_RUNS_PER_HOUR)):
+            return now
+        return started[0] + 3600
+
+    def _launch_due(self, executor, now):
+        in_flight = Counter(target.platform for target, _ in self._running.values())
+        for target in sorted(self.targets, key=lambda target: target.next_due):
+            if target.next_due > now or len(self._running) >= self.max_concurrent_runs:
+                break
+            platform = target.platform
+            if in_flight[platform] >= max(1, self.platform_concurrent_runs.get(platform, 1)):
+                continue
+            if self._budget_frees_at(platform, now) > now:
+                continue
+            in_flight[platform] += 1
+            self._started[platform].append(now)
+            # Not due again until the poll is over
+            target.next_due = float('inf')
+            self._running[executor.submit(self.poll, target)] = (target, now)
+
+    def _wait_seconds(self, now):
+        """
+        Seconds until a target can be polled, or None to wait for a running poll to finish
+        """
+        if len(self._running) >= self.max_concurrent_runs:
+            return None
+        in_flight = Counter(target.platform for target, _ in self._running.values())
+        wake_times = [
+            max(target.next_due, self._budget_frees_at(target.platform, now))
+            for target in self.targets
+            if target.next_due != float('inf')
+            and in_flight[target.platform] < max(1, self.platform_concurrent_runs.get(target.platform, 1))
+        ]
+        if not wake_times:
+            return None if self._running else 60
+        # Wake up at least every minute
+        return min(max(min(wake_times) - now, 0), 60)
+
+    def _collect(self, futures):
+        for future in futures:
+            target, polled_at = self._running.pop(future)
+            try:
+                new_posts = future.result()
+            except Exception as e:
+                # Counted as a quiet poll, so a failing target backs off too
+                print(f"  ✗ Error polling {target}: {e}")
+                new_posts = 0
+            target.observe(new_posts, polled_at)
+            if self.schedule is not None:
+                self.schedule.save(target)
+            print(f"⏱ {target}: {new_posts} new posts, next poll in {format_interval(target.next_due - time.time())}")
+        if metrics.current_run is not None:
+            metrics.current_run.export()
+
+    def run(self, duration=None):
+        """
+        Poll targets as they come due until interrupted, or for duration seconds
+        """
+        deadline = time.time() + duration if duration else None
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_runs) as executor:
+            try:
+                while deadline is None or time.time() < deadline:
+                    now = time.time()
+                    self._launch_due(executor, now)
+                    timeout = self._wait_seconds(now)
+                    if deadline is not None:
+                        timeout = min(timeout if timeout is not None else deadline - now, max(deadline - now, 0))
+                    if self._running:
+                        done, _ = wait(self._running, timeout=timeout, return_when=FIRST_COMPLETED)
+                        self._collect(done)
+                    else:
+                        time.sleep(timeout)
+            except KeyboardInterrupt:
+                print(f"\nStopping: waiting for {len(self._running)} running polls...")
+            finally:
+                # Record the polls still running so their schedule is saved
+                if self._running:
+                    self._collect(wait(self._running).done)
+
+
+def format_interval(seconds):
+    seconds = max(seconds, 0)
+    if seconds < 60:
+        return f"{seconds:.0f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def monitor_targets(platforms, keywords=KEYWORDS, pages=FACEBOOK_PAGES):
+    """
+    Poll targets of the monitored platforms: every keyword on each hashtag
+    platform and every Facebook page
+    """
+    targets = []
+    for platform in platforms:
+        if platform == 'facebook_posts':
+            targets.extend(PollTarget(platform, url, name) for name, url in pages.items())
+        else:
+            targets.extend(PollTarget(platform, keyword, hashtag) for keyword, hashtag in keywords.items())
+    return targets
+
+
+def platform_list(value):
+    """
+    Comma-separated platforms of --platforms, checked against MONITORED_PLATFORMS
+    """
+    platforms = [platform.strip() for platform in value.split(',')]
+    unknown = set(platforms) - set(MONITORED_PLATFORMS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown platforms: {', '.join(sorted(unknown))}")
+    return platforms
+
+
+def add_arguments(parser):
+    """
+    Command-line options of the monitor
+    """
+    parser.add_argument('--platforms', type=platform_list, default=MONITORED_PLATFORMS,
+                        help=f"comma-separated platforms to monitor (default: {','.join(MONITORED_PLATFORMS)})")
+    parser.add_argument('--duration', type=float, help="stop after this many seconds (default: run until interrupted)")
+
+
+def run(args):
+    """
+    Run the monitor with the options of add_arguments() until interrupted
+    """
+    platforms = args.platforms
+    # Fail before starting if there is no API token
+    apify_client()
+    # An incremental poll's input only changes when the newest post moves to
+    # a new day, so cached results would hide the new posts of later polls
+    configure_cache(enabled=False)
+
+    output_dir = 'output'
+    os.makedirs(output_dir, exist_ok=True)
+
+    # The monitor keeps its own high-water marks next to its schedule, so its
+    # polls don't move the marks of the scrapers' --since-last-run runs
+    checkpoints = CheckpointStore(MONITOR_STATE_PATH)
+    schedule = ScheduleStore(MONITOR_STATE_PATH)
+    # Every collected post is also kept in a SQLite database across runs
+    store = PostStore() if POST_STORE else None
+    # Page IDs learned by earlier runs, shared with the Facebook scrapers
+    page_index = PageIndex(FACEBOOK_PAGES, FACEBOOK_PAGE_IDS_PATH)
+
+    def poll(target):
+        output_file = f'{output_dir}/{target.platform}_data_monitor.csv'
+        if target.platform == 'facebook_posts':
+            results = scraper_facebook_posts.scrape_facebook_posts({target.value: target.unit}, KEYWORDS, output_file=output_file,
+                                                                   stream=False, checkpoints=checkpoints, incremental=True,
+                                                                   store=store, page_index=page_index)
+        else:
+            results = scraper.scrape_platform(PLATFORMS[target.platform], {target.unit: target.value}, output_file,
+                                              max_concurrent_runs=1, stream=False, batch_size=1,
+                                              checkpoints=checkpoints, incremental=True, store=store)
+        return len(results)
+
+    monitor = Monitor(monitor_targets(platforms), poll, schedule)
+
+    print("\n" + "="*60)
+    print("MEDIA MONITOR")
+    print("="*60)
+    for platform in platforms:
+        count = sum(1 for target in monitor.targets if target.platform == platform)
+        print(f"{platform}: {count} targets, {PLATFORM_CONCURRENT_RUNS[platform]} runs in flight, "
+              f"{PLATFORM_RUNS_PER_HOUR[platform]} runs/hour")
+    print(f"Polling interval: {format_interval(MONITOR_MIN_INTERVAL)} to {format_interval(MONITOR_MAX_INTERVAL)}")
+    print(f"Max runs in flight: {MONITOR_MAX_CONCURRENT_RUNS}")
+    print("="*60 + "\n")
+
+    # Timings, item counts and Apify usage, exported after every poll under output/metrics
+    metrics.start_run('monitor')
+    try:
+        monitor.run(duration=args.duration)
+    finally:
+        schedule.close()
+        checkpoints.close()
+        if store is not None:
+            store.close()
+        metrics.finish_run()
+
+    polls = sum(target.polls for target in monitor.targets)
+    print(f"\n✓ Monitor stopped. New posts collected so far: {sum(target.new_posts for target in monitor.targets)} "
+          f"in {polls} polls")
+
+
+def main():
+    """
+    Run the monitor until interrupted
+    """
+    parser = argparse.ArgumentParser(description="Continuously poll keywords and Facebook pages for new posts")
+    add_arguments(parser)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
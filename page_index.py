@@ -0,0 +1,159 @@
+"""
+Index of the Facebook pages to attribute actor results to organizations
+Page URLs are compared in a canonical form, and the page IDs (and other URLs)
+the actors report for each page are remembered across runs, so a page is
+found whether an item names it by vanity URL, mobile URL or profile.php ID.
+"""
+
+import os
+import json
+import threading
+from urllib.parse import urlsplit, parse_qs
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+# Page IDs learned from earlier runs
+FACEBOOK_PAGE_IDS_PATH = os.getenv('FACEBOOK_PAGE_IDS_PATH', 'output/facebook_page_ids.json')
+
+# Path segments that are not page names
+_ID_PATHS = {'pages', 'people', 'pg'}
+
+
+def canonical_page_url(url):
+    """
+    Canonical key of a Facebook page URL: 'id:<page ID>' for numeric URLs
+    (profile.php?id=..., /pages/<name>/<ID>, /people/<name>/<ID>), else the
+    page name in lowercase, without host, query or anything after it, e.g.
+    'https://m.facebook.com/LuchadorasMX/posts/123' -> 'luchadorasmx'
+    """
+    if not url:
+        return ''
+    url = str(url).strip()
+    if '//' not in url:
+        url = f'https://{url}'
+    parts = urlsplit(url)
+    segments = [segment for segment in parts.path.split('/') if segment]
+    if not segments:
+        return ''
+    first = segments[0].lower()
+    if first == 'profile.php':
+        page_id = parse_qs(parts.query).get('id', [''])[0]
+        return f'id:{page_id}' if page_id else ''
+    if first in _ID_PATHS and len(segments) > 1:
+        if first != 'pg' and segments[-1].isdigit():
+            return f'id:{segments[-1]}'
+        return segments[1].lower()
+    if first.isdigit():
+        return f'id:{first}'
+    return first
+
+
+class PageIndex:
+    """
+    Canonical URL and page ID -> configured page URL of every page in
+    pages_dict (name -> URL), for O(1) attribution of actor items.
+    With a path, the page IDs and other URLs learned with learn() are kept in
+    a JSON file and loaded again by later runs; save() writes them.
+    """
+
+    def __init__(self, pages_dict, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        # Configured URL -> name, page ID and canonical keys seen for it
+        self.names = {}
+        self.page_ids = {}
+        self._aliases = {}
+        # Canonical key ('luchadorasmx', 'id:1234') -> configured URL
+        self._keys = {}
+        self._changed = False
+        for name, url in pages_dict.items():
+            self.names[url] = name
+            self._aliases[url] = set()
+            self._keys.setdefault(canonical_page_url(url), url)
+        for url, learned in self._load().items():
+            if url in self.names:
+                self._learn(url, learned.get('page_id'), learned.get('aliases', []))
+        self._changed = False
+
+    def __len__(self):
+        return len(self.names)
+
+    def _load(self):
+        if not self.path:
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def lookup(self, *urls, page_id=None):
+        """
+        Configured URL of the page a page ID or any of the given URLs refers
+        to, or None if none of them is a known page
+        """
+        keys = self._keys
+        if page_id:
+            url = keys.get(f'id:{page_id}')
+            if url is not None:
+                return url
+        for candidate in urls:
+            if candidate:
+                url = keys.get(canonical_page_url(candidate))
+                if url is not None:
+                    return url
+        return None
+
+    def name(self, url):
+        """
+        Organization name of a configured page URL ('' for unknown pages)
+        """
+        return self.names.get(url, '')
+
+    def learn(self, url, page_id=None, *seen_urls):
+        """
+        Remember the page ID and other URLs an actor reported for a configured
+        page, so later items (and runs) naming it that way are found too
+        """
+        aliases = [canonical_page_url(seen) for seen in seen_urls]
+        with self._lock:
+            self._learn(url, page_id, aliases)
+
+    def _learn(self, url, page_id, aliases):
+        if page_id:
+            page_id = str(page_id)
+            if self.page_ids.get(url) != page_id:
+                self.page_ids[url] = page_id
+                self._changed = True
+            self._keys.setdefault(f'id:{page_id}', url)
+        for key in aliases:
+            if key and key not in self._aliases[url] and self._keys.setdefault(key, url) == url:
+                self._aliases[url].add(key)
+                self._changed = True
+
+    def save(self):
+        """
+        Write the learned page IDs and URLs to the JSON file, if anything changed
+        """
+        if not self.path:
+            return
+        with self._lock:
+            if not self._changed:
+                return
+            learned = {url: {'name': self.names[url], 'page_id': self.page_ids.get(url),
+                             'aliases': sorted(self._aliases[url])}
+                       for url in self.names if url in self.page_ids or self._aliases[url]}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Merge with pages of other runs (e.g. the monitor's) written meanwhile
+            stored = self._load()
+            stored.update(learned)
+            temp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(stored, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+            self._changed = False
@@ -0,0 +1,152 @@
+"""
+Producer/consumer pipeline between actor runs and the work on their items
+A background thread starts each batch's actor run and reads its dataset into
+chunks on a bounded queue, while the caller processes the chunks it already
+has, so network waits and text processing overlap.
+"""
+
+import os
+import queue
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+# Dataset items per chunk handed to the caller, and chunks waiting at most
+# (the backpressure that keeps memory bounded while the caller is busy)
+PIPELINE_CHUNK_SIZE = int(os.getenv('PIPELINE_CHUNK_SIZE', 500))
+PIPELINE_MAX_CHUNKS = int(os.getenv('PIPELINE_MAX_CHUNKS', 8))
+
+# Marks the end of a batch's chunks on the queue
+_END = object()
+
+
+class BatchFeed:
+    """
+    One batch going through a FetchPipeline: chunks() yields its items in
+    chunks, then error holds the exception that stopped its run, if any.
+    start(feed) may keep its own state on the feed (run, unit...).
+    """
+
+    def __init__(self, pipeline, batch):
+        self.pipeline = pipeline
+        self.batch = batch
+        self.error = None
+        self._stopped = threading.Event()
+        # Set once the batch's end marker was taken off the queue
+        self._done = False
+
+    def chunks(self):
+        """
+        Lists of items of the batch as they are read, until its run is done
+        """
+        while not self._done:
+            chunk = self.pipeline._queue.get()
+            if chunk is _END:
+                self._done = True
+                return
+            if not self._stopped.is_set():
+                yield chunk
+
+    def drain(self):
+        """
+        Stop the batch and take the rest of its chunks off the queue, up to its end
+        """
+        self.stop()
+        for _ in self.chunks():
+            pass
+
+    def stop(self):
+        """
+        Stop reading the batch's dataset (its chunks already read are skipped)
+        """
+        self._stopped.set()
+
+    @property
+    def stopped(self):
+        return self._stopped.is_set()
+
+
+class FetchPipeline:
+    """
+    Runs start(feed) -> items for the feed of every batch, in order, in a
+    background thread, and hands the items over in chunks of chunk_size
+    through a queue of at most max_chunks chunks. Iterating the pipeline
+    yields each batch's BatchFeed once its run has started; the chunks of a
+    feed the caller did not read to the end (e.g. because processing it
+    failed) are skipped before the next feed is taken. The next batch's run
+    starts as soon as the current one's items are all on the queue.
+    """
+
+    def __init__(self, batches, start, chunk_size=PIPELINE_CHUNK_SIZE, max_chunks=PIPELINE_MAX_CHUNKS):
+        self.batches = list(batches)
+        self.start = start
+        self.chunk_size = max(1, chunk_size)
+        self._queue = queue.Queue(maxsize=max(1, max_chunks))
+        self._closed = threading.Event()
+        self._thread = None
+
+    def __iter__(self):
+        self._thread = threading.Thread(target=self._produce, name='fetch-pipeline', daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                feed = self._queue.get()
+                if feed is _END:
+                    return
+                yield feed
+                # Feeds and chunks share the queue
+                feed.drain()
+        finally:
+            self.close()
+
+    def _put(self, message):
+        # Wait for room on the queue unless the consumer has gone away
+        while not self._closed.is_set():
+            try:
+                self._queue.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        try:
+            for batch in self.batches:
+                if self._closed.is_set():
+                    return
+                feed = BatchFeed(self, batch)
+                # The feed is handed over once start() has set it up
+                try:
+                    items = self.start(feed)
+                except Exception as e:
+                    feed.error = e
+                    items = ()
+                if not self._put(feed):
+                    return
+                try:
+                    chunk = []
+                    for item in items:
+                        chunk.append(item)
+                        if len(chunk) >= self.chunk_size:
+                            if feed.stopped or not self._put(chunk):
+                                break
+                            chunk = []
+                    else:
+                        if chunk and not feed.stopped:
+                            self._put(chunk)
+                except Exception as e:
+                    feed.error = e
+                if not self._put(_END):
+                    return
+        finally:
+            self._put(_END)
+
+    def close(self):
+        """
+        Let the background thread stop (e.g. when the consumer fails half way):
+        it starts no more runs and puts nothing more on the queue
+        """
+        self._closed.set()
@@ -0,0 +1,445 @@
+"""
+Platform adapters: what each scraper asks its Apify actor and how it reads the items
+Every platform declares its actor, its input builder and its output columns as
+field paths with fallbacks and type coercions. The columns are compiled once
+into a single extractor function, so reading an item is one call with no
+per-field lookups of the declaration.
+"""
+
+# Fields are read with paths:
+#   'caption'            item['caption']
+#   'authorMeta.name'    a key of a nested dict
+#   'hashtags[].name'    that key of every dict in a list
+#   'websites[0]'        the first element of a list
+# A path starting with '$' reads an argument given to the extractor instead
+# (e.g. '$organization_name'). A missing key or a value of the wrong kind on
+# the way reads as None. With several paths the first non-empty value wins.
+
+
+class Field:
+    """
+    Column read from the item through one or more paths (fallbacks in order),
+    coerced to kind: 'raw' (as is), 'str' ('' for None), 'int' (numbers and
+    numeric strings, default otherwise) or 'join' (a list as "a, b, c").
+    default replaces a value that is None (or not a number for 'int').
+    """
+
+    KINDS = ('raw', 'str', 'int', 'join')
+
+    def __init__(self, *paths, kind='raw', default=None):
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown field kind: {kind}")
+        self.paths = paths
+        self.kind = kind
+        self.default = {'str': '', 'int': 0, 'join': ''}.get(kind) if default is None else default
+
+
+class Passed:
+    """
+    Column whose value is given to the extractor as a keyword argument of the
+    same name (e.g. 'fecha', computed by the scraper before extracting)
+    """
+
+
+class Computed:
+    """
+    Column computed by function(item), for values that don't fit a path
+    """
+
+    def __init__(self, function):
+        self.function = function
+
+
+def _to_int(value, default):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return default
+
+
+def _path_code(path, target):
+    """
+    Source lines that read path from `item` into the variable target
+    """
+    if path.startswith('$'):
+        return [f"{target} = {path[1:]}"]
+
+    head, projected, key = path.partition('[].')
+    if '.' in key or '[' in key:
+        raise ValueError(f"only one key may follow '[].': {path}")
+    lines = []
+    source = 'item'
+    for step in head.split('.'):
+        name, bracket, index = step.partition('[')
+        if source == 'item':
+            lines.append(f"{target} = get({name!r})")
+        else:
+            lines.append(f"{target} = {source}.get({name!r}) if {source}.__class__ is dict else None")
+        if bracket:
+            i = int(index.rstrip(']'))
+            lines.append(f"{target} = {target}[{i}] if {target}.__class__ is list and len({target}) > {i} else None")
+        source = target
+    if projected:
+        lines.append(f"{target} = [x.get({key!r}) for x in {target} if x.__class__ is dict] "
+                     f"if {target}.__class__ is list else None")
+    return lines
+
+
+def _read_code(paths, target):
+    """
+    Source lines that read the first non-empty of paths into target
+    """
+    lines = _path_code(paths[0], target)
+    for path in paths[1:]:
+        lines.append(f"if not {target}:")
+        lines.extend(f"    {line}" for line in _path_code(path, target))
+    return lines
+
+
+def _passed_names(columns):
+    names = [column for column, spec in columns if isinstance(spec, Passed)]
+    for _, spec in columns:
+        if isinstance(spec, Field):
+            names.extend(path[1:] for path in spec.paths if path.startswith('$') and path[1:] not in names)
+    return names
+
+
+def _field_code(spec, var, namespace):
+    """
+    Source lines that read a Field into var, coerced to its kind
+    """
+    default = f'd_{var}'
+    namespace[default] = spec.default
+    lines = _read_code(spec.paths, var)
+    if spec.kind == 'raw':
+        lines.append(f"if {var} is None: {var} = {default}")
+    elif spec.kind == 'str':
+        lines.append(f"if {var}.__class__ is not str: {var} = {default} if {var} is None else str({var})")
+    elif spec.kind == 'int':
+        lines.append(f"if {var}.__class__ is not int: {var} = _to_int({var}, {default})")
+    elif spec.kind == 'join':
+        lines.append(f"if {var}.__class__ is not list: {var} = {default}")
+        lines.append("else:")
+        lines.append(f"    try: {var} = ', '.join({var})")
+        lines.append(f"    except TypeError: {var} = ', '.join(str(x) for x in {var} if x is not None)")
+    return lines
+
+
+def _compile(name, params, body, namespace):
+    source = '\n'.join([f"def {name}({', '.join(params)}):"] + [f"    {line}" for line in body])
+    exec(compile(source, f'<{name}>', 'exec'), namespace)
+    function = namespace[name]
+    # Kept for debugging: print(platform.extract.source)
+    function.source = source
+    return function
+
+
+def compile_extractor(columns, name='extract'):
+    """
+    Compile (column, spec) pairs into extract(item, **passed) -> row dict,
+    with the columns in the order given
+    """
+    namespace = {'_to_int': _to_int}
+    body = []
+    values = []
+    for i, (column, spec) in enumerate(columns):
+        var = f'c{i}'
+        if isinstance(spec, Passed):
+            values.append(f"{column!r}: {column}")
+        elif isinstance(spec, Computed):
+            namespace[f'f_{var}'] = spec.function
+            values.append(f"{column!r}: f_{var}(item)")
+        else:
+            body.extend(_field_code(spec, var, namespace))
+            values.append(f"{column!r}: {var}")
+    body.insert(0, "get = item.get")
+    body.append("return {" + ', '.join(values) + "}")
+    params = ['item'] + [f'{passed}=None' for passed in _passed_names(columns)]
+    return _compile(name, params, body, namespace)
+
+
+def compile_reader(spec, name='read'):
+    """
+    Compile a single Field (or Computed) into read(item) -> value
+    """
+    if isinstance(spec, Computed):
+        return spec.function
+    namespace = {'_to_int': _to_int}
+    body = ["get = item.get"] + _field_code(spec, 'value', namespace) + ["return value"]
+    return _compile(name, ['item'], body, namespace)
+
+
+class Platform:
+    """
+    Adapter of one platform's Apify actor.
+    build_input(units, max_results, lower_bound, date_window) returns the run
+    input for a batch of units (hashtags, search terms or page URLs).
+    columns are the output columns as (column, Field/Passed/Computed) pairs,
+    compiled into platform.extract(item, **passed).
+    readers are other values read before extracting, each compiled into
+    platform.read_<name>(item): 'date' (the post's timestamp), 'source' (the
+    unit the actor reports having collected the item for) and 'tags' (the
+    item's own hashtags, passed on to extract() as tags) are used by the
+    shared engine.
+    newest_first means the actor returns each unit's items newest first, so
+    reading can stop at the first one older than the date window.
+    items_per_unit(max_results) is the number of items a run returns at most
+    per unit (default: max_results), for --plan estimates.
+    hashtag marks a platform scraped by hashtag or search term with the
+    shared engine, so the hashtag and control scrapers, the monitor and the
+    work queue all include it.
+    """
+
+    def __init__(self, name, label, noun, actor_id, id_column, build_input, columns, readers=None,
+                 newest_first=False, items_per_unit=None, hashtag=False):
+        self.name = name
+        self.label = label
+        self.noun = noun
+        self.actor_id = actor_id
+        self.id_column = id_column
+        self.build_input = build_input
+        self.columns = [column for column, _ in columns]
+        self.newest_first = newest_first
+        self.hashtag = hashtag
+        self.items_per_unit = items_per_unit or (lambda max_results: max_results)
+        # Compiled once per platform
+        self.extract = compile_extractor(columns, name=f'extract_{name}')
+        readers = {'date': None, 'source': None, 'tags': None, **(readers or {})}
+        for reader, spec in readers.items():
+            setattr(self, f'read_{reader}', compile_reader(spec, f'read_{name}_{reader}') if spec is not None else _read_nothing)
+
+    def __repr__(self):
+        return f"Platform({self.name!r}, {self.actor_id!r})"
+
+    def estimated_items(self, units, max_results):
+        """
+        Items a run over units is expected to return at most
+        """
+        return self.items_per_unit(max_results) * len(units)
+
+
+def _read_nothing(item):
+    return None
+
+
+# Platform name -> adapter
+PLATFORMS = {}
+
+
+def register_platform(platform):
+    """
+    Add a platform adapter to the registry (replacing one of the same name)
+    """
+    PLATFORMS[platform.name] = platform
+    return platform
+
+
+def _source_tag(item):
+    # Instagram reports the hashtag page it scraped: .../explore/tags/<tag>/
+    return (item.get('inputUrl') or '').rstrip('/').rsplit('/', 1)[-1]
+
+
+def instagram_input(hashtags, max_results, lower_bound, date_window):
+    run_input = {
+        "directUrls": [f"https://www.instagram.com/explore/tags/{hashtag.replace('#', '')}/" for hashtag in hashtags],
+        "resultsType": "posts",
+        "resultsLimit": max_results,
+    }
+    if lower_bound:
+        run_input["onlyPostsNewerThan"] = lower_bound
+    return run_input
+
+
+def tiktok_input(hashtags, max_results, lower_bound, date_window):
+    run_input = {
+        "hashtags": [hashtag.replace('#', '') for hashtag in hashtags],
+        "resultsPerPage": max_results,
+        "shouldDownloadVideos": False,
+        "shouldDownloadCovers": False,
+        "shouldDownloadSubtitles": False,
+    }
+    if lower_bound:
+        run_input["oldestPostDateUnified"] = lower_bound
+    if date_window.end_day:
+        run_input["newestPostDate"] = date_window.end_day
+    return run_input
+
+
+def twitter_input(search_terms, max_results, lower_bound, date_window):
+    # Using correct parameters from https://apify.com/apidojo/tweet-scraper
+    run_input = {
+        "searchTerms": list(search_terms),
+        # API requires minimum 50 tweets per query; maxItems covers the whole run
+        "maxItems": max(50, max_results) * len(search_terms),
+        "addUserInfo": True,
+        "sort": "Latest",
+    }
+    if lower_bound:
+        run_input["start"] = lower_bound
+    if date_window.until_day:
+        run_input["end"] = date_window.until_day
+    return run_input
+
+
+def twitter_url(item):
+    user = item.get('user')
+    if not isinstance(user, dict):
+        return ''
+    return f"https://twitter.com/{user.get('screen_name', 'i')}/status/{item.get('id_str', '')}"
+
+
+def facebook_pages_input(page_urls, max_results, lower_bound, date_window):
+    # Using correct parameters from https://apify.com/apify/facebook-pages-scraper
+    return {
+        "startUrls": [{"url": url} for url in page_urls],
+        "maxPagesPerQuery": len(page_urls),
+    }
+
+
+def facebook_posts_input(page_urls, max_results, lower_bound, date_window):
+    # Using https://apify.com/apify/facebook-posts-scraper
+    # max_results is per page; the limits cover the whole run, so a batch of
+    # pages asks for that many posts per page (the per-page cap is kept while reading)
+    run_input = {
+        "startUrls": [{"url": url} for url in page_urls],
+        "maxPosts": max_results * len(page_urls),
+        "resultsLimit": max_results * len(page_urls),
+    }
+    if lower_bound:
+        run_input["onlyPostsNewerThan"] = lower_bound
+    if date_window.until_day:
+        run_input["onlyPostsOlderThan"] = date_window.until_day
+    return run_input
+
+
+INSTAGRAM = register_platform(Platform(
+    'instagram', 'Instagram', 'posts', 'apify/instagram-scraper', 'post_id', instagram_input,
+    columns=[
+        ('post_id', Field('id', kind='str')),
+        ('usuario', Field('ownerUsername', kind='str')),
+        ('caption', Field('caption', kind='str')),
+        ('hashtags', Field('$tags', kind='join')),
+        ('likes', Field('likesCount', kind='int')),
+        ('comments', Field('commentsCount', kind='int')),
+        ('fecha', Passed()),
+        ('url', Field('url', kind='str')),
+        ('keyword', Passed()),
+    ],
+    readers={
+        'date': Field('timestamp'),
+        # The tag is the last segment of the URL
+        'source': Computed(_source_tag),
+        'tags': Field('hashtags'),
+    },
+    hashtag=True,
+))
+
+TIKTOK = register_platform(Platform(
+    'tiktok', 'TikTok', 'videos', 'clockworks/tiktok-scraper', 'video_id', tiktok_input,
+    columns=[
+        ('video_id', Field('id', kind='str')),
+        ('usuario', Field('authorMeta.name', kind='str')),
+        ('caption', Field('text', kind='str')),
+        ('hashtags', Field('$tags', kind='join')),
+        ('views', Field('playCount', kind='int')),
+        ('likes', Field('diggCount', kind='int')),
+        ('fecha', Passed()),
+        ('url', Field('webVideoUrl', kind='str')),
+        ('keyword', Passed()),
+    ],
+    readers={
+        # Epoch seconds, or ISO as a fallback
+        'date': Field('createTime', 'createTimeISO'),
+        'source': Field('searchHashtag.name', kind='str'),
+        'tags': Field('hashtags[].name'),
+    },
+    hashtag=True,
+))
+
+TWITTER = register_platform(Platform(
+    'twitter', 'Twitter', 'tweets', 'apidojo/tweet-scraper', 'tweet_id', twitter_input,
+    columns=[
+        ('tweet_id', Field('id_str', kind='str')),
+        ('usuario', Field('user.screen_name', kind='str')),
+        ('texto', Field('full_text', 'text', kind='str')),
+        ('hashtags', Field('$tags', kind='join')),
+        ('likes', Field('favorite_count', kind='int')),
+        ('retweets', Field('retweet_count', kind='int')),
+        ('replies', Field('reply_count', kind='int')),
+        ('views', Field('view_count', kind='int')),
+        ('fecha', Passed()),
+        ('url', Computed(twitter_url)),
+        ('keyword', Passed()),
+    ],
+    readers={
+        # "Wed Nov 18 17:00:00 +0000 2025"
+        'date': Field('created_at'),
+        'source': Field('searchTerm', kind='str'),
+        'tags': Field('entities.hashtags[].text'),
+    },
+    # Searched with sort: Latest
+    newest_first=True,
+    # At least 50 tweets per search term (see twitter_input)
+    items_per_unit=lambda max_results: max(50, max_results),
+    hashtag=True,
+))
+
+FACEBOOK_PAGES = register_platform(Platform(
+    'facebook_pages', 'Facebook Pages', 'páginas', 'apify/facebook-pages-scraper', 'page_url', facebook_pages_input,
+    columns=[
+        ('nombre_organizacion', Passed()),
+        ('page_name', Field('title', 'pageName', kind='str')),
+        ('page_url', Field('pageUrl', 'facebookUrl', kind='str')),
+        ('page_id', Field('pageId', kind='str')),
+        ('categoria', Field('categories', kind='join')),
+        ('likes', Field('likes', kind='int')),
+        ('followers', Field('followers', kind='int')),
+        ('intro', Field('intro', kind='str')),
+        ('website', Field('websites[0]', 'website', kind='str')),
+        ('email', Field('email', kind='str')),
+        ('telefono', Field('phone', 'phoneNumber', kind='str')),
+        ('direccion', Field('address', kind='str')),
+        ('rating', Field('rating', default='')),
+        ('rating_count', Field('ratingCount', kind='int')),
+        ('messenger', Field('messenger', kind='str')),
+        ('checkins', Field('checkins', kind='int')),
+        ('ad_library_id', Field('adLibraryPageId', kind='str')),
+        ('ad_status', Computed(lambda item: 'Sí' if item.get('adsAreRunning') else 'No')),
+        ('profile_picture_url', Field('profilePictureUrl', kind='str')),
+        ('cover_photo_url', Field('coverPhotoUrl', kind='str')),
+    ],
+    readers={
+        'page_url': Field('pageUrl', kind='str'),
+        'facebook_url': Field('facebookUrl', kind='str'),
+        'page_id': Field('pageId', kind='str'),
+    },
+    # One item per page
+    items_per_unit=lambda max_results: 1,
+))
+
+FACEBOOK_POSTS = register_platform(Platform(
+    'facebook_posts', 'Facebook Posts', 'posts', 'apify/facebook-posts-scraper', 'post_id', facebook_posts_input,
+    columns=[
+        ('post_id', Passed()),
+        ('organization_name', Passed()),
+        ('page_name', Field('pageName', '$organization_name', kind='str')),
+        ('texto', Passed()),
+        ('likes', Field('likes', 'likeCount', kind='int')),
+        ('comments', Field('comments', 'commentCount', kind='int')),
+        ('shares', Field('shares', 'shareCount', kind='int')),
+        ('fecha', Passed()),
+        ('url', Field('url', 'postUrl', kind='str')),
+        ('keywords_matched', Passed()),
+        ('num_keywords', Passed()),
+    ],
+    # Read before extracting, to filter posts by text, date and ID and to
+    # attribute them to their page
+    readers={
+        'text': Field('text', 'postText', kind='str'),
+        'date': Field('time', 'date', kind='str'),
+        'id': Field('postId', 'id', kind='str'),
+        'input_url': Field('inputUrl', kind='str'),
+        'facebook_url': Field('facebookUrl', kind='str'),
+        'page_id': Field('facebookId', 'pageId', kind='str'),
+    },
+))
@@ -0,0 +1,156 @@
+"""
+SQLite store of every collected post, kept across runs
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from dotenv import load_dotenv
+from sinks import ENGAGEMENT_COLUMNS, platform_name
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+# Also upsert every scraper's rows into a SQLite database
+POST_STORE = os.getenv('POST_STORE', 'false').lower() == 'true'
+POST_STORE_PATH = os.getenv('POST_STORE_PATH', 'output/posts.sqlite')
+
+
+def _to_int(value):
+    if value is None or value == '':
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_text(value):
+    if value is None or value != value:  # None or NaN
+        return None
+    return str(value)
+
+
+class PostStore:
+    """
+    SQLite database with one table per platform (named like the Parquet
+    platforms: instagram, tiktok_control, facebook_posts...) keyed on the post
+    ID. Posts seen again are updated in place, so engagement counts stay
+    current instead of being duplicated. The keywords of each post are kept in
+    a <platform>_keywords table, so a post found under new keywords later
+    keeps the old ones too.
+    """
+
+    def __init__(self, path=POST_STORE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._tables = set()
+
+    def table(self, output_file, id_column, keyword_column=None, index_columns=('fecha', 'usuario'), columns=None):
+        """
+        Table for a scraper's output file, written through its write(rows)
+        """
+        return PostTable(self, platform_name(output_file), id_column, keyword_column, index_columns, columns)
+
+    def _create_table(self, table, columns, id_column, keyword_column, index_columns):
+        definitions = [f'"{column}" INTEGER' if column in ENGAGEMENT_COLUMNS else f'"{column}" TEXT' for column in columns]
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS "{table}" (
+                {', '.join(definitions)},
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY ("{id_column}")
+            )
+        """)
+        # Columns added to the scraper output since the table was created
+        existing = {row[1] for row in self._conn.execute(f'PRAGMA table_info("{table}")')}
+        for column in columns:
+            if column not in existing:
+                kind = 'INTEGER' if column in ENGAGEMENT_COLUMNS else 'TEXT'
+                self._conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {kind}')
+        for column in index_columns:
+            if column in columns:
+                self._conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{column}" ON "{table}" ("{column}")')
+        if keyword_column:
+            self._conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS "{table}_keywords" (
+                    keyword TEXT NOT NULL,
+                    "{id_column}" TEXT NOT NULL,
+                    PRIMARY KEY (keyword, "{id_column}")
+                )
+            """)
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_keywords_id" ON "{table}_keywords" ("{id_column}")')
+
+    def upsert(self, table, rows, id_column, keyword_column=None, index_columns=()):
+        """
+        Insert or update a batch of rows in a single transaction
+        """
+        rows = [row for row in rows if row.get(id_column)]
+        if not rows:
+            return
+
+        columns = [column for column in rows[0] if column != keyword_column]
+        values = []
+        keywords = []
+        now = time.time()
+        for row in rows:
+            values.append([_to_int(row.get(column)) if column in ENGAGEMENT_COLUMNS else _to_text(row.get(column))
+                           for column in columns] + [now, now])
+            if keyword_column and row.get(keyword_column):
+                for keyword in str(row[keyword_column]).split(', '):
+                    keywords.append((keyword, str(row[id_column])))
+
+        quoted = ', '.join(f'"{column}"' for column in columns)
+        updates = ', '.join(f'"{column}" = excluded."{column}"' for column in columns if column != id_column)
+        with self._lock, self._conn:
+            if table not in self._tables:
+                self._create_table(table, columns, id_column, keyword_column, index_columns)
+                self._tables.add(table)
+            self._conn.executemany(
+                f"""
+                INSERT INTO "{table}" ({quoted}, first_seen, last_seen) VALUES ({', '.join('?' * (len(columns) + 2))})
+                ON CONFLICT ("{id_column}") DO UPDATE SET {updates}, last_seen = excluded.last_seen
+                """,
+                values,
+            )
+            if keywords:
+                self._conn.executemany(
+                    f'INSERT OR IGNORE INTO "{table}_keywords" (keyword, "{id_column}") VALUES (?, ?)',
+                    keywords,
+                )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class PostTable:
+    """
+    One platform's table in a PostStore, with the write(rows) interface of a
+    ParquetDataset so the sinks can copy rows to either
+    """
+
+    def __init__(self, store, table, id_column, keyword_column=None, index_columns=('fecha', 'usuario'), columns=None):
+        self.store = store
+        self.table = table
+        self.id_column = id_column
+        self.keyword_column = keyword_column
+        self.index_columns = index_columns
+        self.columns = columns
+
+    def write(self, rows):
+        """
+        Upsert rows (a list of dicts or a DataFrame)
+        """
+        if hasattr(rows, 'to_dict'):
+            rows = rows.to_dict('records')
+        if self.columns:
+            rows = [{column: row.get(column) for column in self.columns} for row in rows]
+        self.store.upsert(self.table, rows, self.id_column, self.keyword_column, self.index_columns)
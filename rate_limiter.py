@@ -0,0 +1,203 @@
+"""
+Adaptive pacing, retries, circuit breaking and batch sizing for Apify actor calls
+"""
+
+import os
+import time
+import random
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+# Actor runs started per minute for each actor, to begin with and at most/least
+ACTOR_CALLS_PER_MINUTE = float(os.getenv('ACTOR_CALLS_PER_MINUTE', 30))
+ACTOR_MAX_CALLS_PER_MINUTE = float(os.getenv('ACTOR_MAX_CALLS_PER_MINUTE', 120))
+ACTOR_MIN_CALLS_PER_MINUTE = float(os.getenv('ACTOR_MIN_CALLS_PER_MINUTE', 2))
+# Attempts per actor run before giving up on transient errors (429, 5xx, failed runs)
+ACTOR_MAX_ATTEMPTS = int(os.getenv('ACTOR_MAX_ATTEMPTS', 4))
+# Backoff before retry n is a random delay up to min(max, base * 2^n) seconds
+ACTOR_RETRY_BASE_DELAY = float(os.getenv('ACTOR_RETRY_BASE_DELAY', 5))
+ACTOR_RETRY_MAX_DELAY = float(os.getenv('ACTOR_RETRY_MAX_DELAY', 120))
+# Consecutive calls failing all their attempts on transient errors after which an actor is skipped for a cooldown
+CIRCUIT_BREAKER_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_THRESHOLD', 3))
+CIRCUIT_BREAKER_COOLDOWN = float(os.getenv('CIRCUIT_BREAKER_COOLDOWN', 600))
+
+# Final statuses of an actor run that are worth retrying
+RETRYABLE_RUN_STATUSES = {'FAILED', 'TIMED-OUT', 'TIMING-OUT', 'ABORTED', 'ABORTING'}
+
+
+class ActorRunError(Exception):
+    """
+    An actor run that did not succeed
+    """
+
+    def __init__(self, actor_id, run):
+        super().__init__(f"{actor_id} run {run.get('id')} finished with status {run.get('status')}")
+        self.run = run
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an actor that keeps failing
+    """
+
+
+def is_transient(error):
+    """
+    Whether an actor call error is worth retrying: rate limits, server
+    errors, failed or timed out runs and network errors
+    """
+    status_code = getattr(error, 'status_code', None)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    return isinstance(error, (ActorRunError, ConnectionError, TimeoutError))
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket that paces the calls to one actor. The rate goes up a little
+    after every successful call and is halved when the API pushes back.
+    """
+
+    def __init__(self, calls_per_minute=ACTOR_CALLS_PER_MINUTE, max_calls_per_minute=ACTOR_MAX_CALLS_PER_MINUTE,
+                 min_calls_per_minute=ACTOR_MIN_CALLS_PER_MINUTE):
+        self.rate = calls_per_minute / 60
+        self.max_rate = max_calls_per_minute / 60
+        self.min_rate = min_calls_per_minute / 60
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Wait until a call may start
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(1.0, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate * 1.25)
+
+    def throttled(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+
+class CircuitBreaker:
+    """
+    Stops calling an actor after threshold consecutive calls failed all their
+    attempts on transient errors, until cooldown seconds have passed; then one
+    trial call is let through.
+    """
+
+    def __init__(self, threshold=CIRCUIT_BREAKER_THRESHOLD, cooldown=CIRCUIT_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def check(self, actor_id):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown:
+                raise CircuitOpenError(f"{actor_id} failed {self.failures} times in a row, skipped for now")
+            # Half open: let the next call try again
+            self.opened_at = None
+            self.failures = self.threshold - 1
+
+    def succeeded(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failed(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class AdaptiveBatchSize:
+    """
+    Units (e.g. Facebook pages) per actor run. After a successful run the size
+    moves towards the number of units that fit in target_seconds at the run's
+    speed (at most doubling at once); after a failed run it is halved.
+    """
+
+    def __init__(self, size, max_size, target_seconds, min_size=1):
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size)
+        self.size = min(max(size, min_size), self.max_size)
+        self.target_seconds = target_seconds
+        self._lock = threading.Lock()
+
+    def succeeded(self, units, seconds):
+        """
+        Adapt the size to a run over units that took seconds
+        """
+        with self._lock:
+            if seconds > 0:
+                fitting = int(self.target_seconds * units / seconds)
+            else:
+                fitting = self.max_size
+            self.size = min(max(fitting, self.min_size), self.size * 2, self.max_size)
+
+    def failed(self):
+        with self._lock:
+            self.size = max(self.min_size, self.size // 2)
+
+
+_limiters = {}
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def limiter_for(actor_id):
+    with _registry_lock:
+        if actor_id not in _limiters:
+            _limiters[actor_id] = AdaptiveRateLimiter()
+            _breakers[actor_id] = CircuitBreaker()
+        return _limiters[actor_id], _breakers[actor_id]
+
+
+def call_with_retries(actor_id, call, max_attempts=ACTOR_MAX_ATTEMPTS):
+    """
+    Run call() under the actor's rate limiter and circuit breaker, retrying
+    transient errors with exponential backoff and jitter
+    """
+    limiter, breaker = limiter_for(actor_id)
+    for attempt in range(max_attempts):
+        breaker.check(actor_id)
+        limiter.acquire()
+        try:
+            result = call()
+        except Exception as e:
+            if not is_transient(e):
+                # Bad input and the like fail the same way every time; they
+                # say nothing about the actor's health
+                raise
+            if attempt + 1 == max_attempts:
+                breaker.failed()
+                raise
+            limiter.throttled()
+            delay = random.uniform(0, min(ACTOR_RETRY_MAX_DELAY, ACTOR_RETRY_BASE_DELAY * 2 ** attempt))
+            print(f"  ⚠ {e} - retrying in {delay:.0f}s ({attempt + 1}/{max_attempts - 1})")
+            time.sleep(delay)
+            continue
+        limiter.succeeded()
+        breaker.succeeded()
+        return result
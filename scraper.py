@@ -5,334 +5,490 @@ Main scraper script for TikTok, Instagram, and Facebook using Apify
 import os
 import json
 import time
-from datetime import datetime
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from apify_client import ApifyClient
-import pandas as pd
 from keywords import KEYWORDS
+from platforms import PLATFORMS
+from timestamps import DateWindow, format_fecha, parse_timestamp
+import metrics
+from sinks import CSVStreamWriter, DeduplicatingSink, ENGAGEMENT_COLUMNS, ParquetDataset, PARQUET_OUTPUT, STREAM_OUTPUT, platform_name, save_csv
+from summaries import RunningSummary, SummarizingSink
+from actor_runs import apify_client, configure_cache, planned_run, print_plan, run_actor
+from post_store import POST_STORE, PostStore
+from checkpoints import CheckpointStore, HighWaterMark, checkpoint_scope, existing_checkpoints, oldest_lower_bound, pending_units, restore_finished_units
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Apify client
-APIFY_TOKEN = os.getenv('APIFY_API_TOKEN')
-if not APIFY_TOKEN:
-    raise ValueError("APIFY_API_TOKEN not found in environment variables. Please create a .env file.")
-
-client = ApifyClient(APIFY_TOKEN)
+# Apify client: None uses the shared one, created on first actor run
+# (see actor_runs.apify_client); benchmarks put a stand-in here
+client = None
 
 # Configuration
 MAX_RESULTS_PER_KEYWORD = int(os.getenv('MAX_RESULTS_PER_KEYWORD', 100))
 RESULTS_LIMIT = int(os.getenv('RESULTS_LIMIT', 1000))
+# Maximum actor runs kept in flight per platform (1 = one keyword at a time)
+MAX_CONCURRENT_RUNS = int(os.getenv('MAX_CONCURRENT_RUNS', 1))
+# Platforms scraped by hashtag or search term (registered with hashtag=True)
+HASHTAG_PLATFORMS = [name for name, platform in PLATFORMS.items() if platform.hashtag]
+# Per-platform run budgets (<PLATFORM>_MAX_CONCURRENT_RUNS), each falling back to MAX_CONCURRENT_RUNS
+PLATFORM_CONCURRENT_RUNS = {
+    platform: int(os.getenv(f'{platform.upper()}_MAX_CONCURRENT_RUNS', MAX_CONCURRENT_RUNS))
+    for platform in HASHTAG_PLATFORMS
+}
+# Hashtags packed into a single actor run (1 = one run per hashtag)
+KEYWORD_BATCH_SIZE = int(os.getenv('KEYWORD_BATCH_SIZE', 1))
+# Run the Instagram, TikTok and Twitter scrapers at the same time
+PARALLEL_PLATFORMS = os.getenv('PARALLEL_PLATFORMS', 'true').lower() == 'true'
+# Write a post found under several keywords once, with all its keywords (false = one row per keyword)
+DEDUPLICATE_POSTS = os.getenv('DEDUPLICATE_POSTS', 'true').lower() == 'true'
 
-# Date filter for 2025 onwards
-START_DATE = "2025-01-01"
+# Date window of collected posts (YYYY-MM-DD, both inclusive; no END_DATE = up to today)
+START_DATE = os.getenv('START_DATE', '2025-01-01')
+END_DATE = os.getenv('END_DATE') or None
+DATE_WINDOW = DateWindow(START_DATE, END_DATE)
 
 
-def scrape_instagram(hashtags, output_file='instagram_data.csv'):
+def keyword_units(hashtags):
     """
-    Scrape Instagram posts using hashtags
-    Output: post_id, usuario, caption, hashtags, likes, comments, fecha, url
+    (keyword, hashtag) pairs a platform run goes through
     """
-    print(f"\n{'='*60}")
-    print("Starting Instagram scraping...")
-    print(f"{'='*60}\n")
+    return list(hashtags.items())[:10]  # Start with first 10 keywords
+
+
+def keyword_batches(keyword_items, batch_size=KEYWORD_BATCH_SIZE):
+    """
+    Split (keyword, hashtag) pairs into batches of batch_size, one actor run each
+    """
+    batch_size = max(1, batch_size)
+    return [keyword_items[i:i+batch_size] for i in range(0, len(keyword_items), batch_size)]
+
+
+def batch_run_input(platform, batch, checkpoints=None, incremental=False, date_window=DATE_WINDOW):
+    """
+    High-water marks (keyword -> HighWaterMark) and actor run input of a batch
+    of (keyword, hashtag) pairs
+    """
+    # Newest post collected so far per keyword, for incremental runs
+    marks = {keyword: HighWaterMark(checkpoints, platform.name, keyword) for keyword, _ in batch}
+    # Oldest post date asked from the actor: the window start, or later
+    # for incremental runs
+    lower_bound = date_window.lower_bound(oldest_lower_bound(marks.values()) if incremental else None)
+    run_input = platform.build_input([hashtag for _, hashtag in batch], MAX_RESULTS_PER_KEYWORD, lower_bound, date_window)
+    return marks, run_input
+
+
+def run_keywords(keyword_items, scrape_batch, max_concurrent_runs=MAX_CONCURRENT_RUNS, batch_size=KEYWORD_BATCH_SIZE):
+    """
+    Split keyword_items into batches of batch_size (keyword, hashtag) pairs and
+    run scrape_batch(batch) for each, keeping up to max_concurrent_runs actor
+    runs in flight at once.
+    Yields each batch's results in the original keyword order.
+    """
+    batches = keyword_batches(keyword_items, batch_size)
     
-    all_results = []
+    if max_concurrent_runs <= 1:
+        for batch in batches:
+            yield scrape_batch(batch)
+        return
     
-    for keyword, hashtag in list(hashtags.items())[:10]:  # Start with first 10 keywords
-        print(f"Scraping Instagram for: {hashtag}")
-        
-        try:
-            # Configure the Actor input
-            run_input = {
-                "directUrls": [f"https://www.instagram.com/explore/tags/{hashtag.replace('#', '')}/"],
-                "resultsType": "posts",
-                "resultsLimit": MAX_RESULTS_PER_KEYWORD,
-            }
-            
-            # Run the Actor and wait for it to finish
-            print(f"  → Running Apify actor...")
-            run = client.actor("apify/instagram-scraper").call(run_input=run_input)
-            
-            # Fetch results from the dataset
-            dataset_items = []
-            for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-                dataset_items.append(item)
-            
-            print(f"  → Found {len(dataset_items)} posts")
-            
-            # Process results
-            for item in dataset_items:
-                try:
-                    # Parse timestamp
-                    post_date = None
-                    if 'timestamp' in item and item['timestamp']:
-                        post_date = datetime.fromisoformat(item['timestamp'].replace('Z', '+00:00'))
-                        # Filter by date (2025 onwards)
-                        if post_date.year < 2025:
-                            continue
-                    
-                    result = {
-                        'post_id': item.get('id', ''),
-                        'usuario': item.get('ownerUsername', ''),
-                        'caption': item.get('caption', ''),
-                        'hashtags': ', '.join(item.get('hashtags', [])) if isinstance(item.get('hashtags'), list) else '',
-                        'likes': item.get('likesCount', 0),
-                        'comments': item.get('commentsCount', 0),
-                        'fecha': post_date.strftime('%Y-%m-%d %H:%M:%S') if post_date else '',
-                        'url': item.get('url', ''),
-                        'keyword': keyword
-                    }
-                    all_results.append(result)
-                except Exception as e:
-                    print(f"  ⚠ Error processing item: {e}")
-                    continue
-            
-            # Respect rate limits
-            time.sleep(2)
-            
-        except Exception as e:
-            print(f"  ✗ Error scraping {hashtag}: {e}")
-            continue
+    with ThreadPoolExecutor(max_workers=max_concurrent_runs) as executor:
+        futures = [executor.submit(scrape_batch, batch) for batch in batches]
+        for future in futures:
+            yield future.result()
+
+
+def normalize_tag(tag):
+    """
+    Hashtag without '#', surrounding spaces or case, for comparisons
+    """
+    return str(tag).replace('#', '').strip().lower()
+
+
+def batch_keywords_for_item(tag_keywords, source_tag, item_tags):
+    """
+    Keywords of a batched run that an item belongs to.
+    tag_keywords maps each normalized batch hashtag to its keyword. The hashtag
+    the actor reports having collected the item for wins; otherwise the item is
+    attributed to every batch hashtag it carries.
+    """
+    if len(tag_keywords) == 1:
+        return list(tag_keywords.values())
     
-    # Save to CSV
-    if all_results:
-        df = pd.DataFrame(all_results)
-        df.to_csv(output_file, index=False, encoding='utf-8-sig')
-        print(f"\n✓ Instagram data saved to {output_file}")
-        print(f"  Total posts collected: {len(all_results)}")
-    else:
-        print("\n⚠ No Instagram data collected")
+    if source_tag:
+        keyword = tag_keywords.get(normalize_tag(source_tag))
+        if keyword:
+            return [keyword]
     
-    return all_results
+    keywords = []
+    for tag in item_tags:
+        keyword = tag_keywords.get(normalize_tag(tag))
+        if keyword and keyword not in keywords:
+            keywords.append(keyword)
+    return keywords
 
 
-def scrape_tiktok(hashtags, output_file='tiktok_data.csv'):
+def save_batch_checkpoint(checkpoints, output_file, batch, run, batch_results):
     """
-    Scrape TikTok videos using hashtags
-    Output: video_id, usuario, caption, hashtags, views, likes, fecha, url
+    Record every keyword of a finished batch with its run ID and rows
+    """
+    if checkpoints is None:
+        return
+    
+    scope = checkpoint_scope(output_file)
+    for keyword, _ in batch:
+        keyword_rows = [row for row in batch_results if row['keyword'] == keyword]
+        checkpoints.mark_done(scope, keyword, run.get('id'), keyword_rows)
+
+
+def scrape_platform(platform, hashtags, output_file=None, max_concurrent_runs=MAX_CONCURRENT_RUNS, stream=STREAM_OUTPUT,
+                    batch_size=KEYWORD_BATCH_SIZE, checkpoints=None, resume=False, incremental=False, deduplicate=DEDUPLICATE_POSTS,
+                    parquet=PARQUET_OUTPUT, store=None, date_window=DATE_WINDOW, save=True):
     """
+    Scrape one platform (a platforms.Platform adapter, e.g. PLATFORMS['tiktok'])
+    for a dict of keyword -> hashtag or search term
+    Output: the platform's columns
+    With save=False the rows are only returned, not written (work queue
+    workers leave that to the export). The results' failed attribute lists
+    the hashtags whose actor run still failed after retries.
+    """
+    output_file = output_file or f'{platform.name}_data.csv'
+    id_column = platform.id_column
     print(f"\n{'='*60}")
-    print("Starting TikTok scraping...")
+    print(f"Starting {platform.label} scraping...")
     print(f"{'='*60}\n")
     
-    all_results = []
+    # In streaming mode rows go straight to the output file in chunks.
+    # Incremental runs only collect new posts, so they add to the existing file.
+    # With parquet=True rows are also added to the Parquet dataset next to the CSV.
+    # Rows are upserted into the store's table if a PostStore is given.
+    dataset = ParquetDataset(output_file, replace=not incremental) if parquet else None
+    table = store.table(output_file, id_column, keyword_column='keyword') if store is not None else None
+    all_results = CSVStreamWriter(output_file, append=incremental, parquet=dataset, store=table) if stream else []
+    if deduplicate:
+        # One row per post ID with every keyword it was found under
+        all_results = DeduplicatingSink(all_results, id_column, stream=stream)
+    # Totals, top keywords and users, updated as rows come in
+    summary = RunningSummary(sum_columns=[column for column in platform.columns if column in ENGAGEMENT_COLUMNS],
+                             group_columns=['usuario'], keyword_column='keyword', id_column=id_column)
+    all_results = SummarizingSink(all_results, summary)
+    
+    # Hashtags whose actor run still failed after retries
+    failed_hashtags = []
+    # The adapter's compiled readers, as locals for the per-item loop
+    read_date, read_source, read_tags, extract = platform.read_date, platform.read_source, platform.read_tags, platform.extract
     
-    for keyword, hashtag in list(hashtags.items())[:10]:  # Start with first 10 keywords
-        print(f"Scraping TikTok for: {hashtag}")
+    def scrape_batch(batch):
+        # Normalized hashtag -> keyword, used to route the items of a multi-hashtag run
+        tag_keywords = {normalize_tag(hashtag): keyword for keyword, hashtag in batch}
+        # Every item of a single-hashtag run is that hashtag's
+        single_keyword = [batch[0][0]] if len(batch) == 1 else None
+        batch_hashtags = ', '.join(hashtag for _, hashtag in batch)
+        # Timings and item counts of this batch's run
+        unit = metrics.unit(platform_name(output_file), batch_hashtags)
+        print(f"Scraping {platform.label} for: {batch_hashtags}")
+        batch_results = []
+        unattributed = 0
         
         try:
-            # Configure the Actor input
-            run_input = {
-                "hashtags": [hashtag.replace('#', '')],
-                "resultsPerPage": MAX_RESULTS_PER_KEYWORD,
-                "shouldDownloadVideos": False,
-                "shouldDownloadCovers": False,
-                "shouldDownloadSubtitles": False,
-            }
+            marks, run_input = batch_run_input(platform, batch, checkpoints, incremental, date_window)
             
             # Run the Actor and wait for it to finish
             print(f"  → Running Apify actor...")
-            run = client.actor("clockworks/tiktok-scraper").call(run_input=run_input)
-            
-            # Fetch results from the dataset
-            dataset_items = []
-            for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-                dataset_items.append(item)
-            
-            print(f"  → Found {len(dataset_items)} videos")
+            run, items = run_actor(client, platform.actor_id, run_input, unit=unit)
             
-            # Process results
-            for item in dataset_items:
+            # Process results as they come off the dataset
+            items_found = 0
+            # Hashtags whose results already went past the window start
+            finished_tags = set()
+            for item in items:
+                items_found += 1
                 try:
-                    # Parse timestamp
-                    post_date = None
-                    if 'createTime' in item and item['createTime']:
-                        post_date = datetime.fromtimestamp(item['createTime'])
-                        # Filter by date (2025 onwards)
-                        if post_date.year < 2025:
-                            continue
-                    elif 'createTimeISO' in item and item['createTimeISO']:
-                        post_date = datetime.fromisoformat(item['createTimeISO'].replace('Z', '+00:00'))
-                        if post_date.year < 2025:
+                    post_date = parse_timestamp(read_date(item), platform.name)
+                    if date_window.too_old(post_date):
+                        unit.drop('date')
+                        if platform.newest_first:
+                            # A hashtag is done at its first item older than the window
+                            finished_tags.add(normalize_tag(read_source(item)) if len(batch) > 1 else '')
+                            if len(batch) == 1 or finished_tags >= tag_keywords.keys():
+                                break
+                        continue
+                    if date_window.too_new(post_date):
+                        unit.drop('date')
+                        continue
+                    
+                    # Attribute the item to the hashtag(s) it was collected for
+                    tags = read_tags(item)
+                    if single_keyword:
+                        item_keywords = single_keyword
+                    else:
+                        item_keywords = batch_keywords_for_item(tag_keywords, read_source(item), tags or ())
+                    if not item_keywords:
+                        unattributed += 1
+                        unit.drop('unattributed')
+                        continue
+                    
+                    result = extract(item, fecha=format_fecha(post_date), keyword=item_keywords[0], tags=tags)
+                    
+                    if incremental:
+                        # Skip posts already collected by an earlier run, and stop
+                        # reading once every keyword only returns old content
+                        item_keywords = [keyword for keyword in item_keywords if not marks[keyword].seen(result['fecha'], result[id_column])]
+                        if all(mark.exhausted for mark in marks.values()):
+                            break
+                        if not item_keywords:
+                            unit.drop('seen')
                             continue
                     
-                    result = {
-                        'video_id': item.get('id', ''),
-                        'usuario': item.get('authorMeta', {}).get('name', '') if isinstance(item.get('authorMeta'), dict) else '',
-                        'caption': item.get('text', ''),
-                        'hashtags': ', '.join([tag.get('name', '') for tag in item.get('hashtags', [])]) if isinstance(item.get('hashtags'), list) else '',
-                        'views': item.get('playCount', 0),
-                        'likes': item.get('diggCount', 0),
-                        'fecha': post_date.strftime('%Y-%m-%d %H:%M:%S') if post_date else '',
-                        'url': item.get('webVideoUrl', ''),
-                        'keyword': keyword
-                    }
-                    all_results.append(result)
+                    for keyword in item_keywords:
+                        marks[keyword].observe(result['fecha'], result[id_column])
+                        batch_results.append(result if keyword == result['keyword'] else {**result, 'keyword': keyword})
+                    unit.count('kept')
                 except Exception as e:
                     print(f"  ⚠ Error processing item: {e}")
+                    unit.drop('error')
                     continue
             
-            # Respect rate limits
-            time.sleep(2)
+            print(f"  → Found {items_found} {platform.noun}")
+            if unattributed:
+                print(f"  ⚠ {unattributed} {platform.noun} could not be attributed to a hashtag of the batch")
+            
+            save_batch_checkpoint(checkpoints, output_file, batch, run, batch_results)
+            for mark in marks.values():
+                mark.save()
+            unit.finish()
             
         except Exception as e:
-            print(f"  ✗ Error scraping {hashtag}: {e}")
-            continue
+            print(f"  ✗ Error scraping {batch_hashtags}: {e}")
+            unit.finish(error=e)
+            failed_hashtags.extend(hashtag for _, hashtag in batch)
+        
+        return batch_results
+    
+    keyword_items = keyword_units(hashtags)
+    pending_items = restore_finished_units(checkpoints, output_file, keyword_items, all_results, resume)
+    if len(pending_items) < len(keyword_items):
+        print(f"↻ Resuming: {len(keyword_items) - len(pending_items)} keywords already done, {len(pending_items)} left\n")
+    keyword_items = pending_items
+    try:
+        for batch_results in run_keywords(keyword_items, scrape_batch, max_concurrent_runs, batch_size):
+            all_results.extend(batch_results)
+            if stream:
+                all_results.flush()
+            print(f"  Σ {summary.rows} {platform.noun} so far ({summary.totals_text()})")
+    finally:
+        # Keep whatever was collected if the sweep dies half way
+        if stream:
+            all_results.close()
+    
+    all_results.failed = failed_hashtags
+    if failed_hashtags:
+        print(f"\n⚠ Failed after retries: {', '.join(failed_hashtags)} (run again with --resume to retry them)")
     
     # Save to CSV
     if all_results:
-        df = pd.DataFrame(all_results)
-        df.to_csv(output_file, index=False, encoding='utf-8-sig')
-        print(f"\n✓ TikTok data saved to {output_file}")
-        print(f"  Total videos collected: {len(all_results)}")
+        if save and not stream:
+            save_csv(all_results, output_file, append=incremental, parquet=dataset, store=table)
+        if save or stream:
+            print(f"\n✓ {platform.label} data saved to {output_file}")
+        print(f"  Total {platform.noun} collected: {len(all_results)}")
+        if deduplicate and all_results.duplicates:
+            print(f"  Found under several keywords (merged): {all_results.duplicates}")
+        print_platform_summary(platform, summary)
     else:
-        print("\n⚠ No TikTok data collected")
+        print(f"\n⚠ No {platform.label} data collected")
     
     return all_results
 
 
-def scrape_twitter(keywords, output_file='twitter_data.csv'):
+def print_platform_summary(platform, summary, k=5):
+    """
+    Print the top keywords with their engagement, the top users and the
+    engagement totals of a platform's run
+    """
+    print("  Top keywords:")
+    for keyword, count in summary.top('keyword', k):
+        print(f"    {keyword}: {count} {platform.noun} ({summary.breakdown_text('keyword', keyword)})")
+    print(f"  Top users: {', '.join(f'{user} ({count})' for user, count in summary.top('usuario', k))}")
+    print(f"  Engagement: {summary.totals_text()}")
+    if 'likes' in summary.sums:
+        print(f"  Average likes: {summary.mean('likes'):.1f}")
+
+
+def scrape_instagram(hashtags, output_file='instagram_data.csv', **options):
+    """
+    Scrape Instagram posts using hashtags
+    Output: post_id, usuario, caption, hashtags, likes, comments, fecha, url
+    """
+    return scrape_platform(PLATFORMS['instagram'], hashtags, output_file, **options)
+
+
+def scrape_tiktok(hashtags, output_file='tiktok_data.csv', **options):
+    """
+    Scrape TikTok videos using hashtags
+    Output: video_id, usuario, caption, hashtags, views, likes, fecha, url
+    """
+    return scrape_platform(PLATFORMS['tiktok'], hashtags, output_file, **options)
+
+
+def scrape_twitter(keywords, output_file='twitter_data.csv', **options):
     """
     Scrape Twitter/X posts using keyword search
     Output: tweet_id, usuario, texto, hashtags, likes, retweets, replies, views, fecha, url, keyword
     """
-    print(f"\n{'='*60}")
-    print("Starting Twitter/X scraping...")
-    print(f"{'='*60}\n")
+    return scrape_platform(PLATFORMS['twitter'], keywords, output_file, **options)
+
+
+def scrape_all_platforms(keywords, output_dir='output', suffix='', parallel=PARALLEL_PLATFORMS, stream=STREAM_OUTPUT,
+                         checkpoints=None, resume=False, incremental=False, deduplicate=DEDUPLICATE_POSTS,
+                         parquet=PARQUET_OUTPUT, store=None, date_window=DATE_WINDOW):
+    """
+    Run the Instagram, TikTok and Twitter scrapers for the same keywords,
+    each with its own concurrent run budget from PLATFORM_CONCURRENT_RUNS.
+    With parallel=True the three platforms run at the same time.
+    Finished keywords are recorded in checkpoints; resume=True skips them.
+    incremental=True only collects posts newer than the previous run's.
+    deduplicate=False writes a post once per keyword instead of merging them.
+    parquet=True also writes the rows to the Parquet dataset, and store
+    (a PostStore) keeps every post in its SQLite database.
+    Only posts inside date_window (a DateWindow) are collected.
+    Returns a dict of platform -> collected results.
+    """
+    scrapers = HASHTAG_PLATFORMS
     
-    all_results = []
+    def run_platform(platform):
+        return scrape_platform(PLATFORMS[platform], keywords, output_file=f'{output_dir}/{platform}_data{suffix}.csv',
+                               max_concurrent_runs=PLATFORM_CONCURRENT_RUNS[platform], stream=stream,
+                               checkpoints=checkpoints, resume=resume, incremental=incremental, deduplicate=deduplicate,
+                               parquet=parquet, store=store, date_window=date_window)
     
-    for keyword, hashtag in list(keywords.items())[:10]:  # Start with first 10 keywords
-        print(f"Scraping Twitter for: {hashtag}")
-        
-        try:
-            # Configure the Actor input for Twitter scraper
-            # Using correct parameters from https://apify.com/apidojo/tweet-scraper
-            run_input = {
-                "searchTerms": [hashtag],
-                "maxItems": max(50, MAX_RESULTS_PER_KEYWORD),  # API requires minimum 50 tweets per query
-                "addUserInfo": True,
-                "sort": "Latest",
-            }
-            
-            # Run the Actor and wait for it to finish
-            print(f"  → Running Apify actor...")
-            run = client.actor("apidojo/tweet-scraper").call(run_input=run_input)
-            
-            # Fetch results from the dataset
-            dataset_items = []
-            for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-                dataset_items.append(item)
-            
-            print(f"  → Found {len(dataset_items)} tweets")
-            
-            # Process results
-            for item in dataset_items:
-                try:
-                    # Parse timestamp
-                    post_date = None
-                    if 'created_at' in item and item['created_at']:
-                        # Twitter timestamp format: "Wed Nov 18 17:00:00 +0000 2025"
-                        from datetime import datetime
-                        post_date = datetime.strptime(item['created_at'], '%a %b %d %H:%M:%S %z %Y')
-                        # Filter by date (2025 onwards)
-                        if post_date.year < 2025:
-                            continue
-                    
-                    # Extract hashtags
-                    tweet_hashtags = []
-                    if 'entities' in item and 'hashtags' in item['entities']:
-                        tweet_hashtags = [tag['text'] for tag in item['entities']['hashtags']]
-                    
-                    result = {
-                        'tweet_id': item.get('id_str', ''),
-                        'usuario': item.get('user', {}).get('screen_name', '') if isinstance(item.get('user'), dict) else '',
-                        'texto': item.get('full_text', '') or item.get('text', ''),
-                        'hashtags': ', '.join(tweet_hashtags),
-                        'likes': item.get('favorite_count', 0),
-                        'retweets': item.get('retweet_count', 0),
-                        'replies': item.get('reply_count', 0),
-                        'views': item.get('view_count', 0),
-                        'fecha': post_date.strftime('%Y-%m-%d %H:%M:%S') if post_date else '',
-                        'url': f"https://twitter.com/{item.get('user', {}).get('screen_name', 'i')}/status/{item.get('id_str', '')}" if isinstance(item.get('user'), dict) else '',
-                        'keyword': keyword
-                    }
-                    all_results.append(result)
-                except Exception as e:
-                    print(f"  ⚠ Error processing item: {e}")
-                    continue
-            
-            # Respect rate limits
-            time.sleep(2)
-            
-        except Exception as e:
-            print(f"  ✗ Error scraping {hashtag}: {e}")
-            continue
+    if not parallel:
+        return {platform: run_platform(platform) for platform in scrapers}
     
-    # Save to CSV
-    if all_results:
-        df = pd.DataFrame(all_results)
-        df.to_csv(output_file, index=False, encoding='utf-8-sig')
-        print(f"\n✓ Twitter data saved to {output_file}")
-        print(f"  Total tweets collected: {len(all_results)}")
-    else:
-        print("\n⚠ No Twitter data collected")
-    
-    return all_results
+    with ThreadPoolExecutor(max_workers=len(scrapers)) as executor:
+        futures = {platform: executor.submit(run_platform, platform) for platform in scrapers}
+        return {platform: future.result() for platform, future in futures.items()}
 
 
-def main():
+def plan_platform(platform, hashtags, output_file=None, batch_size=KEYWORD_BATCH_SIZE, checkpoints=None, resume=False,
+                  incremental=False, date_window=DATE_WINDOW):
     """
-    Main function to run all scrapers
+    Actor runs scrape_platform() would start for the same arguments, without
+    starting them (see actor_runs.planned_run)
     """
+    output_file = output_file or f'{platform.name}_data.csv'
+    keyword_items = pending_units(checkpoints, output_file, keyword_units(hashtags), resume)
+    runs = []
+    for batch in keyword_batches(keyword_items, batch_size):
+        _, run_input = batch_run_input(platform, batch, checkpoints, incremental, date_window)
+        runs.append(planned_run(platform, [hashtag for _, hashtag in batch], run_input,
+                                platform.estimated_items(batch, MAX_RESULTS_PER_KEYWORD)))
+    return runs
+
+
+def plan_all_platforms(keywords, output_dir='output', suffix='', checkpoints=None, resume=False, incremental=False,
+                       date_window=DATE_WINDOW):
+    """
+    Actor runs scrape_all_platforms() would start, without starting them
+    """
+    return [run for platform in HASHTAG_PLATFORMS
+            for run in plan_platform(PLATFORMS[platform], keywords, f'{output_dir}/{platform}_data{suffix}.csv',
+                                     checkpoints=checkpoints, resume=resume, incremental=incremental,
+                                     date_window=date_window)]
+
+
+def print_summary(title, results, elapsed_time):
+    """
+    Print the per-platform totals of a scrape_all_platforms() run
+    """
+    print(f"\n{'='*60}")
+    print(title)
+    print(f"{'='*60}")
+    for platform, platform_results in results.items():
+        print(f"{PLATFORMS[platform].label} {PLATFORMS[platform].noun}: {len(platform_results)}")
+    print(f"Total items: {sum(len(platform_results) for platform_results in results.values())}")
+    print(f"Time elapsed: {elapsed_time/60:.2f} minutes")
+    print(f"{'='*60}\n")
+
+
+def add_arguments(parser):
+    """
+    Command-line options of the hashtag scrapers (scraper.py, scraper_control.py and the CLI)
+    """
+    parser.add_argument('--resume', action='store_true', help="skip keywords finished by a previous interrupted run")
+    parser.add_argument('--since-last-run', action='store_true',
+                        help="only collect posts newer than the previous run's and add them to the CSVs")
+    parser.add_argument('--no-cache', action='store_true', help="ignore cached actor results and run every actor again")
+    parser.add_argument('--one-row-per-keyword', action='store_true',
+                        help="write a post once per keyword it was found under instead of merging its keywords")
+    parser.add_argument('--start-date', default=START_DATE, help="oldest post date to collect, YYYY-MM-DD (default: %(default)s)")
+    parser.add_argument('--end-date', default=END_DATE, help="newest post date to collect, YYYY-MM-DD (default: today)")
+    parser.add_argument('--plan', '--dry-run', action='store_true',
+                        help="list the actor runs with their inputs and estimated items without running them")
+
+
+def run(args, keywords=KEYWORDS, suffix='', job='scraper', title="SOCIAL MEDIA SCRAPER", summary_title="SCRAPING COMPLETE"):
+    """
+    Run the Instagram, TikTok and Twitter scrapers for keywords with the
+    options of add_arguments(), writing output/<platform>_data<suffix>.csv.
+    With --plan only the actor runs are printed and None is returned.
+    """
+    date_window = DateWindow(args.start_date, args.end_date)
+    configure_cache(bypass=args.no_cache)
+    
     print("\n" + "="*60)
-    print("SOCIAL MEDIA SCRAPER")
+    print(title)
     print("="*60)
-    print(f"Keywords to search: {len(KEYWORDS)}")
+    print(f"Keywords to search: {len(keywords)}")
     print(f"Max results per keyword: {MAX_RESULTS_PER_KEYWORD}")
-    print(f"Date filter: {START_DATE} onwards")
+    print(f"Date window: {date_window}")
     print("="*60 + "\n")
     
-    # Create output directory
     output_dir = 'output'
+    if args.plan:
+        checkpoints = existing_checkpoints(f'{output_dir}/checkpoints.sqlite')
+        print_plan(plan_all_platforms(keywords, output_dir, suffix, checkpoints=checkpoints, resume=args.resume,
+                                      incremental=args.since_last_run, date_window=date_window))
+        if checkpoints is not None:
+            checkpoints.close()
+        return None
+    # Fail before starting if there is no API token
+    apify_client()
+    
+    # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     
     # Run scrapers
     start_time = time.time()
+    # Timings, item counts and Apify usage of the run, under output/metrics
+    metrics.start_run(job)
     
-    # Scrape Instagram
-    instagram_results = scrape_instagram(
-        KEYWORDS, 
-        output_file=f'{output_dir}/instagram_data.csv'
-    )
-    
-    # Scrape TikTok
-    tiktok_results = scrape_tiktok(
-        KEYWORDS, 
-        output_file=f'{output_dir}/tiktok_data.csv'
-    )
-    
-    # Scrape Twitter
-    twitter_results = scrape_twitter(
-        KEYWORDS, 
-        output_file=f'{output_dir}/twitter_data.csv'
-    )
+    # Finished keywords are checkpointed so an interrupted run can be resumed
+    checkpoints = CheckpointStore(f'{output_dir}/checkpoints.sqlite')
+    # Every collected post is also kept in a SQLite database across runs
+    store = PostStore() if POST_STORE else None
+    results = scrape_all_platforms(keywords, output_dir, suffix=suffix, checkpoints=checkpoints, resume=args.resume,
+                                   incremental=args.since_last_run, deduplicate=DEDUPLICATE_POSTS and not args.one_row_per_keyword,
+                                   store=store, date_window=date_window)
+    checkpoints.close()
+    if store is not None:
+        store.close()
+    metrics.finish_run()
     
     # Summary
-    elapsed_time = time.time() - start_time
-    print(f"\n{'='*60}")
-    print("SCRAPING COMPLETE")
-    print(f"{'='*60}")
-    print(f"Instagram posts: {len(instagram_results)}")
-    print(f"TikTok videos: {len(tiktok_results)}")
-    print(f"Twitter tweets: {len(twitter_results)}")
-    print(f"Total items: {len(instagram_results) + len(tiktok_results) + len(twitter_results)}")
-    print(f"Time elapsed: {elapsed_time/60:.2f} minutes")
-    print(f"{'='*60}\n")
+    print_summary(summary_title, results, time.time() - start_time)
+    return results
+
+
+def main():
+    """
+    Main function to run all scrapers
+    """
+    parser = argparse.ArgumentParser(description="Scrape Instagram, TikTok and Twitter/X by keyword")
+    add_arguments(parser)
+    run(parser.parse_args())
 
 
 if __name__ == "__main__":
     main()
-
@@ -5,127 +5,207 @@ Extracts: page info, likes, followers, contact details, and more
 
 import os
 import time
+import argparse
+from collections import deque
 from dotenv import load_dotenv
-from apify_client import ApifyClient
-import pandas as pd
 from facebook_pages import FACEBOOK_PAGES
+from platforms import PLATFORMS
+import metrics
+from sinks import CSVStreamWriter, ParquetDataset, PARQUET_OUTPUT, STREAM_OUTPUT, platform_name
+from rate_limiter import AdaptiveBatchSize, CircuitOpenError
+from actor_runs import apify_client, configure_cache, planned_run, print_plan, run_actor
+from checkpoints import CheckpointStore, checkpoint_scope, existing_checkpoints, pending_units, restore_finished_units
+from post_store import POST_STORE, PostStore
+from summaries import RunningSummary, SummarizingSink
+from page_index import FACEBOOK_PAGE_IDS_PATH, PageIndex
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Apify client
-APIFY_TOKEN = os.getenv('APIFY_API_TOKEN')
-if not APIFY_TOKEN:
-    raise ValueError("APIFY_API_TOKEN not found in environment variables. Please create a .env file.")
+# Apify client: None uses the shared one, created on first actor run
+# (see actor_runs.apify_client); benchmarks put a stand-in here
+client = None
 
-client = ApifyClient(APIFY_TOKEN)
+# Pages per actor run: the first batch's size, grown up to PAGE_MAX_BATCH_SIZE
+# while runs take less than PAGE_BATCH_TARGET_SECONDS and halved when they fail
+PAGE_BATCH_SIZE = int(os.getenv('PAGE_BATCH_SIZE', 10))
+PAGE_MAX_BATCH_SIZE = int(os.getenv('PAGE_MAX_BATCH_SIZE', 50))
+PAGE_BATCH_TARGET_SECONDS = float(os.getenv('PAGE_BATCH_TARGET_SECONDS', 300))
 
-def scrape_facebook_pages(pages_dict, output_file='facebook_pages_data.csv'):
+
+def run_seconds(run, started):
+    """
+    Duration of an actor run as reported by Apify, or the time since started
+    (time.monotonic()) if the run doesn't say
+    """
+    seconds = (run.get('stats') or {}).get('runTimeSecs')
+    return seconds if seconds else time.monotonic() - started
+
+
+def scrape_facebook_pages(pages_dict, output_file='facebook_pages_data.csv', stream=STREAM_OUTPUT,
+                          checkpoints=None, resume=False, parquet=PARQUET_OUTPUT, store=None, page_index=None):
     """
     Scrape Facebook Pages information
     Output: page_name, page_url, categoria, likes, followers, intro, website, email, 
             telefono, direccion, rating, rating_count, messenger, page_creation_date, 
             ad_status, ad_library_id, profile_picture_url, cover_photo_url
+    Pages are attributed to organizations through page_index (a PageIndex of
+    pages_dict, built here if not given), which learns their page IDs.
     """
     print(f"\n{'='*60}")
     print("Iniciando scraping de Páginas de Facebook...")
     print(f"{'='*60}\n")
     
-    all_results = []
+    # In streaming mode rows go straight to the output file in chunks.
+    # With parquet=True rows are also added to the Parquet dataset next to the CSV.
+    # Rows are upserted into the store's table if a PostStore is given.
+    dataset = ParquetDataset(output_file, replace=True) if parquet else None
+    table = store.table(output_file, 'page_url', index_columns=('nombre_organizacion', 'page_id')) if store is not None else None
+    all_results = CSVStreamWriter(output_file, parquet=dataset, store=table) if stream else []
+    # Totals and contact details found, updated as pages come in
+    summary = RunningSummary(sum_columns=['likes', 'followers'], group_columns=['ad_status'],
+                             nonempty_columns=['email', 'telefono', 'website'])
+    all_results = SummarizingSink(all_results, summary)
+    
+    # Canonical URL / page ID -> page, to attribute items to organizations
+    if page_index is None:
+        page_index = PageIndex(pages_dict)
     
     # Convert dict to list of URLs for processing
     page_urls = list(pages_dict.values())
     page_names = list(pages_dict.keys())
     
+    # Pages finished by an interrupted run are restored instead of scraped again
+    pending_pages = restore_finished_units(checkpoints, output_file, list(zip(page_urls, page_names)), all_results, resume)
+    if len(pending_pages) < len(page_urls):
+        print(f"↻ Reanudando: {len(page_urls) - len(pending_pages)} páginas ya procesadas, {len(pending_pages)} pendientes\n")
+        page_urls = [url for url, _ in pending_pages]
+        page_names = [name for _, name in pending_pages]
+    
     print(f"Total de páginas a procesar: {len(page_urls)}\n")
     
-    # Process pages in batches to avoid API limits
-    batch_size = 10
+    # Actor input and compiled item readers of the platform (see platforms),
+    # as locals for the per-item loop
+    adapter = PLATFORMS['facebook_pages']
+    read_page_url, read_facebook_url, read_page_id = adapter.read_page_url, adapter.read_facebook_url, adapter.read_page_id
+    extract, lookup, learn = adapter.extract, page_index.lookup, page_index.learn
+    
+    # Pages per actor run, adapted to how long runs take and halved on failures
+    batch_size = AdaptiveBatchSize(PAGE_BATCH_SIZE, PAGE_MAX_BATCH_SIZE, PAGE_BATCH_TARGET_SECONDS)
+    # Pages whose actor run still failed after retries, on their own
+    # (or that the circuit breaker skipped)
+    failed_pages = []
     
-    for i in range(0, len(page_urls), batch_size):
-        batch_urls = page_urls[i:i+batch_size]
-        batch_names = page_names[i:i+batch_size]
+    def scrape_batch(batch, label):
+        """
+        Run the actor over a batch of (URL, name) pages and keep their rows.
+        Returns the error if the run failed, else None.
+        """
+        batch_urls = [url for url, _ in batch]
+        batch_names = [name for _, name in batch]
         
-        print(f"Procesando lote {i//batch_size + 1} ({len(batch_urls)} páginas)...")
+        print(f"Procesando lote {label} ({len(batch_urls)} páginas)...")
+        # Timings and item counts of this batch's run
+        unit = metrics.unit(platform_name(output_file), ', '.join(batch_names))
+        started = time.monotonic()
         
         try:
-            # Configure the Actor input for Facebook Pages scraper
-            # Using correct parameters from https://apify.com/apify/facebook-pages-scraper
-            run_input = {
-                "startUrls": [{"url": url} for url in batch_urls],
-                "maxPagesPerQuery": len(batch_urls),
-            }
+            run_input = adapter.build_input(batch_urls, None, None, None)
             
             # Run the Actor and wait for it to finish
             print(f"  → Ejecutando Apify actor...")
-            run = client.actor("apify/facebook-pages-scraper").call(run_input=run_input)
-            
-            # Fetch results from the dataset
-            dataset_items = []
-            for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-                dataset_items.append(item)
+            run, items = run_actor(client, adapter.actor_id, run_input, unit=unit)
             
-            print(f"  → Datos de {len(dataset_items)} páginas extraídos")
-            
-            # Process results
-            for idx, item in enumerate(dataset_items):
+            # Process results as they come off the dataset
+            items_found = 0
+            # Rows of the batch by requested page URL, for the checkpoints
+            # (pages we can't attribute are kept with the first page of the batch)
+            batch_results = {url: [] for url in batch_urls}
+            for item in items:
+                items_found += 1
                 try:
-                    # Extract page name from our original list
-                    original_name = ""
-                    for name, url in pages_dict.items():
-                        if url in item.get('pageUrl', '') or url in item.get('facebookUrl', ''):
-                            original_name = name
-                            break
-                    
-                    # Extract websites (can be multiple)
-                    websites = item.get('websites', [])
-                    website = websites[0] if websites else item.get('website', '')
+                    # Find the page in our original list by URL or page ID
+                    page_url, facebook_url, page_id = read_page_url(item), read_facebook_url(item), read_page_id(item)
+                    url = lookup(page_url, facebook_url, page_id=page_id)
+                    if url is not None:
+                        learn(url, page_id, page_url, facebook_url)
+                    original_name = page_index.name(url)
+                    original_url = url if url in batch_results else batch_urls[0]
                     
-                    # Extract categories
-                    categories = item.get('categories', [])
-                    categoria = ', '.join(categories) if categories else ''
-                    
-                    result = {
-                        'nombre_organizacion': original_name,
-                        'page_name': item.get('title', '') or item.get('pageName', ''),
-                        'page_url': item.get('pageUrl', '') or item.get('facebookUrl', ''),
-                        'page_id': item.get('pageId', ''),
-                        'categoria': categoria,
-                        'likes': item.get('likes', 0),
-                        'followers': item.get('followers', 0),
-                        'intro': item.get('intro', ''),
-                        'website': website,
-                        'email': item.get('email', ''),
-                        'telefono': item.get('phone', '') or item.get('phoneNumber', ''),
-                        'direccion': item.get('address', ''),
-                        'rating': item.get('rating', ''),
-                        'rating_count': item.get('ratingCount', 0),
-                        'messenger': item.get('messenger', ''),
-                        'checkins': item.get('checkins', 0),
-                        'ad_library_id': item.get('adLibraryPageId', ''),
-                        'ad_status': 'Sí' if item.get('adsAreRunning') else 'No',
-                        'profile_picture_url': item.get('profilePictureUrl', ''),
-                        'cover_photo_url': item.get('coverPhotoUrl', ''),
-                    }
-                    all_results.append(result)
+                    result = extract(item, nombre_organizacion=original_name)
+                    batch_results[original_url].append(result)
+                    unit.count('kept')
                     
                 except Exception as e:
                     print(f"  ⚠ Error procesando página: {e}")
+                    unit.drop('error')
                     continue
-            
-            # Respect rate limits between batches
-            if i + batch_size < len(page_urls):
-                print(f"  → Esperando antes del siguiente lote...")
-                time.sleep(5)
         
         except Exception as e:
             print(f"  ✗ Error procesando lote: {e}")
+            unit.finish(error=e)
+            batch_size.failed()
+            return e
+        
+        print(f"  → Datos de {items_found} páginas extraídos")
+        
+        for url, page_results in batch_results.items():
+            all_results.extend(page_results)
+            if checkpoints is not None:
+                checkpoints.mark_done(checkpoint_scope(output_file), url, run.get('id'), page_results)
+        
+        # Keep finished batches on disk in case a later one crashes the run
+        if stream:
+            all_results.flush()
+        page_index.save()
+        print(f"  Σ {summary.rows} páginas hasta ahora ({summary.totals_text()})")
+        unit.finish()
+        batch_size.succeeded(len(batch), run_seconds(run, started))
+        return None
+    
+    pending = list(zip(page_urls, page_names))
+    # Halves of failed batches, retried before new batches. Both halves of a
+    # batch run before any is split again, so a single bad page doesn't fail
+    # several runs in a row and open the actor's circuit breaker.
+    retries = deque()
+    batches = 0
+    while retries or pending:
+        if retries:
+            batch, label = retries.popleft()
+        else:
+            batches += 1
+            batch, pending = pending[:batch_size.size], pending[batch_size.size:]
+            label = str(batches)
+        error = scrape_batch(batch, label)
+        if error is None:
             continue
+        # A page that fails on its own is given up on; so is a batch the
+        # circuit breaker skipped, whose halves would be skipped too
+        if len(batch) == 1 or isinstance(error, CircuitOpenError):
+            failed_pages.extend(name for _, name in batch)
+        else:
+            half = len(batch) // 2
+            print(f"  ↳ Se reintentará en dos mitades ({half} y {len(batch) - half} páginas) para aislar las páginas con error")
+            retries.append((batch[:half], f"{label}.1"))
+            retries.append((batch[half:], f"{label}.2"))
+    
+    if failed_pages:
+        print(f"\n⚠ Fallaron tras varios intentos: {', '.join(failed_pages)} (vuelve a ejecutar con --resume para reintentarlas)")
     
     # Save to CSV
-    if all_results:
+    if stream:
+        all_results.close()
+    elif all_results:
+        import pandas as pd
         df = pd.DataFrame(all_results)
-        df.to_csv(output_file, index=False, encoding='utf-8-sig')
+        with metrics.write(platform_name(output_file), output_file, len(df), overwrite=True):
+            df.to_csv(output_file, index=False, encoding='utf-8-sig')
+        if dataset is not None:
+            dataset.write(df)
+        if table is not None:
+            table.write(df)
+    
+    if all_results:
         print(f"\n✓ Datos de páginas de Facebook guardados en {output_file}")
         print(f"  Total de páginas procesadas: {len(all_results)}")
         
@@ -134,12 +214,14 @@ def scrape_facebook_pages(pages_dict, output_file='facebook_pages_data.csv'):
         print("RESUMEN DE DATOS EXTRAÍDOS")
         print(f"{'='*60}")
         print(f"Total de páginas: {len(all_results)}")
-        print(f"Páginas con email: {df['email'].notna().sum()}")
-        print(f"Páginas con teléfono: {df['telefono'].notna().sum()}")
-        print(f"Páginas con website: {df['website'].notna().sum()}")
-        print(f"Páginas corriendo anuncios: {df[df['ad_status'] == 'Sí'].shape[0]}")
-        print(f"Total de likes: {df['likes'].sum():,}")
-        print(f"Total de followers: {df['followers'].sum():,}")
+        print(f"Páginas con email: {summary.nonempty['email']}")
+        print(f"Páginas con teléfono: {summary.nonempty['telefono']}")
+        print(f"Páginas con website: {summary.nonempty['website']}")
+        print(f"Páginas corriendo anuncios: {summary.counts['ad_status']['Sí']}")
+        for status, count in summary.top('ad_status'):
+            print(f"  - Anuncios '{status}': {count} páginas ({summary.breakdown_text('ad_status', status)})")
+        print(f"Total de likes: {summary.sums['likes']:,}")
+        print(f"Total de followers: {summary.sums['followers']:,}")
         print(f"{'='*60}\n")
     else:
         print("\n⚠ No se recolectaron datos de páginas de Facebook")
@@ -147,27 +229,81 @@ def scrape_facebook_pages(pages_dict, output_file='facebook_pages_data.csv'):
     return all_results
 
 
-def main():
+def plan_facebook_pages(pages_dict, output_file='facebook_pages_data.csv', checkpoints=None, resume=False):
     """
-    Main function to run Facebook Pages scraper
+    Actor runs scrape_facebook_pages() would start at the first batch size,
+    without starting them (see actor_runs.planned_run)
+    """
+    adapter = PLATFORMS['facebook_pages']
+    pages = pending_units(checkpoints, output_file, [(url, name) for name, url in pages_dict.items()], resume)
+    runs = []
+    for i in range(0, len(pages), PAGE_BATCH_SIZE):
+        batch = pages[i:i+PAGE_BATCH_SIZE]
+        batch_urls = [url for url, _ in batch]
+        runs.append(planned_run(adapter, [name for _, name in batch], adapter.build_input(batch_urls, None, None, None),
+                                adapter.estimated_items(batch_urls, None)))
+    return runs
+
+
+def add_arguments(parser):
+    """
+    Command-line options of the Facebook Pages scraper
     """
+    parser.add_argument('--resume', action='store_true', help="skip pages finished by a previous interrupted run")
+    parser.add_argument('--no-cache', action='store_true', help="ignore cached actor results and run every actor again")
+    parser.add_argument('--plan', '--dry-run', action='store_true',
+                        help="list the actor runs with their inputs and estimated items without running them")
+
+
+def run(args):
+    """
+    Run the Facebook Pages scraper with the options of add_arguments();
+    with --plan only the actor runs are printed and None is returned
+    """
+    configure_cache(bypass=args.no_cache)
+    
     print("\n" + "="*60)
     print("FACEBOOK PAGES SCRAPER")
     print("="*60)
     print(f"Páginas de Facebook a extraer: {len(FACEBOOK_PAGES)}")
     print("="*60 + "\n")
     
-    # Create output directory
     output_dir = 'output'
+    if args.plan:
+        checkpoints = existing_checkpoints(f'{output_dir}/checkpoints.sqlite')
+        print_plan(plan_facebook_pages(FACEBOOK_PAGES, f'{output_dir}/facebook_pages_data.csv', checkpoints, args.resume))
+        if checkpoints is not None:
+            checkpoints.close()
+        return None
+    # Fail before starting if there is no API token
+    apify_client()
+    
+    # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     
     start_time = time.time()
+    # Timings, item counts and Apify usage of the run, under output/metrics
+    metrics.start_run('facebook_pages')
     
     # Scrape Facebook Pages
+    # Finished pages are checkpointed so an interrupted run can be resumed
+    checkpoints = CheckpointStore(f'{output_dir}/checkpoints.sqlite')
+    # Every collected page is also kept in a SQLite database across runs
+    store = PostStore() if POST_STORE else None
+    # Page IDs learned by earlier runs, to recognize pages by ID
+    page_index = PageIndex(FACEBOOK_PAGES, FACEBOOK_PAGE_IDS_PATH)
     facebook_pages_results = scrape_facebook_pages(
         FACEBOOK_PAGES,
-        output_file=f'{output_dir}/facebook_pages_data.csv'
+        output_file=f'{output_dir}/facebook_pages_data.csv',
+        checkpoints=checkpoints,
+        resume=args.resume,
+        store=store,
+        page_index=page_index
     )
+    checkpoints.close()
+    if store is not None:
+        store.close()
+    metrics.finish_run()
     
     # Summary
     elapsed_time = time.time() - start_time
@@ -178,8 +314,17 @@ def main():
     print(f"Tiempo transcurrido: {elapsed_time/60:.2f} minutos")
     print(f"{'='*60}\n")
     print(f"📁 Archivo de salida:\n  - {output_dir}/facebook_pages_data.csv\n")
+    return facebook_pages_results
+
+
+def main():
+    """
+    Main function to run Facebook Pages scraper
+    """
+    parser = argparse.ArgumentParser(description="Scrape Facebook page information")
+    add_arguments(parser)
+    run(parser.parse_args())
 
 
 if __name__ == "__main__":
     main()
-
@@ -5,197 +5,340 @@ Extracts: post_id, page_name, texto, likes, comments, shares, fecha, url, keywor
 
 import os
 import time
-from datetime import datetime
+import argparse
 from dotenv import load_dotenv
-from apify_client import ApifyClient
-import pandas as pd
 from facebook_pages import FACEBOOK_PAGES
 from keywords import KEYWORDS
+from keyword_matcher import KeywordMatcher, KeywordMatcherPool
+from platforms import PLATFORMS
+from timestamps import DateWindow, format_fecha, parse_timestamp
+import metrics
+from sinks import CSVStreamWriter, ParquetDataset, PARQUET_OUTPUT, STREAM_OUTPUT, output_lock, platform_name
+from actor_runs import apify_client, configure_cache, planned_run, print_plan, run_actor
+from checkpoints import CheckpointStore, HighWaterMark, checkpoint_scope, oldest_lower_bound, existing_checkpoints, pending_units, restore_finished_units
+from post_store import POST_STORE, PostStore
+from summaries import RunningSummary, SummarizingSink
+from page_index import FACEBOOK_PAGE_IDS_PATH, PageIndex
+from pipeline import FetchPipeline
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Apify client
-APIFY_TOKEN = os.getenv('APIFY_API_TOKEN')
-if not APIFY_TOKEN:
-    raise ValueError("APIFY_API_TOKEN not found in environment variables. Please create a .env file.")
-
-client = ApifyClient(APIFY_TOKEN)
+# Apify client: None uses the shared one, created on first actor run
+# (see actor_runs.apify_client); benchmarks put a stand-in here
+client = None
 
 # Configuration
 MAX_POSTS_PER_PAGE = int(os.getenv('MAX_POSTS_PER_PAGE', 100))
-START_DATE = "2025-01-01"
+# Pages packed into a single actor run (1 = one run per page)
+FACEBOOK_POSTS_BATCH_SIZE = int(os.getenv('FACEBOOK_POSTS_BATCH_SIZE', 1))
+# Date window of collected posts (YYYY-MM-DD, both inclusive; no END_DATE = up to today)
+START_DATE = os.getenv('START_DATE', '2025-01-01')
+END_DATE = os.getenv('END_DATE') or None
+DATE_WINDOW = DateWindow(START_DATE, END_DATE)
+# Keyword matching: ignore accents ("pañuelverde" == "panuelverde") and/or
+# only match whole words (so "ile" or "8m" don't match inside other words)
+KEYWORD_FOLD_ACCENTS = os.getenv('KEYWORD_FOLD_ACCENTS', 'false').lower() == 'true'
+KEYWORD_WORD_BOUNDARIES = os.getenv('KEYWORD_WORD_BOUNDARIES', 'false').lower() == 'true'
+# Processes that match keywords, for very large text volumes (0 or 1 = in the scraper's own process)
+KEYWORD_MATCH_PROCESSES = int(os.getenv('KEYWORD_MATCH_PROCESSES', 0))
+
+# Columns written to the output CSV
+POST_COLUMNS = ['post_id', 'organization_name', 'page_name', 'texto', 'likes', 'comments',
+                'shares', 'fecha', 'url', 'keywords_matched']
+
+
+def page_batches(pages, batch_size=FACEBOOK_POSTS_BATCH_SIZE):
+    """
+    Split (URL, name) pages into batches of batch_size, one actor run each
+    """
+    batch_size = max(1, batch_size)
+    return [pages[i:i+batch_size] for i in range(0, len(pages), batch_size)]
+
 
-def scrape_facebook_posts(pages_dict, keywords_dict, output_file='facebook_posts_data.csv'):
+def pages_run_input(batch, checkpoints=None, incremental=False, date_window=DATE_WINDOW,
+                    max_posts_per_page=MAX_POSTS_PER_PAGE):
+    """
+    High-water marks (URL -> HighWaterMark) and actor run input of a batch of
+    (URL, name) pages
+    """
+    # Newest post collected from each page so far, for incremental runs
+    marks = {url: HighWaterMark(checkpoints, 'facebook_posts', url) for url, _ in batch}
+    # Only ask for posts inside the date window (and newer than the
+    # oldest mark on incremental runs)
+    lower_bound = date_window.lower_bound(oldest_lower_bound(marks.values()) if incremental else None)
+    run_input = PLATFORMS['facebook_posts'].build_input([url for url, _ in batch], max_posts_per_page, lower_bound, date_window)
+    return marks, run_input
+
+
+def scrape_facebook_posts(pages_dict, keywords_dict, output_file='facebook_posts_data.csv', stream=STREAM_OUTPUT,
+                          fold_accents=KEYWORD_FOLD_ACCENTS, word_boundaries=KEYWORD_WORD_BOUNDARIES,
+                          checkpoints=None, resume=False, incremental=False, parquet=PARQUET_OUTPUT, store=None,
+                          date_window=DATE_WINDOW, page_index=None, batch_size=FACEBOOK_POSTS_BATCH_SIZE,
+                          max_posts_per_page=MAX_POSTS_PER_PAGE, match_processes=KEYWORD_MATCH_PROCESSES, save=True):
     """
     Scrape Facebook Posts from specific pages and filter by keywords
     Output: post_id, page_name, organization_name, texto, likes, comments, shares, 
             fecha, url, keywords_matched
+    Each actor run covers batch_size pages; its posts are attributed to their
+    organization through page_index (a PageIndex of pages_dict, built here if
+    not given), which learns their page IDs, and kept to max_posts_per_page
+    posts per page.
+    With save=False the rows are only returned, not written (work queue
+    workers leave that to the export). The results' failed attribute lists
+    the pages whose actor run still failed after retries.
     """
     print(f"\n{'='*60}")
     print("Iniciando scraping de Posts de Facebook...")
     print(f"{'='*60}\n")
     
-    all_results = []
+    # In streaming mode rows go straight to the output file in chunks
+    # (unsorted, and without the num_keywords helper column)
+    # Incremental runs only collect new posts, so they add to the existing file.
+    # With parquet=True rows are also added to the Parquet dataset next to the CSV.
+    # Rows are upserted into the store's table if a PostStore is given.
+    dataset = ParquetDataset(output_file, columns=POST_COLUMNS, replace=not incremental) if parquet else None
+    table = store.table(output_file, 'post_id', keyword_column='keywords_matched',
+                        index_columns=('fecha', 'organization_name'), columns=POST_COLUMNS) if store is not None else None
+    all_results = CSVStreamWriter(output_file, columns=POST_COLUMNS, append=incremental, parquet=dataset, store=table) if stream else []
+    # Totals, top organizations and keywords, updated as posts come in
+    summary = RunningSummary(sum_columns=['likes', 'comments', 'shares'], group_columns=['organization_name'],
+                             keyword_column='keywords_matched')
+    all_results = SummarizingSink(all_results, summary)
+    
+    # Canonical URL / page ID -> page, to attribute posts to organizations
+    if page_index is None:
+        page_index = PageIndex(pages_dict)
     
     # Convert dict to list of URLs for processing
     page_urls = list(pages_dict.values())
     page_names = list(pages_dict.keys())
     
-    # Prepare keywords for matching (remove # and lowercase)
-    keywords_clean = {k: v.replace('#', '').lower() for k, v in keywords_dict.items()}
+    # Pages finished by an interrupted run are restored instead of scraped again
+    pending_pages = restore_finished_units(checkpoints, output_file, list(zip(page_urls, page_names)), all_results, resume)
+    if len(pending_pages) < len(page_urls):
+        print(f"↻ Reanudando: {len(page_urls) - len(pending_pages)} páginas ya procesadas, {len(pending_pages)} pendientes\n")
+        page_urls = [url for url, _ in pending_pages]
+        page_names = [name for _, name in pending_pages]
+    
+    # Compile the keywords once into a single-pass matcher
+    keyword_matcher = KeywordMatcher(keywords_dict, fold_accents=fold_accents, word_boundaries=word_boundaries)
+    # Optionally spread over several processes
+    match_pool = KeywordMatcherPool(keywords_dict, match_processes, fold_accents=fold_accents,
+                                    word_boundaries=word_boundaries) if match_processes > 1 else None
+    match_many = (match_pool or keyword_matcher).match_many
     
     print(f"Total de páginas a procesar: {len(page_urls)}")
-    print(f"Keywords a buscar: {len(keywords_clean)}")
-    print(f"Posts máximos por página: {MAX_POSTS_PER_PAGE}")
-    print(f"Filtro de fecha: {START_DATE} en adelante\n")
+    print(f"Keywords a buscar: {len(keyword_matcher)}")
+    print(f"Posts máximos por página: {max_posts_per_page}")
+    print(f"Páginas por ejecución: {max(1, batch_size)}")
+    print(f"Ventana de fechas: {date_window}\n")
     
-    # Process pages in smaller batches to avoid timeouts
-    batch_size = 5
+    # Actor input and compiled item readers of the platform (see platforms),
+    # as locals for the per-item loop
+    adapter = PLATFORMS['facebook_posts']
+    read_text, read_date, read_id, extract = adapter.read_text, adapter.read_date, adapter.read_id, adapter.extract
+    read_input_url, read_facebook_url, read_page_id = adapter.read_input_url, adapter.read_facebook_url, adapter.read_page_id
+    lookup, learn = page_index.lookup, page_index.learn
     
-    for i in range(0, len(page_urls), batch_size):
-        batch_urls = page_urls[i:i+batch_size]
-        batch_names = page_names[i:i+batch_size]
+    # Pages whose actor run still failed after retries
+    failed_pages = []
+    
+    def start_batch(feed):
+        """
+        Start the actor run of a batch of (URL, name) pages, in the pipeline's
+        background thread, and return its dataset items
+        """
+        batch_names = ', '.join(name for _, name in feed.batch)
+        # Timings and item counts of this batch's run
+        feed.unit = metrics.unit(platform_name(output_file), batch_names)
+        feed.marks, run_input = pages_run_input(feed.batch, checkpoints, incremental, date_window, max_posts_per_page)
         
-        print(f"{'='*60}")
-        print(f"Procesando lote {i//batch_size + 1} ({len(batch_urls)} páginas)...")
-        print(f"{'='*60}")
+        # Run the Actor and wait for it to finish
+        print(f"  → Ejecutando Apify actor ({batch_names})...")
+        feed.run, items = run_actor(client, adapter.actor_id, run_input, unit=feed.unit)
+        return items
+    
+    def process_batch(feed):
+        """
+        Keep the posts of a batch's run that match the keywords, each
+        attributed to its page (see page_index), as the pipeline hands them over
+        """
+        batch_urls = [url for url, _ in feed.batch]
+        batch_names = dict(feed.batch)
+        # Every post of a single-page run is that page's
+        single_page = batch_urls[0] if len(batch_urls) == 1 else None
+        unit = feed.unit
         
-        for idx, (url, org_name) in enumerate(zip(batch_urls, batch_names)):
-            print(f"\n[{idx+1}/{len(batch_urls)}] Procesando: {org_name}")
-            print(f"  URL: {url}")
+        try:
+            marks = feed.marks
+            posts_found = 0
+            unattributed = 0
+            # Posts read and rows kept per page
+            page_posts = dict.fromkeys(batch_urls, 0)
+            page_results = {url: [] for url in batch_urls}
+            # Pages at their post cap, or only returning old posts on incremental runs
+            done_pages = set()
             
-            try:
-                # Configure the Actor input for Facebook Posts scraper
-                # Using https://apify.com/apify/facebook-posts-scraper
-                run_input = {
-                    "startUrls": [{"url": url}],
-                    "maxPosts": MAX_POSTS_PER_PAGE,
-                    "resultsLimit": MAX_POSTS_PER_PAGE,
-                }
-                
-                # Run the Actor and wait for it to finish
-                print(f"  → Ejecutando Apify actor...")
-                run = client.actor("apify/facebook-posts-scraper").call(run_input=run_input)
-                
-                # Fetch results from the dataset
-                dataset_items = []
-                for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-                    dataset_items.append(item)
-                
-                print(f"  → {len(dataset_items)} posts extraídos")
-                
-                # Process and filter results by keywords
-                posts_matched = 0
-                
-                for item in dataset_items:
-                    try:
-                        # Get post text
-                        post_text = item.get('text', '') or item.get('postText', '') or ''
-                        
-                        if not post_text:
-                            continue
-                        
-                        # Parse date
-                        post_date = None
-                        date_str = item.get('time', '') or item.get('date', '')
-                        
-                        if date_str:
-                            try:
-                                # Try different date formats
-                                for fmt in ['%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']:
-                                    try:
-                                        post_date = datetime.strptime(date_str.split('.')[0].replace('T', ' ').replace('Z', '').strip(), fmt.replace('.%f', ''))
-                                        break
-                                    except:
-                                        continue
-                                
-                                # Filter by date (2025 onwards)
-                                if post_date and post_date.year < 2025:
+            for chunk in feed.chunks():
+                with unit.stage('match'):
+                    # Posts of the chunk to match against the keywords, as
+                    # (item, page, text, fecha, post ID)
+                    candidates = []
+                    for item in chunk:
+                        if len(done_pages) == len(batch_urls):
+                            # Nothing more to read from this run
+                            feed.stop()
+                            break
+                        posts_found += 1
+                        try:
+                            # The page the actor reports the post from
+                            facebook_url, page_id = read_facebook_url(item), read_page_id(item)
+                            page = lookup(read_input_url(item), facebook_url, page_id=page_id)
+                            if page not in page_posts:
+                                if single_page is None:
+                                    unattributed += 1
+                                    unit.drop('unattributed')
                                     continue
-                                    
-                            except Exception as e:
-                                pass
-                        
-                        # Check if post contains any keywords
-                        post_text_lower = post_text.lower()
-                        matched_keywords = []
-                        
-                        for keyword_key, keyword_clean in keywords_clean.items():
-                            if keyword_clean in post_text_lower:
-                                matched_keywords.append(keyword_key)
-                        
+                                page = single_page
+                            if page_id and page_index.page_ids.get(page) != page_id:
+                                learn(page, page_id, facebook_url)
+                            
+                            # Keep to the per-page post cap: a multi-page run's
+                            # limit covers all of its pages together
+                            if page in done_pages:
+                                unit.drop('page_done')
+                                continue
+                            page_posts[page] += 1
+                            if page_posts[page] >= max_posts_per_page:
+                                done_pages.add(page)
+                            
+                            # Get post text
+                            post_text = read_text(item)
+                            
+                            if not post_text:
+                                unit.drop('no_text')
+                                continue
+                            
+                            # Parse date
+                            date_str = read_date(item)
+                            post_date = parse_timestamp(date_str, 'facebook_posts')
+                            
+                            # Keep posts inside the date window
+                            if not date_window.contains(post_date):
+                                unit.drop('date')
+                                continue
+                            
+                            fecha = format_fecha(post_date) if post_date else date_str
+                            post_id = read_id(item)
+                            
+                            page_mark = marks[page]
+                            if incremental and page_mark.seen(fecha, post_id):
+                                # Already collected by an earlier run; a page is done
+                                # once it only returns old posts
+                                if page_mark.exhausted:
+                                    done_pages.add(page)
+                                unit.drop('seen')
+                                continue
+                            page_mark.observe(fecha, post_id)
+                            candidates.append((item, page, post_text, fecha, post_id))
+                            
+                        except Exception as e:
+                            print(f"  ⚠ Error procesando post: {e}")
+                            unit.drop('error')
+                            continue
+                    
+                    # Check which keywords each post contains, for the whole chunk at once
+                    matches = match_many([post_text for _, _, post_text, _, _ in candidates])
+                    for (item, page, post_text, fecha, post_id), matched_keywords in zip(candidates, matches):
                         # Only save if at least one keyword matched
-                        if matched_keywords:
-                            result = {
-                                'post_id': item.get('postId', '') or item.get('id', ''),
-                                'organization_name': org_name,
-                                'page_name': item.get('pageName', '') or org_name,
-                                'texto': post_text,
-                                'likes': item.get('likes', 0) or item.get('likeCount', 0),
-                                'comments': item.get('comments', 0) or item.get('commentCount', 0),
-                                'shares': item.get('shares', 0) or item.get('shareCount', 0),
-                                'fecha': post_date.strftime('%Y-%m-%d %H:%M:%S') if post_date else date_str,
-                                'url': item.get('url', '') or item.get('postUrl', ''),
-                                'keywords_matched': ', '.join(matched_keywords),
-                                'num_keywords': len(matched_keywords),
-                            }
-                            all_results.append(result)
-                            posts_matched += 1
-                        
-                    except Exception as e:
-                        print(f"  ⚠ Error procesando post: {e}")
-                        continue
-                
-                print(f"  ✓ Posts que coinciden con keywords: {posts_matched}")
-                
-                # Small delay between pages
-                time.sleep(2)
+                        if not matched_keywords:
+                            unit.drop('no_keyword')
+                            continue
+                        try:
+                            result = extract(item, post_id=post_id, organization_name=batch_names[page], texto=post_text,
+                                             fecha=fecha, keywords_matched=', '.join(matched_keywords),
+                                             num_keywords=len(matched_keywords))
+                        except Exception as e:
+                            print(f"  ⚠ Error procesando post: {e}")
+                            unit.drop('error')
+                            continue
+                        page_results[page].append(result)
+                        unit.count('kept')
+            
+            # The run or its dataset failed
+            if feed.error is not None:
+                raise feed.error
+            
+            print(f"  → {posts_found} posts extraídos")
+            if unattributed:
+                print(f"  ⚠ {unattributed} posts no se pudieron atribuir a una página del lote")
+            print(f"  ✓ Posts que coinciden con keywords: {sum(len(rows) for rows in page_results.values())}")
             
-            except Exception as e:
-                print(f"  ✗ Error procesando página: {e}")
-                continue
+            for url in batch_urls:
+                all_results.extend(page_results[url])
+                if checkpoints is not None:
+                    checkpoints.mark_done(checkpoint_scope(output_file), url, feed.run.get('id'), page_results[url])
+                marks[url].save()
+            page_index.save()
+            
+            # Keep finished pages on disk in case a later one crashes the run
+            if stream:
+                all_results.flush()
+            print(f"  Σ {summary.rows} posts con keywords hasta ahora ({summary.totals_text()})")
+            unit.finish()
         
-        # Longer delay between batches
-        if i + batch_size < len(page_urls):
-            print(f"\n{'='*60}")
-            print(f"Esperando antes del siguiente lote...")
-            print(f"{'='*60}\n")
-            time.sleep(5)
+        except Exception as e:
+            print(f"  ✗ Error procesando {'página' if single_page else 'lote'}: {e}")
+            # Let the background thread finish with the batch's dataset before
+            # the unit closes its iterator
+            feed.drain()
+            unit.finish(error=e)
+            failed_pages.extend(batch_names.values())
+    
+    # Actor runs and dataset downloads run ahead in a background thread while
+    # the posts already downloaded are matched (see pipeline)
+    batches = page_batches(list(zip(page_urls, page_names)), batch_size)
+    try:
+        for number, feed in enumerate(FetchPipeline(batches, start_batch), 1):
+            print(f"\n[{number}/{len(batches)}] Procesando: {', '.join(name for _, name in feed.batch)}")
+            print(f"  URL: {', '.join(url for url, _ in feed.batch)}")
+            process_batch(feed)
+    finally:
+        if match_pool is not None:
+            match_pool.close()
+    
+    all_results.failed = failed_pages
+    if failed_pages:
+        print(f"\n⚠ Fallaron tras varios intentos: {', '.join(failed_pages)} (vuelve a ejecutar con --resume para reintentarlas)")
     
     # Save to CSV
+    if stream:
+        all_results.close()
+    elif all_results and save:
+        # Incremental runs add their new posts to the existing file
+        save_posts(all_results, output_file, append=incremental, parquet=dataset, store=table)
+    
     if all_results:
-        df = pd.DataFrame(all_results)
-        # Sort by number of keywords matched (descending) and date
-        df = df.sort_values(['num_keywords', 'fecha'], ascending=[False, False])
-        df = df.drop('num_keywords', axis=1)  # Remove helper column
-        df.to_csv(output_file, index=False, encoding='utf-8-sig')
-        
         print(f"\n{'='*60}")
         print("RESUMEN DE DATOS EXTRAÍDOS")
         print(f"{'='*60}")
-        print(f"✓ Datos guardados en: {output_file}")
+        if save or stream:
+            print(f"✓ Datos guardados en: {output_file}")
         print(f"Total de posts con keywords: {len(all_results)}")
         print(f"\nTop 5 organizaciones con más posts:")
-        top_orgs = df['organization_name'].value_counts().head()
-        for org, count in top_orgs.items():
-            print(f"  - {org}: {count} posts")
+        for org, count in summary.top('organization_name', 5):
+            print(f"  - {org}: {count} posts ({summary.breakdown_text('organization_name', org)})")
         
         print(f"\nTop 10 keywords más mencionados:")
-        # Count keyword occurrences
-        keyword_counts = {}
-        for keywords_str in df['keywords_matched']:
-            for kw in keywords_str.split(', '):
-                keyword_counts[kw] = keyword_counts.get(kw, 0) + 1
-        
-        for kw, count in sorted(keyword_counts.items(), key=lambda x: x[1], reverse=True)[:10]:
-            print(f"  - #{kw}: {count} menciones")
+        for kw, count in summary.top('keywords_matched', 10):
+            print(f"  - #{kw}: {count} menciones ({summary.breakdown_text('keywords_matched', kw)})")
         
         print(f"\nEstadísticas de engagement:")
-        print(f"  Total de likes: {df['likes'].sum():,}")
-        print(f"  Total de comentarios: {df['comments'].sum():,}")
-        print(f"  Total de shares: {df['shares'].sum():,}")
-        print(f"  Promedio de likes por post: {df['likes'].mean():.1f}")
+        print(f"  Total de likes: {summary.sums['likes']:,}")
+        print(f"  Total de comentarios: {summary.sums['comments']:,}")
+        print(f"  Total de shares: {summary.sums['shares']:,}")
+        print(f"  Promedio de likes por post: {summary.mean('likes'):.1f}")
         print(f"{'='*60}\n")
     else:
         print("\n⚠ No se encontraron posts que coincidan con los keywords")
@@ -203,10 +346,62 @@ def scrape_facebook_posts(pages_dict, keywords_dict, output_file='facebook_posts
     return all_results
 
 
-def main():
+def save_posts(rows, output_file, append=False, parquet=None, store=None):
     """
-    Main function to run Facebook Posts scraper
+    Write Facebook posts rows to a CSV at once, those with the most keywords
+    and newest first, adding them to an existing file with append=True.
+    Rows are also added to the parquet dataset and post store table if given.
+    """
+    import pandas as pd
+    df = pd.DataFrame(rows)
+    # Sort by number of keywords matched (descending) and date
+    df = df.sort_values(['num_keywords', 'fecha'], ascending=[False, False])
+    df = df.drop('num_keywords', axis=1)  # Remove helper column
+    with output_lock(output_file):
+        header = not (append and os.path.exists(output_file))
+        with metrics.write(platform_name(output_file), output_file, len(df), overwrite=header):
+            df.to_csv(output_file, mode='w' if header else 'a', header=header, index=False, encoding='utf-8-sig')
+        if parquet is not None:
+            parquet.write(df)
+        if store is not None:
+            store.write(df)
+
+
+def plan_facebook_posts(pages_dict, output_file='facebook_posts_data.csv', checkpoints=None, resume=False,
+                        incremental=False, date_window=DATE_WINDOW, batch_size=FACEBOOK_POSTS_BATCH_SIZE):
+    """
+    Actor runs scrape_facebook_posts() would start, without starting them
+    (see actor_runs.planned_run)
     """
+    adapter = PLATFORMS['facebook_posts']
+    pages = pending_units(checkpoints, output_file, [(url, name) for name, url in pages_dict.items()], resume)
+    return [planned_run(adapter, [name for _, name in batch], pages_run_input(batch, checkpoints, incremental, date_window)[1],
+                        adapter.estimated_items(batch, MAX_POSTS_PER_PAGE))
+            for batch in page_batches(pages, batch_size)]
+
+
+def add_arguments(parser):
+    """
+    Command-line options of the Facebook Posts scraper
+    """
+    parser.add_argument('--resume', action='store_true', help="skip pages finished by a previous interrupted run")
+    parser.add_argument('--since-last-run', action='store_true',
+                        help="only collect posts newer than the previous run's and add them to the CSV")
+    parser.add_argument('--start-date', default=START_DATE, help="oldest post date to collect, YYYY-MM-DD (default: %(default)s)")
+    parser.add_argument('--end-date', default=END_DATE, help="newest post date to collect, YYYY-MM-DD (default: today)")
+    parser.add_argument('--no-cache', action='store_true', help="ignore cached actor results and run every actor again")
+    parser.add_argument('--plan', '--dry-run', action='store_true',
+                        help="list the actor runs with their inputs and estimated items without running them")
+
+
+def run(args):
+    """
+    Run the Facebook Posts scraper with the options of add_arguments();
+    with --plan only the actor runs are printed and None is returned
+    """
+    date_window = DateWindow(args.start_date, args.end_date)
+    configure_cache(bypass=args.no_cache)
+    
     print("\n" + "="*60)
     print("FACEBOOK POSTS SCRAPER CON FILTRO DE KEYWORDS")
     print("="*60)
@@ -215,18 +410,46 @@ def main():
     print(f"Posts máximos por página: {MAX_POSTS_PER_PAGE}")
     print("="*60 + "\n")
     
-    # Create output directory
     output_dir = 'output'
+    if args.plan:
+        checkpoints = existing_checkpoints(f'{output_dir}/checkpoints.sqlite')
+        print_plan(plan_facebook_posts(FACEBOOK_PAGES, f'{output_dir}/facebook_posts_data.csv', checkpoints,
+                                       args.resume, args.since_last_run, date_window))
+        if checkpoints is not None:
+            checkpoints.close()
+        return None
+    # Fail before starting if there is no API token
+    apify_client()
+    
+    # Create output directory
     os.makedirs(output_dir, exist_ok=True)
     
     start_time = time.time()
+    # Timings, item counts and Apify usage of the run, under output/metrics
+    metrics.start_run('facebook_posts')
     
     # Scrape Facebook Posts
+    # Finished pages are checkpointed so an interrupted run can be resumed
+    checkpoints = CheckpointStore(f'{output_dir}/checkpoints.sqlite')
+    # Every collected post is also kept in a SQLite database across runs
+    store = PostStore() if POST_STORE else None
+    # Page IDs learned by earlier runs, to recognize pages by ID
+    page_index = PageIndex(FACEBOOK_PAGES, FACEBOOK_PAGE_IDS_PATH)
     facebook_posts_results = scrape_facebook_posts(
         FACEBOOK_PAGES,
         KEYWORDS,
-        output_file=f'{output_dir}/facebook_posts_data.csv'
+        output_file=f'{output_dir}/facebook_posts_data.csv',
+        checkpoints=checkpoints,
+        resume=args.resume,
+        incremental=args.since_last_run,
+        store=store,
+        date_window=date_window,
+        page_index=page_index
     )
+    checkpoints.close()
+    if store is not None:
+        store.close()
+    metrics.finish_run()
     
     # Summary
     elapsed_time = time.time() - start_time
@@ -237,6 +460,16 @@ def main():
     print(f"Tiempo transcurrido: {elapsed_time/60:.2f} minutos")
     print(f"{'='*60}\n")
     print(f"📁 Archivo de salida:\n  - {output_dir}/facebook_posts_data.csv\n")
+    return facebook_posts_results
+
+
+def main():
+    """
+    Main function to run Facebook Posts scraper
+    """
+    parser = argparse.ArgumentParser(description="Scrape Facebook posts of the organizations and filter them by keywords")
+    add_arguments(parser)
+    run(parser.parse_args())
 
 
 if __name__ == "__main__":
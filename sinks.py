@@ -0,0 +1,323 @@
+"""
+Output sinks for scraped rows
+"""
+
+import os
+import csv
+import uuid
+import shutil
+import threading
+from datetime import datetime
+from dotenv import load_dotenv
+import metrics
+from timestamps import parse_timestamps
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+# Write rows to the CSV as they are collected instead of once at the end
+STREAM_OUTPUT = os.getenv('STREAM_OUTPUT', 'false').lower() == 'true'
+# Rows buffered in memory before each flush to disk in streaming mode
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 500))
+# Also write every scraper's rows to a Parquet dataset next to the CSVs (needs pyarrow)
+PARQUET_OUTPUT = os.getenv('PARQUET_OUTPUT', 'false').lower() == 'true'
+
+# Engagement counts stored as nullable integers in Parquet
+ENGAGEMENT_COLUMNS = ['likes', 'comments', 'shares', 'views', 'retweets', 'replies',
+                      'followers', 'rating_count', 'checkins']
+
+
+def platform_name(output_file):
+    """
+    Platform of a scraper's output file: its name without '_data', e.g.
+    'instagram', 'tiktok_control' or 'facebook_posts'
+    """
+    return os.path.splitext(os.path.basename(output_file))[0].replace('_data', '')
+
+
+# Output file path -> lock held while rows are written to it
+_output_locks = {}
+_output_locks_guard = threading.Lock()
+
+
+def output_lock(output_file):
+    """
+    Lock of an output file, so runs writing to the same CSV at the same time
+    (e.g. the monitor's polls of two keywords) add their rows one after another
+    """
+    with _output_locks_guard:
+        return _output_locks.setdefault(os.path.abspath(output_file), threading.Lock())
+
+
+def save_csv(rows, output_file, append=False, parquet=None, store=None):
+    """
+    Write buffered rows to a CSV at once, adding them to an existing file with append=True.
+    Rows are also added to the parquet dataset and post store table if given.
+    """
+    # Imported on first write, so importing the scrapers stays fast
+    import pandas as pd
+    df = pd.DataFrame(rows)
+    with output_lock(output_file):
+        header = not (append and os.path.exists(output_file))
+        with metrics.write(platform_name(output_file), output_file, len(df), overwrite=header):
+            df.to_csv(output_file, mode='w' if header else 'a', header=header, index=False, encoding='utf-8-sig')
+            if parquet is not None:
+                parquet.write(df)
+            if store is not None:
+                store.write(df)
+
+
+class ParquetDataset:
+    """
+    Append-only Parquet copy of a scraper's output, partitioned by platform and
+    month of 'fecha' (hive layout, e.g. output/parquet/platform=tiktok/month=2025-03/).
+    Each write adds new part files and never rewrites those of earlier runs.
+    With replace=True (full runs, whose CSV is written from scratch too) the
+    platform's partitions of earlier runs are removed before the first write,
+    so only incremental runs add to them and no post is stored twice.
+    The platform is the output file name without '_data', so the control group
+    lands in e.g. platform=instagram_control. Rows without 'fecha' (Facebook
+    pages) are filed under the month they were scraped.
+    """
+
+    def __init__(self, output_file, columns=None, dataset_dir=None, replace=False):
+        self.dataset_dir = dataset_dir or os.path.join(os.path.dirname(output_file), 'parquet')
+        self.platform = platform_name(output_file)
+        self.columns = columns
+        self.replace = replace
+        self.rows_written = 0
+        self._run_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._parts = 0
+        # Part files written by this run
+        self._paths = []
+
+    def write(self, rows):
+        """
+        Add rows (a list of dicts or a DataFrame) as new part files
+        """
+        import pandas as pd
+        df = pd.DataFrame(rows)
+        if df.empty:
+            return
+        if self.columns:
+            df = df.reindex(columns=self.columns)
+        if self.replace:
+            shutil.rmtree(os.path.join(self.dataset_dir, f'platform={self.platform}'), ignore_errors=True)
+            self.replace = False
+
+        # Stable column types across part files: integer counts, a UTC
+        # timestamp for fecha and strings for everything else
+        for column in df.columns:
+            if column in ENGAGEMENT_COLUMNS:
+                df[column] = pd.to_numeric(df[column], errors='coerce').round().astype('Int64')
+            elif column != 'fecha':
+                df[column] = df[column].astype('string')
+        if 'fecha' in df.columns:
+            df['fecha'] = parse_timestamps(df['fecha'])
+            months = df['fecha'].dt.strftime('%Y-%m').fillna('__HIVE_DEFAULT_PARTITION__')
+        else:
+            months = pd.Series(datetime.now().strftime('%Y-%m'), index=df.index)
+
+        for month, part in df.groupby(months, sort=False):
+            partition_dir = os.path.join(self.dataset_dir, f'platform={self.platform}', f'month={month}')
+            os.makedirs(partition_dir, exist_ok=True)
+            self._parts += 1
+            path = os.path.join(partition_dir, f'part-{self._run_id}-{self._parts:05d}.parquet')
+            part.to_parquet(path, index=False)
+            self._paths.append(path)
+        self.rows_written += len(df)
+
+    def update_rows(self, id_column, column, values):
+        """
+        Set column of the rows this run wrote whose id_column is in values
+        (ID -> new value), rewriting only the part files that hold them
+        """
+        import pandas as pd
+        if not values:
+            return
+        for path in self._paths:
+            part = pd.read_parquet(path)
+            if id_column not in part.columns or column not in part.columns:
+                continue
+            new_values = part[id_column].map(values)
+            found = new_values.notna()
+            if not found.any():
+                continue
+            part.loc[found, column] = new_values[found]
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            part.to_parquet(temp_path, index=False)
+            os.replace(temp_path, path)
+
+
+class CSVStreamWriter:
+    """
+    CSV writer that flushes rows to disk in chunks while a scraper runs.
+    Stands in for the scrapers' results list (append, extend, len) without
+    keeping every row in memory, so partial results survive a crash.
+    With append=True rows are added to an existing output file, and each
+    flushed chunk is also added to the parquet dataset and post store table
+    if given.
+    """
+
+    def __init__(self, output_file, columns=None, chunk_size=STREAM_CHUNK_SIZE, append=False, parquet=None, store=None):
+        self.output_file = output_file
+        self.append_to_file = append
+        self.columns = columns
+        self.parquet = parquet
+        self.store = store
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+        self._buffer = []
+        self._file = None
+        self._writer = None
+
+    def __len__(self):
+        return self.rows_written + len(self._buffer)
+
+    def append(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def flush(self):
+        """
+        Write buffered rows to the output file
+        """
+        if not self._buffer:
+            return
+
+        new_file = self._writer is None and not (self.append_to_file and os.path.exists(self.output_file))
+        with metrics.write(platform_name(self.output_file), self.output_file, len(self._buffer), overwrite=new_file):
+            if self._writer is None:
+                # Same encoding as DataFrame.to_csv(encoding='utf-8-sig') so Excel reads accents
+                self._file = open(self.output_file, 'w' if new_file else 'a', newline='', encoding='utf-8-sig')
+                columns = self.columns or list(self._buffer[0].keys())
+                self._writer = csv.DictWriter(self._file, fieldnames=columns, extrasaction='ignore')
+                if new_file:
+                    self._writer.writeheader()
+
+            self._writer.writerows(self._buffer)
+            self._file.flush()
+            if self.parquet is not None:
+                self.parquet.write(self._buffer)
+            if self.store is not None:
+                self.store.write(self._buffer)
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def update_rows(self, id_column, column, values):
+        """
+        Set column of the rows already in the output file whose id_column is
+        in values (ID -> new value), rewriting the file once; the post store
+        table gets the updated rows too, and the Parquet dataset's part files
+        of this run holding them are rewritten.
+        """
+        self.close()
+        if not values or not os.path.exists(self.output_file):
+            return
+        updated = []
+        temp_path = f'{self.output_file}.{os.getpid()}.tmp'
+        with output_lock(self.output_file):
+            with open(self.output_file, newline='', encoding='utf-8-sig') as source, \
+                    open(temp_path, 'w', newline='', encoding='utf-8-sig') as target:
+                reader = csv.DictReader(source)
+                writer = csv.DictWriter(target, fieldnames=reader.fieldnames)
+                writer.writeheader()
+                for row in reader:
+                    value = values.get(row.get(id_column))
+                    if value is not None:
+                        row[column] = value
+                        updated.append(row)
+                    writer.writerow(row)
+            os.replace(temp_path, self.output_file)
+        if self.parquet is not None:
+            self.parquet.update_rows(id_column, column, values)
+        if self.store is not None and updated:
+            self.store.write(updated)
+
+
+class DeduplicatingSink:
+    """
+    Keeps one row per post when the same post is collected for several
+    keywords, merging their keywords into the row's keyword column
+    (e.g. "aborto, abortolegal"). Wraps the scrapers' results (a list or a
+    CSVStreamWriter) with the same append/extend/len interface; rows without
+    an ID are never merged.
+    Rows are held until close() so each one is written once with all of its
+    keywords. With stream=True (around a CSVStreamWriter) each post is
+    written as soon as it is first seen instead, only its keywords are kept
+    in memory, and close() rewrites the keyword column of the posts found
+    under more keywords afterwards.
+    """
+
+    def __init__(self, sink, id_column, keyword_column='keyword', stream=False):
+        self.sink = sink
+        self.id_column = id_column
+        self.keyword_column = keyword_column
+        self.stream = stream
+        self.duplicates = 0
+        # Post ID -> row, and post ID -> keywords (a dict used as an ordered set)
+        self._rows = {}
+        self._keywords = {}
+        # Streaming: IDs of written posts that gained keywords since
+        self._merged = set()
+
+    def __len__(self):
+        return len(self._keywords)
+
+    def __iter__(self):
+        for key, row in self._rows.items():
+            yield {**row, self.keyword_column: ', '.join(self._keywords[key])}
+
+    def append(self, row):
+        post_id = row.get(self.id_column)
+        key = str(post_id) if post_id else ('', len(self._keywords))
+        keyword = row.get(self.keyword_column)
+        if key in self._keywords:
+            self.duplicates += 1
+            if self.stream and keyword and keyword not in self._keywords[key]:
+                self._merged.add(key)
+        else:
+            self._keywords[key] = {}
+            if self.stream:
+                self.sink.append(row)
+            else:
+                self._rows[key] = row
+        if keyword:
+            self._keywords[key][keyword] = None
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def flush(self):
+        """
+        Write the posts seen so far when streaming; otherwise a no-op, as a
+        row can still gain keywords until every keyword is scraped
+        """
+        if self.stream:
+            self.sink.flush()
+
+    def close(self):
+        """
+        Hand the merged rows to the wrapped sink and close it (when
+        streaming, update the keywords of the posts already written)
+        """
+        if self.stream:
+            self.sink.update_rows(self.id_column, self.keyword_column,
+                                  {key: ', '.join(self._keywords[key]) for key in self._merged})
+            return
+        self.sink.extend(self)
+        if hasattr(self.sink, 'close'):
+            self.sink.close()
@@ -0,0 +1,145 @@
+"""
+Running summaries of the scrapers' rows
+Totals, top values and per-keyword/per-organization breakdowns updated one
+row at a time, so summaries cost nothing at the end of a run (streaming runs
+included) and can be printed as progress while it goes.
+"""
+
+from collections import Counter, defaultdict
+
+
+def _number(value):
+    if isinstance(value, int):
+        return value
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def _present(value):
+    # Not None, NaN or an empty string
+    return value is not None and value == value and value != ''
+
+
+class RunningSummary:
+    """
+    Summary of a scraper's rows, updated with add(row):
+    - the row count, and sums and means of sum_columns (likes, comments...);
+    - rows with a value in each of nonempty_columns (email, website...);
+    - rows and sums per value of each of group_columns (usuario,
+      organization_name...), for top-k lists and breakdowns;
+    - the same per keyword of keyword_column, whose values may hold several
+      keywords joined with ', ' (e.g. keywords_matched).
+    With id_column, a row whose ID was already seen (the same post found under
+    another keyword) only counts for its keywords, not for the totals.
+    """
+
+    def __init__(self, sum_columns=(), group_columns=(), nonempty_columns=(), keyword_column=None, id_column=None):
+        self.sum_columns = list(sum_columns)
+        self.group_columns = list(group_columns)
+        self.keyword_column = keyword_column
+        self.id_column = id_column
+        self.rows = 0
+        self.sums = dict.fromkeys(self.sum_columns, 0)
+        self.nonempty = dict.fromkeys(nonempty_columns, 0)
+        # Column -> value -> rows, and column -> value -> sums of sum_columns
+        self.counts = defaultdict(Counter)
+        self.group_sums = defaultdict(lambda: defaultdict(Counter))
+        self._ids = set()
+
+    def __len__(self):
+        return self.rows
+
+    def add(self, row):
+        post_id = row.get(self.id_column) if self.id_column else None
+        new = True
+        if post_id:
+            key = str(post_id)
+            new = key not in self._ids
+            self._ids.add(key)
+        values = {column: _number(row.get(column)) for column in self.sum_columns}
+
+        if new:
+            self.rows += 1
+            for column, value in values.items():
+                self.sums[column] += value
+            for column in self.nonempty:
+                if _present(row.get(column)):
+                    self.nonempty[column] += 1
+            for column in self.group_columns:
+                value = row.get(column)
+                if _present(value):
+                    self._count(column, value, values)
+
+        keywords = row.get(self.keyword_column) if self.keyword_column else None
+        if keywords:
+            for keyword in str(keywords).split(', '):
+                self._count(self.keyword_column, keyword, values)
+
+    def _count(self, column, value, values):
+        self.counts[column][value] += 1
+        sums = self.group_sums[column][value]
+        for name, number in values.items():
+            sums[name] += number
+
+    def extend(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def mean(self, column):
+        return self.sums[column] / self.rows if self.rows else 0.0
+
+    def top(self, column, k=10):
+        """
+        The k values of a group or keyword column with the most rows, as (value, rows) pairs
+        """
+        return self.counts[column].most_common(k)
+
+    def breakdown(self, column, value):
+        """
+        Rows and sums of sum_columns of one value of a group or keyword column
+        """
+        return {'rows': self.counts[column][value], **self.group_sums[column][value]}
+
+    def totals_text(self):
+        """
+        The sums as text, e.g. '12,345 likes, 678 comments'
+        """
+        return ', '.join(f"{total:,} {column}" for column, total in self.sums.items())
+
+    def breakdown_text(self, column, value):
+        """
+        The sums of one value of a group or keyword column as text, like totals_text()
+        """
+        sums = self.breakdown(column, value)
+        return ', '.join(f"{sums.get(name, 0):,} {name}" for name in self.sum_columns)
+
+
+class SummarizingSink:
+    """
+    Wraps the scrapers' results (a list, CSVStreamWriter or DeduplicatingSink)
+    and adds every row to a RunningSummary on its way in. Other attributes
+    (duplicates, rows_written...) are the wrapped sink's.
+    """
+
+    def __init__(self, sink, summary):
+        self.sink = sink
+        self.summary = summary
+
+    def __len__(self):
+        return len(self.sink)
+
+    def __iter__(self):
+        return iter(self.sink)
+
+    def __getattr__(self, name):
+        return getattr(self.sink, name)
+
+    def append(self, row):
+        self.summary.add(row)
+        self.sink.append(row)
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
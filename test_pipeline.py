@@ -0,0 +1,81 @@
+"""
+Tests of the fetch pipeline and of the Facebook Posts scraper running on it
+Uses the fake Apify backend, so no token or network is needed.
+
+Usage:
+    python -m pytest test_pipeline.py
+"""
+
+import os
+
+# Fast, offline settings, before the scrapers read them
+os.environ.update(APIFY_API_TOKEN='test', ACTOR_CACHE='false', METRICS_OUTPUT='false', POST_STORE='false',
+                  PARQUET_OUTPUT='false', STREAM_OUTPUT='false', ACTOR_CALLS_PER_MINUTE='1000000',
+                  ACTOR_MAX_CALLS_PER_MINUTE='1000000', ACTOR_RETRY_BASE_DELAY='0')
+
+import scraper_facebook_posts
+from fake_apify import FakeApifyClient
+from keyword_matcher import KeywordMatcher
+from keywords import KEYWORDS
+from pipeline import FetchPipeline
+
+
+def test_unread_chunks_are_skipped():
+    batches = [[1, 2, 3], [4, 5], [6]]
+    pipeline = FetchPipeline(batches, lambda feed: iter(feed.batch), chunk_size=1, max_chunks=1)
+    seen = []
+    for feed in pipeline:
+        if feed.batch == [1, 2, 3]:
+            # Give up on the first batch without reading its chunks
+            continue
+        seen.extend(item for chunk in feed.chunks() for item in chunk)
+    assert seen == [4, 5, 6]
+
+
+def test_failed_batch_does_not_stop_later_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper_facebook_posts, 'client', FakeApifyClient(items_per_run=50, seed=1))
+    calls = []
+    match_many = KeywordMatcher.match_many
+
+    def failing_once(self, texts):
+        calls.append(len(texts))
+        if len(calls) == 1:
+            raise RuntimeError("matcher worker died")
+        return match_many(self, texts)
+
+    monkeypatch.setattr(KeywordMatcher, 'match_many', failing_once)
+    pages = {f'Page {i}': f'https://www.facebook.com/page{i}' for i in range(3)}
+    results = scraper_facebook_posts.scrape_facebook_posts(pages, KEYWORDS, output_file=str(tmp_path / 'posts.csv'),
+                                                           batch_size=1, save=False)
+
+    assert results.failed == ['Page 0']
+    assert len(calls) >= 3
+    assert len(results) > 0
+    assert {row['organization_name'] for row in results} <= {'Page 1', 'Page 2'}
+
+
+def test_failed_batch_with_pages_still_downloading(tmp_path, monkeypatch):
+    # Datasets of many small, slow pages: the batch fails while the
+    # background thread is still reading its dataset
+    monkeypatch.setattr(scraper_facebook_posts, 'client',
+                        FakeApifyClient(items_per_run=200, page_size=5, page_latency=0.02, seed=2))
+    monkeypatch.setattr(scraper_facebook_posts, 'FetchPipeline',
+                        lambda batches, start: FetchPipeline(batches, start, chunk_size=10, max_chunks=2))
+    calls = []
+    match_many = KeywordMatcher.match_many
+
+    def failing_once(self, texts):
+        calls.append(len(texts))
+        if len(calls) == 1:
+            raise RuntimeError("matcher worker died")
+        return match_many(self, texts)
+
+    monkeypatch.setattr(KeywordMatcher, 'match_many', failing_once)
+    pages = {f'Page {i}': f'https://www.facebook.com/page{i}' for i in range(3)}
+    results = scraper_facebook_posts.scrape_facebook_posts(pages, KEYWORDS, output_file=str(tmp_path / 'posts.csv'),
+                                                           batch_size=1, max_posts_per_page=200, save=False)
+
+    assert results.failed == ['Page 0']
+    # The other pages were read in several chunks each
+    assert len(calls) > 10
+    assert {row['organization_name'] for row in results} == {'Page 1', 'Page 2'}
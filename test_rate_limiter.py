@@ -0,0 +1,128 @@
+"""
+Tests of the actor call pacing: backoff, adaptive rate and circuit breaker
+
+Usage:
+    python -m pytest test_rate_limiter.py
+"""
+
+import time
+
+import pytest
+
+import rate_limiter
+from rate_limiter import AdaptiveRateLimiter, CircuitBreaker, CircuitOpenError, call_with_retries
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def failing(status_code, times):
+    """
+    A call that raises status_code the first times calls, then returns 'ok'
+    """
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= times:
+            raise StatusError(status_code)
+        return 'ok'
+
+    call.calls = calls
+    return call
+
+
+@pytest.fixture
+def actor(monkeypatch, request):
+    """
+    An actor with an unpaced limiter and a breaker of threshold 2, whose backoff
+    delays are recorded instead of slept
+    """
+    actor_id = f'test/{request.node.name}'
+    limiter = AdaptiveRateLimiter()
+    # No pacing between attempts: only the backoff sleeps
+    monkeypatch.setattr(limiter, 'acquire', lambda: None)
+    monkeypatch.setitem(rate_limiter._limiters, actor_id, limiter)
+    monkeypatch.setitem(rate_limiter._breakers, actor_id, CircuitBreaker(threshold=2, cooldown=60))
+    monkeypatch.setattr(rate_limiter, 'ACTOR_RETRY_BASE_DELAY', 1)
+    monkeypatch.setattr(rate_limiter, 'ACTOR_RETRY_MAX_DELAY', 3)
+    # The full backoff window, without jitter
+    monkeypatch.setattr(rate_limiter.random, 'uniform', lambda low, high: high)
+    delays = []
+    monkeypatch.setattr(rate_limiter.time, 'sleep', delays.append)
+    return actor_id, delays
+
+
+def test_backoff_doubles_up_to_the_max_delay(actor):
+    actor_id, delays = actor
+    call = failing(503, times=4)
+    assert call_with_retries(actor_id, call, max_attempts=5) == 'ok'
+    assert delays == [1, 2, 3, 3]
+    assert rate_limiter._breakers[actor_id].failures == 0
+
+
+def test_non_transient_errors_are_not_retried_nor_open_the_breaker(actor):
+    actor_id, delays = actor
+    breaker = rate_limiter._breakers[actor_id]
+    for _ in range(3):
+        call = failing(400, times=1)
+        with pytest.raises(StatusError):
+            call_with_retries(actor_id, call, max_attempts=3)
+        assert len(call.calls) == 1
+    assert delays == []
+    assert (breaker.failures, breaker.opened_at) == (0, None)
+
+
+def test_transient_errors_open_the_breaker(actor):
+    actor_id, delays = actor
+    for _ in range(2):
+        with pytest.raises(StatusError):
+            call_with_retries(actor_id, failing(429, times=3), max_attempts=3)
+    call = failing(429, times=0)
+    with pytest.raises(CircuitOpenError):
+        call_with_retries(actor_id, call)
+    assert call.calls == []
+
+
+def test_limiter_slows_down_and_recovers():
+    limiter = AdaptiveRateLimiter(60, max_calls_per_minute=120, min_calls_per_minute=15)
+    limiter.throttled()
+    assert limiter.rate == pytest.approx(0.5)
+    limiter.throttled()
+    limiter.throttled()
+    # Never below the minimum
+    assert limiter.rate == pytest.approx(0.25)
+    limiter.succeeded()
+    assert limiter.rate == pytest.approx(0.3125)
+    for _ in range(10):
+        limiter.succeeded()
+    # Nor above the maximum
+    assert limiter.rate == pytest.approx(2)
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+    breaker.failed()
+    breaker.check('actor')
+    breaker.failed()
+    with pytest.raises(CircuitOpenError):
+        breaker.check('actor')
+
+    # Half open after the cooldown: one more failure opens it again
+    time.sleep(0.06)
+    breaker.check('actor')
+    assert breaker.failures == 1
+    breaker.failed()
+    with pytest.raises(CircuitOpenError):
+        breaker.check('actor')
+
+    # A successful trial call closes it
+    time.sleep(0.06)
+    breaker.check('actor')
+    breaker.succeeded()
+    breaker.failed()
+    breaker.check('actor')
+    assert breaker.failures == 1
@@ -0,0 +1,51 @@
+"""
+Tests of the output sinks: streaming deduplication into the CSV and Parquet
+
+Usage:
+    python -m pytest test_sinks.py
+"""
+
+import os
+
+# Fast, offline settings, before the sinks read them
+os.environ.update(METRICS_OUTPUT='false', POST_STORE='false', PARQUET_OUTPUT='false', STREAM_OUTPUT='false')
+
+import pandas as pd
+import pytest
+from sinks import CSVStreamWriter, DeduplicatingSink, ParquetDataset
+
+
+def post(post_id, keyword, likes=1):
+    return {'post_id': post_id, 'keyword': keyword, 'fecha': '2025-03-01T10:00:00Z', 'likes': likes}
+
+
+def test_streaming_dedup_merges_keywords_of_written_posts(tmp_path):
+    output_file = str(tmp_path / 'instagram_data.csv')
+    sink = DeduplicatingSink(CSVStreamWriter(output_file, chunk_size=1), 'post_id', stream=True)
+    sink.extend([post('1', 'aborto'), post('2', 'aborto')])
+    sink.flush()
+    # Found again after it was written
+    sink.extend([post('1', 'abortolegal'), post('3', 'abortolegal')])
+    sink.close()
+
+    df = pd.read_csv(output_file, dtype=str)
+    assert dict(zip(df['post_id'], df['keyword'])) == {'1': 'aborto, abortolegal', '2': 'aborto', '3': 'abortolegal'}
+    assert (len(sink), sink.duplicates) == (3, 1)
+
+
+def test_streaming_dedup_updates_parquet_parts_of_the_run(tmp_path):
+    pytest.importorskip('pyarrow')
+    output_file = str(tmp_path / 'instagram_data.csv')
+    # A post of an earlier run keeps its part file as it was
+    ParquetDataset(output_file).write([post('1', 'feminismo')])
+    dataset = ParquetDataset(output_file)
+    sink = DeduplicatingSink(CSVStreamWriter(output_file, chunk_size=1, parquet=dataset), 'post_id', stream=True)
+    sink.extend([post('1', 'aborto'), post('2', 'aborto', likes=7)])
+    sink.flush()
+    sink.extend([post('1', 'abortolegal')])
+    sink.close()
+
+    df = pd.read_parquet(str(tmp_path / 'parquet'))
+    keywords = sorted(zip(df['post_id'], df['keyword'], df['likes']))
+    assert keywords == [('1', 'aborto, abortolegal', 1), ('1', 'feminismo', 1), ('2', 'aborto', 7)]
+    assert str(df['likes'].dtype) == 'Int64'
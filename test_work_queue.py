@@ -0,0 +1,92 @@
+"""
+Tests of the work queue: leases, reclaiming, attempts and the export
+
+Usage:
+    python -m pytest test_work_queue.py
+"""
+
+import os
+import time
+
+# Fast, offline settings, before the scrapers read them
+os.environ.update(APIFY_API_TOKEN='test', ACTOR_CACHE='false', METRICS_OUTPUT='false', POST_STORE='false',
+                  PARQUET_OUTPUT='false', STREAM_OUTPUT='false')
+
+import pandas as pd
+from work_queue import WorkQueue, export
+
+
+def make_queue(tmp_path, lease_seconds=60, max_attempts=3):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite'), lease_seconds=lease_seconds, max_attempts=max_attempts)
+    queue.enqueue('scraper', 'twitter', [('aborto', '#aborto'), ('feminismo', '#feminismo')])
+    return queue
+
+
+def test_claim_leases_units_in_order(tmp_path):
+    queue = make_queue(tmp_path)
+    first = queue.claim('w1')
+    second = queue.claim('w2')
+    assert (first.unit, first.attempts) == ('aborto', 1)
+    assert second.unit == 'feminismo'
+    # Both are leased, so nothing is left to claim
+    assert queue.claim('w3') is None
+    assert queue.remaining() == 2
+    assert queue.counts()[('scraper', 'twitter')]['leased'] == 2
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.05)
+    lost = queue.claim('dead worker')
+    queue.claim('w1')
+    time.sleep(0.1)
+    reclaimed = queue.claim('w2')
+    assert reclaimed.key == lost.key
+    assert reclaimed.attempts == 2
+    # The dead worker lost its lease: its late results are not taken
+    assert not queue.complete('dead worker', lost, [{'tweet_id': '1'}])
+    assert queue.complete('w2', reclaimed, [{'tweet_id': '2'}])
+    assert list(queue.rows('scraper', 'twitter')) == [{'tweet_id': '2'}]
+
+
+def test_unit_fails_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    item = queue.claim('w1', platforms=['twitter'])
+    queue.fail('w1', item, 'actor run failed after retries')
+    # Back in the queue for a second attempt, then given up
+    item = queue.claim('w1')
+    assert (item.unit, item.attempts) == ('aborto', 2)
+    queue.fail('w1', item, 'actor run failed after retries')
+    failures = queue.failures()
+    assert [(failed.unit, error) for failed, error in failures] == [('aborto', 'actor run failed after retries')]
+    # Planning again puts failed units back
+    queue.enqueue('scraper', 'twitter', [('aborto', '#aborto')])
+    assert queue.counts()[('scraper', 'twitter')]['pending'] == 2
+
+
+def test_expired_lease_at_max_attempts_fails(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.05, max_attempts=1)
+    queue.claim('dead worker')
+    time.sleep(0.1)
+    item = queue.claim('w1')
+    assert item.unit == 'feminismo'
+    [(failed, error)] = queue.failures()
+    assert (failed.unit, error) == ('aborto', 'lease expired')
+
+
+def test_complete_and_export_merges_posts_across_workers(tmp_path):
+    queue = make_queue(tmp_path)
+    first, second = queue.claim('w1'), queue.claim('w2')
+    assert queue.complete('w1', first, [{'tweet_id': '1', 'keyword': 'aborto', 'likes': 5},
+                                        {'tweet_id': '2', 'keyword': 'aborto', 'likes': 1}])
+    assert queue.complete('w2', second, [{'tweet_id': '1', 'keyword': 'feminismo', 'likes': 5}])
+    assert queue.remaining() == 0
+    assert queue.counts()[('scraper', 'twitter')]['done'] == 2
+
+    written = export(queue, ['twitter'], output_dir=str(tmp_path))
+    output_file = str(tmp_path / 'twitter_data.csv')
+    assert written == {output_file: 2}
+    df = pd.read_csv(output_file, dtype=str)
+    assert dict(zip(df['tweet_id'], df['keyword'])) == {'1': 'aborto, feminismo', '2': 'aborto'}
+
+    written = export(queue, ['twitter'], output_dir=str(tmp_path), deduplicate=False)
+    assert written == {output_file: 3}
@@ -0,0 +1,194 @@
+"""
+Timestamp parsing shared by all scrapers
+Handles ISO-8601, epoch seconds/milliseconds, the Twitter format and the
+Facebook variants, and always returns timezone-aware UTC values.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+# Format of the 'fecha' column in every output
+FECHA_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Twitter timestamps: "Wed Nov 18 17:00:00 +0000 2025"
+TWITTER_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+
+
+def _from_iso(value):
+    # 'Z' is only accepted by fromisoformat from Python 3.11 on
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+_MONTHS = {name: number for number, name in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+
+
+def _from_twitter(value):
+    # Split by hand: strptime with %a/%b/%z is several times slower
+    parts = value.split()
+    if len(parts) != 6 or parts[1] not in _MONTHS or parts[4] != '+0000':
+        return datetime.strptime(value, TWITTER_FORMAT)
+    hour, minute, second = parts[3].split(':')
+    return datetime(int(parts[5]), _MONTHS[parts[1]], int(parts[2]), int(hour), int(minute), int(second),
+                    tzinfo=timezone.utc)
+
+
+def _from_epoch(value):
+    if isinstance(value, str) and not (len(value) >= 9 and value.replace('.', '', 1).isdigit()):
+        raise ValueError(f"not an epoch timestamp: {value}")
+    seconds = float(value)
+    # Milliseconds since the epoch
+    if seconds > 1e11:
+        seconds /= 1000
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+def _from_iso_seconds(value):
+    # ISO variants older Pythons reject (e.g. '2025-06-01T10:00:00.000Z'),
+    # read to the second and taken as UTC
+    return datetime.strptime(value[:19].replace('T', ' '), FECHA_FORMAT)
+
+
+# Tried in order until one fits; the winner is remembered per source
+PARSERS = [_from_iso, _from_twitter, _from_epoch, _from_iso_seconds]
+
+# Source (e.g. 'twitter') -> parser that worked last for it
+_source_parsers = {}
+
+
+def _to_utc(value):
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def detect_parser(value, source=None):
+    """
+    Parser that reads value, trying the one cached for source first.
+    Returns None if no known format fits.
+    """
+    cached = _source_parsers.get(source)
+    candidates = [cached] + PARSERS if cached else PARSERS
+    for parser in candidates:
+        try:
+            parser(value)
+        except (ValueError, OverflowError, OSError):
+            continue
+        if source is not None:
+            _source_parsers[source] = parser
+        return parser
+    return None
+
+
+def parse_timestamp(value, source=None):
+    """
+    Timezone-aware UTC datetime of a timestamp in any supported format, or None.
+    source names where the value comes from (e.g. 'twitter'), so the format
+    detected for its first value is tried first for the next ones.
+    Naive timestamps are taken as UTC.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return _to_utc(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            return _from_epoch(value)
+        except (ValueError, OverflowError, OSError):
+            return None
+
+    value = str(value).strip()
+    parser = _source_parsers.get(source)
+    if parser is not None:
+        try:
+            return _to_utc(parser(value))
+        except (ValueError, OverflowError, OSError):
+            pass
+
+    parser = detect_parser(value, source)
+    return _to_utc(parser(value)) if parser else None
+
+
+def parse_timestamps(values, source=None):
+    """
+    Batch version of parse_timestamp(): a pandas Series of UTC timestamps
+    (NaT where a value can't be read), parsed vectorized with the format of
+    the first value
+    """
+    import pandas as pd
+
+    series = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series):
+        unit = 'ms' if series.max() > 1e11 else 's'
+        return pd.to_datetime(series, unit=unit, utc=True, errors='coerce')
+
+    strings = series.astype('string').str.strip()
+    sample = strings.dropna()
+    sample = sample[sample != '']
+    if sample.empty:
+        return pd.to_datetime(strings, utc=True, errors='coerce')
+
+    parser = detect_parser(sample.iloc[0], source)
+    if parser is _from_twitter:
+        return pd.to_datetime(strings, format=TWITTER_FORMAT, utc=True, errors='coerce')
+    if parser is _from_epoch:
+        numbers = pd.to_numeric(strings, errors='coerce')
+        unit = 'ms' if numbers.max() > 1e11 else 's'
+        return pd.to_datetime(numbers, unit=unit, utc=True, errors='coerce')
+    return pd.to_datetime(strings, format='ISO8601', utc=True, errors='coerce')
+
+
+def format_fecha(value):
+    """
+    'fecha' column value (YYYY-MM-DD HH:MM:SS, UTC) of a parsed timestamp
+    """
+    # isoformat is several times faster than strftime(FECHA_FORMAT)
+    return value.isoformat(' ', 'seconds')[:19] if value else ''
+
+
+class DateWindow:
+    """
+    Range of post dates to collect, from start to end (both 'YYYY-MM-DD' and
+    inclusive, None for open-ended). Posts without a date are kept.
+    """
+
+    def __init__(self, start=None, end=None):
+        self.start = parse_timestamp(start) if start else None
+        # Exclusive upper limit: the day after end
+        self.end = parse_timestamp(end) + timedelta(days=1) if end else None
+
+    def __str__(self):
+        return f"{self.start_day or '…'} → {self.end_day or '…'}"
+
+    @property
+    def start_day(self):
+        return self.start.strftime('%Y-%m-%d') if self.start else None
+
+    @property
+    def end_day(self):
+        """
+        Last day of the window, for actors with an inclusive end date
+        """
+        return (self.end - timedelta(days=1)).strftime('%Y-%m-%d') if self.end else None
+
+    @property
+    def until_day(self):
+        """
+        Day after the window, for actors with an exclusive end date
+        """
+        return self.end.strftime('%Y-%m-%d') if self.end else None
+
+    def too_old(self, value):
+        return value is not None and self.start is not None and value < self.start
+
+    def too_new(self, value):
+        return value is not None and self.end is not None and value >= self.end
+
+    def contains(self, value):
+        return not self.too_old(value) and not self.too_new(value)
+
+    def lower_bound(self, day=None):
+        """
+        Latest of the window start and another minimum day (e.g. an
+        incremental run's high-water mark), to send as an actor's minimum date
+        """
+        days = [d for d in (self.start_day, day) if d]
+        return max(days) if days else None
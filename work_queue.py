@@ -0,0 +1,510 @@
+"""
+Work queue to shard keyword sweeps across worker processes and hosts
+The planner puts every (platform, keyword group, keyword) and every Facebook
+page in a SQLite queue, without the scrapers' first-10-keywords cap. Workers
+(several processes, on one or more hosts sharing the queue file) claim one
+unit at a time under a lease, run it and store its rows; a unit whose worker
+died is claimed again once its lease expires. The export then writes the
+usual output/<platform>_data<suffix>.csv files from the finished units.
+
+Usage:
+    python work_queue.py plan --reset
+    python work_queue.py work --processes 4
+    python work_queue.py status
+    python work_queue.py export
+"""
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from dotenv import load_dotenv
+import scraper
+import scraper_facebook_posts
+from facebook_pages import FACEBOOK_PAGES
+from keywords import KEYWORDS, KEYWORDS_CONTROL
+from platforms import PLATFORMS
+from actor_runs import apify_client, configure_cache
+from monitor import MONITORED_PLATFORMS, platform_list
+from page_index import FACEBOOK_PAGE_IDS_PATH, PageIndex
+from post_store import POST_STORE, PostStore
+from sinks import DeduplicatingSink, ParquetDataset, PARQUET_OUTPUT, save_csv
+import metrics
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+# Queue file; workers on other hosts need it on a shared filesystem with working file locks
+WORK_QUEUE_PATH = os.getenv('WORK_QUEUE_PATH', 'output/work_queue.sqlite')
+# Seconds a claimed unit stays leased to its worker; running workers renew
+# the lease, so it only runs out when a worker dies or loses the queue
+WORK_QUEUE_LEASE_SECONDS = float(os.getenv('WORK_QUEUE_LEASE_SECONDS', 1800))
+# Claims of a unit before it is given up as failed
+WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv('WORK_QUEUE_MAX_ATTEMPTS', 3))
+# Seconds an idle worker waits before looking for expired leases again
+WORK_QUEUE_POLL_SECONDS = float(os.getenv('WORK_QUEUE_POLL_SECONDS', 15))
+
+# Keyword group job -> (keywords, output file suffix), as in scraper.py and scraper_control.py
+KEYWORD_JOBS = {
+    'scraper': (KEYWORDS, ''),
+    'scraper_control': (KEYWORDS_CONTROL, '_control'),
+}
+
+STATUSES = ['pending', 'leased', 'done', 'failed']
+
+
+class WorkUnit:
+    """
+    A claimed unit of the queue: a keyword of a keyword group job on a hashtag
+    platform (unit is the keyword, value its hashtag) or a Facebook page
+    (unit is the page URL, value the organization name)
+    """
+
+    def __init__(self, job, platform, unit, value, attempts):
+        self.job = job
+        self.platform = platform
+        self.unit = unit
+        self.value = value
+        self.attempts = attempts
+
+    def __str__(self):
+        return f"{self.job} {self.platform} {self.value}"
+
+    @property
+    def key(self):
+        return (self.job, self.platform, self.unit)
+
+
+class WorkQueue:
+    """
+    SQLite queue of units of work with leases. Units are claimed in the order
+    they were enqueued; claim(), complete() and fail() each run in one
+    immediate transaction, so any number of processes can share the file.
+    A worker only completes or fails units it still holds the lease of.
+    """
+
+    def __init__(self, path=WORK_QUEUE_PATH, lease_seconds=WORK_QUEUE_LEASE_SECONDS, max_attempts=WORK_QUEUE_MAX_ATTEMPTS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        # Transactions are begun explicitly; busy waits up to 30 s for other workers' locks
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS units (
+                job TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                unit TEXT NOT NULL,
+                value TEXT NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL,
+                error TEXT,
+                rows TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (job, platform, unit)
+            )
+        """)
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def enqueue(self, job, platform, units):
+        """
+        Add (unit, value) pairs of a job and platform; units already in the
+        queue are kept as they are, except failed ones, which are tried again.
+        Returns the number of units added or put back.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO units (job, platform, unit, value, status, attempts, updated_at) "
+                "VALUES (?, ?, ?, ?, 'pending', 0, ?)",
+                [(job, platform, unit, value, now) for unit, value in units],
+            )
+            conn.execute(
+                "UPDATE units SET status = 'pending', attempts = 0, error = NULL, updated_at = ? "
+                "WHERE job = ? AND platform = ? AND status = 'failed'",
+                (now, job, platform),
+            )
+            return conn.total_changes - before
+
+    def reset(self):
+        """
+        Empty the queue (used when a new sweep starts from scratch)
+        """
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM units")
+
+    def claim(self, worker, platforms=None):
+        """
+        Lease the next pending unit (or one whose lease expired) of the given
+        platforms to worker, or return None if there is none
+        """
+        now = time.time()
+        platform_filter = ''
+        params = [now]
+        if platforms:
+            platform_filter = f" AND platform IN ({', '.join('?' for _ in platforms)})"
+            params.extend(platforms)
+        with self._transaction() as conn:
+            # Expired units that had all their attempts are given up
+            conn.execute(
+                "UPDATE units SET status = 'failed', worker = NULL, lease_until = NULL, "
+                "error = COALESCE(error, 'lease expired'), updated_at = ? "
+                "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT job, platform, unit, value, attempts FROM units "
+                "WHERE (status = 'pending' OR (status = 'leased' AND lease_until < ?))"
+                f"{platform_filter} ORDER BY rowid LIMIT 1",
+                params,
+            ).fetchone()
+            if row is None:
+                return None
+            item = WorkUnit(*row[:4], attempts=row[4] + 1)
+            conn.execute(
+                "UPDATE units SET status = 'leased', worker = ?, lease_until = ?, attempts = ?, updated_at = ? "
+                "WHERE job = ? AND platform = ? AND unit = ?",
+                (worker, now + self.lease_seconds, item.attempts, now, *item.key),
+            )
+        return item
+
+    def _update_leased(self, worker, item, assignments, values):
+        # Change a unit only while worker still holds its lease
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f"UPDATE units SET {assignments}, updated_at = ? "
+                "WHERE job = ? AND platform = ? AND unit = ? AND status = 'leased' AND worker = ?",
+                (*values, time.time(), *item.key, worker),
+            )
+            return cursor.rowcount > 0
+
+    def extend(self, worker, item):
+        """
+        Renew worker's lease of a unit; False if it lost the lease
+        """
+        return self._update_leased(worker, item, "lease_until = ?", (time.time() + self.lease_seconds,))
+
+    def complete(self, worker, item, rows):
+        """
+        Record a unit as done with its rows; False if worker lost the lease
+        (another worker claimed the unit and its rows are that worker's)
+        """
+        return self._update_leased(worker, item, "status = 'done', lease_until = NULL, error = NULL, rows = ?",
+                                   (json.dumps(rows, ensure_ascii=False, default=str),))
+
+    def fail(self, worker, item, error):
+        """
+        Put a unit back in the queue after a failed attempt, or give it up
+        once it had WORK_QUEUE_MAX_ATTEMPTS attempts
+        """
+        status = 'failed' if item.attempts >= self.max_attempts else 'pending'
+        return self._update_leased(worker, item, "status = ?, worker = NULL, lease_until = NULL, error = ?",
+                                   (status, str(error)))
+
+    def release(self, worker, item):
+        """
+        Put a unit back in the queue without counting the attempt (e.g. when
+        its worker is interrupted)
+        """
+        return self._update_leased(worker, item, "status = 'pending', worker = NULL, lease_until = NULL, attempts = ?",
+                                   (item.attempts - 1,))
+
+    def remaining(self, platforms=None):
+        """
+        Units of the given platforms that are pending or leased
+        """
+        query = "SELECT COUNT(*) FROM units WHERE status IN ('pending', 'leased')"
+        params = []
+        if platforms:
+            query += f" AND platform IN ({', '.join('?' for _ in platforms)})"
+            params = list(platforms)
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
+
+    def counts(self):
+        """
+        Dict of (job, platform) -> Counter of units per status
+        """
+        counts = defaultdict(Counter)
+        with self._lock:
+            cursor = self._conn.execute("SELECT job, platform, status, COUNT(*) FROM units GROUP BY job, platform, status")
+            for job, platform, status, count in cursor:
+                counts[(job, platform)][status] = count
+        return counts
+
+    def failures(self):
+        """
+        (WorkUnit, error) of every unit given up as failed
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT job, platform, unit, value, attempts, error FROM units WHERE status = 'failed' ORDER BY rowid")
+            return [(WorkUnit(*row[:5]), row[5]) for row in cursor]
+
+    def rows(self, job, platform):
+        """
+        Rows of the finished units of a job and platform, in queue order
+        """
+        with self._lock:
+            stored = self._conn.execute(
+                "SELECT rows FROM units WHERE job = ? AND platform = ? AND status = 'done' ORDER BY rowid",
+                (job, platform),
+            ).fetchall()
+        for (rows,) in stored:
+            yield from json.loads(rows)
+
+    def close(self):
+        self._conn.close()
+
+
+def sweeps(platforms):
+    """
+    (job, platform, units) of the sweeps over the given platforms: every
+    keyword of each keyword group on each hashtag platform, and every
+    Facebook page, as (unit, value) pairs
+    """
+    planned = []
+    for platform in platforms:
+        if platform == 'facebook_posts':
+            planned.append(('facebook_posts', platform, [(url, name) for name, url in FACEBOOK_PAGES.items()]))
+        else:
+            for job, (keywords, _) in KEYWORD_JOBS.items():
+                planned.append((job, platform, list(keywords.items())))
+    return planned
+
+
+def output_file_of(job, platform, output_dir='output'):
+    """
+    Output file the scraper of a job would write for a platform, e.g.
+    output/twitter_data_control.csv
+    """
+    suffix = KEYWORD_JOBS[job][1] if job in KEYWORD_JOBS else ''
+    return f'{output_dir}/{platform}_data{suffix}.csv'
+
+
+def run_unit(item, page_index):
+    """
+    Scrape one claimed unit and return its results (rows, with the failed
+    attribute of the scrapers); nothing is written to the output files
+    """
+    output_file = output_file_of(item.job, item.platform)
+    if item.platform == 'facebook_posts':
+        return scraper_facebook_posts.scrape_facebook_posts({item.value: item.unit}, KEYWORDS, output_file=output_file,
+                                                            stream=False, page_index=page_index, save=False)
+    # One row per keyword: the export merges the keywords of a post found in several units
+    return scraper.scrape_platform(PLATFORMS[item.platform], {item.unit: item.value}, output_file,
+                                   max_concurrent_runs=1, stream=False, batch_size=1, deduplicate=False, save=False)
+
+
+def keep_leased(queue, worker, item, stop):
+    """
+    Renew the lease of the unit a worker is running until stop is set
+    """
+    while not stop.wait(queue.lease_seconds / 3):
+        if not queue.extend(worker, item):
+            print(f"⚠ {worker} lost the lease of {item}")
+            return
+
+
+def work(worker=None, platforms=None, path=WORK_QUEUE_PATH):
+    """
+    Claim and run units of the given platforms until none is left (waiting
+    for units leased to other workers, which come back if those die).
+    Returns the number of units this worker completed.
+    """
+    worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+    queue = WorkQueue(path)
+    # Page IDs learned by earlier runs, shared with the Facebook scrapers
+    page_index = PageIndex(FACEBOOK_PAGES, FACEBOOK_PAGE_IDS_PATH)
+    # Timings, item counts and Apify usage of the worker, under output/metrics
+    metrics.start_run('work_queue')
+    completed = 0
+    try:
+        while True:
+            item = queue.claim(worker, platforms)
+            if item is None:
+                if not queue.remaining(platforms):
+                    break
+                time.sleep(WORK_QUEUE_POLL_SECONDS)
+                continue
+
+            print(f"▶ {worker}: {item} (attempt {item.attempts})")
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=keep_leased, args=(queue, worker, item, stop), daemon=True)
+            heartbeat.start()
+            try:
+                results = run_unit(item, page_index)
+                error = "actor run failed after retries" if results.failed else None
+            except Exception as e:
+                results, error = None, e
+            except BaseException:
+                # Interrupted: let another worker take the unit at once
+                queue.release(worker, item)
+                raise
+            finally:
+                stop.set()
+                heartbeat.join()
+
+            if error is not None:
+                queue.fail(worker, item, error)
+                print(f"✗ {worker}: {item} failed: {error}")
+            elif queue.complete(worker, item, list(results)):
+                completed += 1
+                print(f"✓ {worker}: {item} done, {len(results)} rows")
+            else:
+                print(f"⚠ {worker}: {item} was claimed by another worker, its rows are dropped")
+    finally:
+        page_index.save()
+        queue.close()
+        metrics.finish_run()
+    return completed
+
+
+def export(queue, platforms, output_dir='output', deduplicate=scraper.DEDUPLICATE_POSTS):
+    """
+    Write the rows of the finished units of each sweep to its output file,
+    as the scrapers would, and return dict of output file -> rows written
+    """
+    # Every exported post is also kept in a SQLite database across runs
+    store = PostStore() if POST_STORE else None
+    written = {}
+    try:
+        for job, platform, _ in sweeps(platforms):
+            output_file = output_file_of(job, platform, output_dir)
+            rows = list(queue.rows(job, platform))
+            if not rows:
+                continue
+            if platform == 'facebook_posts':
+                columns = scraper_facebook_posts.POST_COLUMNS
+                dataset = ParquetDataset(output_file, columns=columns, replace=True) if PARQUET_OUTPUT else None
+                table = store.table(output_file, 'post_id', keyword_column='keywords_matched',
+                                    index_columns=('fecha', 'organization_name'), columns=columns) if store is not None else None
+                scraper_facebook_posts.save_posts(rows, output_file, parquet=dataset, store=table)
+            else:
+                id_column = PLATFORMS[platform].id_column
+                if deduplicate:
+                    # One row per post ID with every keyword it was found under
+                    merged = DeduplicatingSink([], id_column)
+                    merged.extend(rows)
+                    rows = list(merged)
+                dataset = ParquetDataset(output_file, replace=True) if PARQUET_OUTPUT else None
+                table = store.table(output_file, id_column, keyword_column='keyword') if store is not None else None
+                save_csv(rows, output_file, parquet=dataset, store=table)
+            written[output_file] = len(rows)
+    finally:
+        if store is not None:
+            store.close()
+    return written
+
+
+def print_status(queue):
+    """
+    Print the units per status of each job and platform, and the failed units
+    """
+    counts = queue.counts()
+    print(f"\n{'job':<16} {'platform':<16} " + ' '.join(f'{status:>8}' for status in STATUSES))
+    for (job, platform), statuses in sorted(counts.items()):
+        print(f"{job:<16} {platform:<16} " + ' '.join(f'{statuses[status]:>8}' for status in STATUSES))
+    for item, error in queue.failures():
+        print(f"  ✗ {item}: {error}")
+    print()
+
+
+def add_arguments(parser):
+    """
+    Command-line options of the work queue: one subcommand per step
+    """
+    steps = parser.add_subparsers(dest='step', metavar='step', required=True)
+    plan = steps.add_parser('plan', help="put every keyword and Facebook page of the platforms in the queue")
+    plan.add_argument('--reset', action='store_true', help="empty the queue first instead of keeping finished units")
+    work_step = steps.add_parser('work', help="claim and run units until the queue is empty")
+    work_step.add_argument('--processes', type=int, default=1, help="worker processes to start on this host (default: %(default)s)")
+    work_step.add_argument('--worker-id', help="name of the worker in the queue (default: <host>:<pid>)")
+    work_step.add_argument('--no-cache', action='store_true', help="ignore cached actor results and run every actor again")
+    steps.add_parser('status', help="show the units per status")
+    export_step = steps.add_parser('export', help="write the finished units' rows to the output CSVs")
+    export_step.add_argument('--one-row-per-keyword', action='store_true',
+                             help="write a post once per keyword it was found under instead of merging its keywords")
+    for step in (plan, work_step, export_step):
+        step.add_argument('--platforms', type=platform_list, default=MONITORED_PLATFORMS,
+                          help=f"comma-separated platforms (default: {','.join(MONITORED_PLATFORMS)})")
+
+
+def run(args):
+    """
+    Run a step of the work queue with the options of add_arguments()
+    """
+    queue = WorkQueue()
+    try:
+        if args.step == 'plan':
+            if args.reset:
+                queue.reset()
+            for job, platform, units in sweeps(args.platforms):
+                added = queue.enqueue(job, platform, units)
+                print(f"{job} {platform}: {len(units)} units, {added} added to the queue")
+            print_status(queue)
+        elif args.step == 'status':
+            print_status(queue)
+        elif args.step == 'export':
+            written = export(queue, args.platforms, deduplicate=scraper.DEDUPLICATE_POSTS and not args.one_row_per_keyword)
+            for output_file, rows in written.items():
+                print(f"✓ {rows} rows saved to {output_file}")
+            if queue.remaining(args.platforms):
+                print("⚠ Some units are not finished yet; run the export again once the workers are done")
+        else:
+            configure_cache(bypass=args.no_cache)
+            # Fail before starting if there is no API token
+            apify_client()
+            start_time = time.time()
+            if args.processes > 1:
+                workers = [multiprocessing.Process(target=work, args=(f'{args.worker_id}/{i}' if args.worker_id else None,
+                                                                      args.platforms))
+                           for i in range(1, args.processes + 1)]
+                for process in workers:
+                    process.start()
+                for process in workers:
+                    process.join()
+                print(f"\n✓ {args.processes} workers finished")
+            else:
+                completed = work(args.worker_id, args.platforms)
+                print(f"\n✓ Worker finished: {completed} units done")
+            print(f"Time elapsed: {(time.time() - start_time)/60:.2f} minutes")
+            print_status(queue)
+    finally:
+        queue.close()
+
+
+def main():
+    """
+    Run a step of the work queue
+    """
+    parser = argparse.ArgumentParser(description="Plan, run and export a work queue of keyword and page units")
+    add_arguments(parser)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()